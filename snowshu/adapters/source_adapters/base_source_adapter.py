@@ -1,14 +1,17 @@
+import threading
 import time
 from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Iterable, List, Tuple
+from typing import Any, Iterable, List, Optional, Tuple
 
 import pandas as pd
+import sqlalchemy
 
 from snowshu.adapters import BaseSQLAdapter
 from snowshu.configs import MAX_ALLOWED_DATABASES, MAX_ALLOWED_ROWS
 from snowshu.core.models import DataType, Relation
 from snowshu.core.models.relation import at_least_one_full_pattern_match
 from snowshu.core.utils import correct_case
+from snowshu.exceptions import QueryCancelled
 from snowshu.logger import Logger, duration
 
 logger = Logger().logger
@@ -20,6 +23,7 @@ class BaseSourceAdapter(BaseSQLAdapter):
     MAX_ALLOWED_ROWS = MAX_ALLOWED_ROWS
     DEFAULT_CASE = 'lower'
     SUPPORTS_CROSS_DATABASE = False
+    SUPPORTS_SLICED_EXTRACTION = False
     SUPPORTED_FUNCTIONS = set()
 
     class _DatabaseObject:
@@ -40,6 +44,9 @@ class BaseSourceAdapter(BaseSQLAdapter):
 
     def __init__(self, preserve_case: bool = False):
         self.preserve_case = preserve_case
+        self._running_sessions = set()
+        self._sessions_lock = threading.Lock()
+        self._cancelled = False
         super().__init__()
         for attr in ('DATA_TYPE_MAPPINGS', 'SUPPORTED_SAMPLE_METHODS',):
             if not hasattr(self, attr):
@@ -129,19 +136,25 @@ class BaseSourceAdapter(BaseSQLAdapter):
 
     def _safe_query(self, query_sql: str) -> pd.DataFrame:
         """runs the query and closes the connection."""
+        if self._cancelled:
+            raise QueryCancelled('Source queries were cancelled, refusing to run new ones.')
         logger.debug('Beginning query execution...')
         start = time.time()
         conn = None
         cursor = None
+        session_id = None
         try:
             conn = self.get_connection()
             cursor = conn.connect()
+            session_id = self._session_id(cursor)
+            with self._sessions_lock:
+                self._running_sessions.add(session_id)
             # we make the STRONG assumption that all responses will be small enough
             # to live in-memory (because sampling engine).
             # further safety added by the constraints in snowshu.configs
             # this allows the connection to return to the pool
             logger.debug(f'Executed query in {time.time()-start} seconds.')
-            frame = pd.read_sql_query(query_sql, conn)
+            frame = pd.read_sql_query(query_sql, cursor)
             logger.debug("Dataframe datatypes: %s", str(frame.dtypes).replace('\n', ' | '))
             if len(frame) > 0:
                 for col in frame.columns:
@@ -149,12 +162,50 @@ class BaseSourceAdapter(BaseSQLAdapter):
             else:
                 logger.debug("Dataframe is empty")
         finally:
+            with self._sessions_lock:
+                self._running_sessions.discard(session_id)
             if cursor:
                 cursor.close()
             if conn:
                 conn.dispose()
         return frame
 
+    def _session_id(self,
+                    connection: sqlalchemy.engine.base.Connection  # noqa pylint: disable=unused-argument
+                    ) -> Optional[Any]:
+        """the source session of an open connection, None if the source has no cancellable sessions."""
+        return None
+
+    @staticmethod
+    def cancel_session_statement(session_id: Any) -> str:
+        """creates the statement that cancels all running queries of a session."""
+        raise NotImplementedError()
+
+    def cancel_running_queries(self) -> None:
+        """Cancels every query this adapter is running in the source, and refuses to run new ones.
+
+        Cancellation is best effort, sessions that cannot be cancelled are logged and left to finish.
+        """
+        self._cancelled = True
+        with self._sessions_lock:
+            sessions = [session for session in self._running_sessions if session is not None]
+        if not sessions:
+            return
+        logger.warning('Cancelling %s running source queries...', len(sessions))
+        engine = self.get_connection()
+        try:
+            for session_id in sessions:
+                try:
+                    engine.execute(self.cancel_session_statement(session_id))
+                except Exception as exc:    # noqa pylint: disable=broad-except
+                    logger.warning('Failed to cancel queries of source session %s: %s', session_id, exc)
+        finally:
+            engine.dispose()
+
+    def allow_queries(self) -> None:
+        """Lets new queries run again after :meth:`cancel_running_queries`, such as for a new execution."""
+        self._cancelled = False
+
     def _correct_case(self, val: str) -> str:
         """The base case correction method for a source adapter.
         """
@@ -164,10 +215,117 @@ class BaseSourceAdapter(BaseSQLAdapter):
         """wraps any query in a COUNT statement, returns that integer."""
         raise NotImplementedError()
 
+    def unchecked_query(self, query: str) -> pd.DataFrame:
+        """Runs a query without counting its records first.
+
+        Only for queries known to return few records, such as those of relations with tiny catalog row counts.
+        """
+        return self._safe_query(query)
+
     def check_count_and_query(self, query: str, max_count: int, unsampled: bool) -> pd.DataFrame:
         """checks the count, if count passes returns results as a dataframe."""
         raise NotImplementedError()
 
+    @staticmethod
+    def slice_statement(query: str, slices: int, slice_index: int) -> str:
+        """creates the statement that selects one of ``slices`` disjoint slices of the records of a query."""
+        raise NotImplementedError()
+
+    @staticmethod
+    def population_count_statement(relation: Relation) -> str:
+        """creates the count * statement for a relation."""
+        raise NotImplementedError()
+
+    def population_size(self, relation: Relation) -> int:
+        """Returns the population size of a relation.
+
+        The catalog row count collected by :meth:`build_catalog` is used when available.
+        Relations that opt into exact counts, or that have no catalog row count (such as
+        views), are counted in the source instead.
+
+        Args:
+            relation: the :class:`Relation <snowshu.core.models.relation.Relation>` to size.
+
+        Returns:
+            the number of records in the unsampled relation.
+        """
+        if relation.exact_population_count or relation.row_count is None:
+            logger.debug('Counting population for relation %s in source...', relation.dot_notation)
+            return self.scalar_query(self.population_count_statement(relation))
+        logger.debug('Using catalog row count of %s for relation %s.', relation.row_count, relation.dot_notation)
+        return relation.row_count
+
+    @staticmethod
+    def recency_window_start_statement(relation: Relation,
+                                       attribute: str,
+                                       days: Optional[int] = None,
+                                       partitions: Optional[int] = None) -> str:
+        """creates the statement that returns the earliest value of the most recent days or partitions."""
+        raise NotImplementedError()
+
+    @staticmethod
+    def recency_window_statement(relation: Relation,
+                                 attribute: str,
+                                 window_start: Any) -> str:
+        """creates the statement that selects the records from the start of a recency window."""
+        raise NotImplementedError()
+
+    def recency_window(self,
+                       relation: Relation,
+                       attribute: str,
+                       days: Optional[int] = None,
+                       partitions: Optional[int] = None) -> Tuple[Any, int]:
+        """Finds the most recent records of a relation by a timestamp attribute.
+
+        Args:
+            relation: the :class:`Relation <snowshu.core.models.relation.Relation>` to find the window of.
+            attribute: the timestamp or date attribute ordering the records.
+            days: the number of days up to the latest value of the attribute to select.
+            partitions: the number of most recent dates of the attribute to select, used instead of days.
+
+        Returns:
+            the start of the window and the number of records in it, ``None`` and 0 for empty relations.
+        """
+        window_start = self.scalar_query(self.recency_window_start_statement(relation, attribute, days, partitions))
+        if window_start is None or pd.isna(window_start):
+            return None, 0
+        logger.debug('Recency window of relation %s starts at %s.', relation.dot_notation, window_start)
+        return window_start, self._count_query(self.recency_window_statement(relation, attribute, window_start))
+
+    @staticmethod
+    def view_creation_statement(relation: Relation) -> str:
+        """creates the statement that returns the SELECT statement defining a view."""
+        raise NotImplementedError()
+
+    def view_ddl(self, relation: Relation) -> str:
+        """Returns the SELECT statement that defines a view in the source.
+
+        Args:
+            relation: the view :class:`Relation <snowshu.core.models.relation.Relation>`.
+
+        Returns:
+            the view definition, which can be used to create the view in a target.
+        """
+        return self.scalar_query(self.view_creation_statement(relation))
+
+    @staticmethod
+    def analyze_union_statement(relations: Iterable[Relation]) -> str:
+        """combines the analyze queries of many relations into a single statement."""
+        raise NotImplementedError()
+
+    def analyze_relations(self, relations: Iterable[Relation]) -> pd.DataFrame:
+        """Runs the compiled analyze queries of the relations as a single query.
+
+        Args:
+            relations: the :class:`Relations <snowshu.core.models.relation.Relation>` to analyze,
+                each with an analyze ``compiled_query``.
+
+        Returns:
+            a dataframe with one row per relation and columns ``relation`` (the relation dot notation),
+            ``population_size`` and ``sample_size``.
+        """
+        return self._safe_query(self.analyze_union_statement(relations))
+
     def scalar_query(self, query: str) -> Any:
         """Returns only a single value.
 
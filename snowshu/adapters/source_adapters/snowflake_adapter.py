@@ -1,11 +1,15 @@
+import re
+import threading
 import time
-from typing import TYPE_CHECKING, Any, List, Optional, Union
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 import sqlalchemy
 import tenacity
 from overrides import overrides
 from sqlalchemy.pool import NullPool
+from tenacity.retry import retry_if_not_exception_type
 from tenacity.stop import stop_after_attempt
 from tenacity.wait import wait_exponential
 
@@ -16,9 +20,12 @@ from snowshu.core.models.attribute import Attribute
 from snowshu.core.models.credentials import (ACCOUNT, DATABASE, PASSWORD, ROLE,
                                              SCHEMA, USER, WAREHOUSE)
 from snowshu.core.models.relation import Relation
-from snowshu.exceptions import TooManyRecords
+from snowshu.exceptions import QueryCancelled, TooManyRecords
 from snowshu.logger import Logger
-from snowshu.samplings.sample_methods import BernoulliSampleMethod
+from snowshu.samplings.sample_methods import (BernoulliSampleMethod,
+                                              KeyHashSampleMethod,
+                                              RecencyWindowSampleMethod,
+                                              SystemSampleMethod)
 
 if TYPE_CHECKING:
     from snowshu.core.samplings.bases.base_sample_method import BaseSampleMethod
@@ -36,12 +43,15 @@ class SnowflakeAdapter(BaseSourceAdapter):
 
     name = 'snowflake'
     SUPPORTS_CROSS_DATABASE = True
+    SUPPORTS_SLICED_EXTRACTION = True
     SUPPORTED_FUNCTIONS = set(['ANY_VALUE', 'RLIKE', 'UUID_STRING'])
-    SUPPORTED_SAMPLE_METHODS = (BernoulliSampleMethod,)
+    SUPPORTED_SAMPLE_METHODS = (BernoulliSampleMethod, SystemSampleMethod, KeyHashSampleMethod,
+                                RecencyWindowSampleMethod,)
     REQUIRED_CREDENTIALS = (USER, PASSWORD, ACCOUNT, DATABASE,)
     ALLOWED_CREDENTIALS = (SCHEMA, WAREHOUSE, ROLE,)
     # snowflake in-db is UPPER, but connector is actually lower :(
     DEFAULT_CASE = 'lower'
+    VIEW_DEFINITION_BODY = re.compile(r'\sAS\s', re.IGNORECASE)
 
     DATA_TYPE_MAPPINGS = {
         "array": dtypes.JSON,
@@ -99,6 +109,12 @@ class SnowflakeAdapter(BaseSourceAdapter):
             f'Done. Found {len(schemas)} schemas in {database} database.')
         return schemas
 
+    def __init__(self, preserve_case: bool = False):
+        super().__init__(preserve_case)
+        self._view_ddls = dict()
+        self._view_ddl_locks = dict()
+        self._view_ddl_lock = threading.Lock()
+
     @staticmethod
     def population_count_statement(relation: Relation) -> str:
         """creates the count * statement for a relation
@@ -114,15 +130,104 @@ class SnowflakeAdapter(BaseSourceAdapter):
     def view_creation_statement(relation: Relation) -> str:
         return f"""
 SELECT
-SUBSTRING(GET_DDL('view','{relation.quoted_dot_notation}'),
-POSITION(' AS ' IN UPPER(GET_DDL('view','{relation.quoted_dot_notation}')))+3)
+SUBSTRING(ddl, POSITION(' AS ' IN UPPER(ddl))+3)
+FROM
+(SELECT GET_DDL('view','{relation.quoted_dot_notation}') AS ddl)
+"""
+
+    @staticmethod
+    def schema_view_definitions_statement(relation: Relation) -> str:
+        """creates the statement that returns the definition of every view in the schema of a relation."""
+        return f"""
+SELECT
+    table_name AS relation
+    ,view_definition AS definition
+FROM
+    {relation.quoted(relation.database)}.INFORMATION_SCHEMA.VIEWS
+WHERE
+    UPPER(table_schema) = UPPER('{relation.schema}')
 """
 
+    @overrides
+    def view_ddl(self, relation: Relation) -> str:
+        """Returns the SELECT statement that defines a view in the source.
+
+        The definitions of every view in the schema are retrieved in a single query the first
+        time a view in that schema is requested, and cached for the life of the adapter.
+        Views without a visible definition (such as secure views) fall back to GET_DDL.
+
+        Args:
+            relation: the view :class:`Relation <snowshu.core.models.relation.Relation>`.
+
+        Returns:
+            the view definition, which can be used to create the view in a target.
+        """
+        schema_key = (relation.database.lower(), relation.schema.lower(),)
+        with self._view_ddl_lock:
+            schema_lock = self._view_ddl_locks.setdefault(schema_key, threading.Lock())
+        with schema_lock:
+            if schema_key not in self._view_ddls:
+                logger.debug(f'Retrieving view definitions for schema {relation.database}.{relation.schema}...')
+                definitions = self._safe_query(self.schema_view_definitions_statement(relation))
+                self._view_ddls[schema_key] = {
+                    row.relation.lower(): self._view_definition_body(row.definition)
+                    for row in definitions.itertuples() if isinstance(row.definition, str)}
+                logger.debug(f'Retrieved {len(self._view_ddls[schema_key])} view definitions '
+                             f'for schema {relation.database}.{relation.schema}.')
+        ddl = self._view_ddls[schema_key].get(relation.name.lower())
+        return super().view_ddl(relation) if ddl is None else ddl
+
+    @classmethod
+    def _view_definition_body(cls, definition: str) -> str:
+        """strips the CREATE VIEW clause from a view definition, leaving its SELECT statement."""
+        match = cls.VIEW_DEFINITION_BODY.search(definition)
+        return definition if match is None else definition[match.end() - 1:]
+
+    @staticmethod
+    def recency_window_start_statement(relation: Relation,
+                                       attribute: str,
+                                       days: Optional[int] = None,
+                                       partitions: Optional[int] = None) -> str:
+        if partitions is not None:
+            return f"""
+SELECT
+    MIN(partition_date)
+FROM
+    (SELECT DISTINCT TO_DATE({attribute}) AS partition_date
+     FROM {relation.quoted_dot_notation}
+     WHERE {attribute} IS NOT NULL
+     ORDER BY partition_date DESC
+     LIMIT {int(partitions)})
+"""
+        return f"""
+SELECT
+    DATEADD(day, -{int(days)}, MAX({attribute}))
+FROM
+    {relation.quoted_dot_notation}
+"""
+
+    @staticmethod
+    def recency_window_statement(relation: Relation,
+                                 attribute: str,
+                                 window_start: Any) -> str:
+        return f"""
+SELECT
+    {relation.projection}
+FROM
+    {relation.quoted_dot_notation}
+WHERE {SnowflakeAdapter._recency_window_predicate(attribute, window_start)}
+"""
+
+    @staticmethod
+    def _recency_window_predicate(attribute: str, window_start: Any) -> str:
+        """a literal window start, so the source can prune by it before running the query."""
+        return f"{attribute} >= '{window_start}'"
+
     @staticmethod
     def unsampled_statement(relation: Relation) -> str:
         return f"""
 SELECT
-    *
+    {relation.projection}
 FROM
     {relation.quoted_dot_notation}
 """
@@ -140,11 +245,7 @@ WITH
 {sql}
 )
 ,{relation.scoped_cte('SNOWSHU_DIRECTIONAL_SAMPLE')} AS (
-SELECT
-    *
-FROM
-{relation.scoped_cte('SNOWSHU_FINAL_SAMPLE')}
-{self._sample_type_to_query_sql(sample_type)}
+{self._directional_sample_statement(relation, sample_type)}
 )
 SELECT
     *
@@ -152,6 +253,55 @@ FROM
 {relation.scoped_cte('SNOWSHU_DIRECTIONAL_SAMPLE')}
 """
 
+    def _directional_sample_statement(self, relation: Relation, sample_type: 'BaseSampleMethod') -> str:
+        """samples the final sample CTE of a relation."""
+        if sample_type.name == 'KEY_HASH':
+            return f"""SELECT
+    *
+FROM
+{relation.scoped_cte('SNOWSHU_FINAL_SAMPLE')}
+WHERE {self._key_hash_predicate(sample_type)}"""
+        if sample_type.name == 'RECENCY_WINDOW':
+            return self._row_sample_statement(f"""(SELECT
+    *
+FROM
+{relation.scoped_cte('SNOWSHU_FINAL_SAMPLE')}
+WHERE {self._recency_window_predicate(sample_type.attribute, sample_type.window_start)})""",
+                                              BernoulliSampleMethod(sample_type.rows, seed=sample_type.seed))
+        if sample_type.name == 'SYSTEM':
+            # blocks cannot be sampled from a CTE, so it is row sampled instead
+            sample_type = BernoulliSampleMethod(sample_type.rows, seed=sample_type.seed) if sample_type.rows \
+                else BernoulliSampleMethod(sample_type.probability, units='probability', seed=sample_type.seed)
+        return self._row_sample_statement(relation.scoped_cte('SNOWSHU_FINAL_SAMPLE'), sample_type)
+
+    def _row_sample_statement(self, source: str, sample_type: BernoulliSampleMethod) -> str:
+        """row samples a CTE or subquery.
+
+        SAMPLE ... SEED is not allowed on CTEs or subqueries, so seeded samples rank the records
+        by a seeded hash of their values instead, which selects the same records on every run.
+        The ranked sample is wrapped in a subquery so outliers can still be unioned onto it.
+        """
+        if sample_type.seed is None:
+            return f"""SELECT
+    *
+FROM
+{source}
+{self._sample_type_to_query_sql(sample_type)}"""
+
+        hashed = f"""SELECT
+    * EXCLUDE __snowshu_record_hash
+FROM
+    (SELECT *, HASH(*) AS __snowshu_record_hash FROM {source})"""
+        seeded_hash = f"HASH(__snowshu_record_hash, {int(sample_type.seed)})"
+        if sample_type.probability:
+            return f"{hashed}\nWHERE ABS(MOD({seeded_hash}, 1000000)) < {float(sample_type.probability) * 10000}"
+        return f"""SELECT
+    *
+FROM
+({hashed}
+ORDER BY {seeded_hash}
+LIMIT {int(sample_type.rows)})"""
+
     @staticmethod
     def analyze_wrap_statement(sql: str, relation: Relation) -> str:
         return f"""
@@ -183,38 +333,88 @@ ON
 LIMIT 1
 """
 
+    @staticmethod
+    def analyze_union_statement(relations: Iterable[Relation]) -> str:
+        """combines the analyze queries of the relations with UNION ALL.
+
+        Args:
+            relations: the :class:`Relations <snowshu.core.models.relation.Relation>` to analyze,
+                each with a ``compiled_query`` built by :meth:`analyze_wrap_statement`.
+        Returns:
+            a query that results in one row per relation with the columns relation, population_size and sample_size
+        """
+        return "UNION ALL".join([f"""
+SELECT
+    '{relation.dot_notation.replace("'", "''")}' AS relation
+    ,population_size
+    ,sample_size
+FROM (
+{relation.compiled_query}
+)
+""" for relation in relations])
+
     def sample_statement_from_relation(
             self, relation: Relation, sample_type: Union['BaseSampleMethod', None]) -> str:
         """builds the base sample statment for a given relation."""
         query = f"""
 SELECT
-    *
+    {relation.projection}
 FROM
     {relation.quoted_dot_notation}
 """
-        if sample_type is not None:
-            query += f"{self._sample_type_to_query_sql(sample_type)}"
+        if sample_type is None:
+            return query
+        if sample_type.name == 'KEY_HASH':
+            return query + f"WHERE {self._key_hash_predicate(sample_type)}"
+        if sample_type.name == 'RECENCY_WINDOW':
+            # the window is filtered before sampling so the rest of the relation can be pruned
+            windowed = self.recency_window_statement(relation, sample_type.attribute, sample_type.window_start)
+            return self._row_sample_statement(f"(\n{windowed}\n)",
+                                              BernoulliSampleMethod(sample_type.rows, seed=sample_type.seed))
+        query += f"{self._sample_type_to_query_sql(sample_type, getattr(relation, 'population_size', None))}"
+        if sample_type.name == 'SYSTEM' and sample_type.rows:
+            # block sizes vary, so the oversampled blocks are row sampled down to the sample size
+            query = self._row_sample_statement(f"(\n{query}\n)",
+                                               BernoulliSampleMethod(sample_type.rows, seed=sample_type.seed))
         return query
 
+    @staticmethod
+    def slice_statement(query: str, slices: int, slice_index: int) -> str:
+        """selects one of the hash buckets that split the records of a query into slices."""
+        return f"""
+SELECT
+    *
+FROM (
+{query}
+) AS __snowshu_slice
+WHERE MOD(ABS(HASH(*)), {slices}) = {slice_index}
+"""
+
     @staticmethod
     def union_constraint_statement(subject: Relation,
-                                   constraint: Relation,
-                                   subject_key: str,
-                                   constraint_key: str,
+                                   constraints: List[Tuple[Relation, str, str]],
                                    max_number_of_outliers: int) -> str:
-        """ Union statements to select outliers. This does not pull in NULL values. """
+        """ Union statement to select outliers, the records breaking any of the relationships of a relation.
+
+        The relation is scanned once for all relationships, and each constraint relation is anti-joined on its key
+        with NOT EXISTS. This does not pull in NULL values.
+
+        Args:
+            subject: the relation to select outliers from.
+            constraints: the constraint relation, subject key and constraint key of every relationship.
+            max_number_of_outliers: the maximum number of outliers to select.
+        """
+        conditions = "\n    OR ".join([f"""({subject_key} IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM {constraint.quoted_dot_notation} AS __snowshu_constraint
+        WHERE __snowshu_constraint.{constraint_key} = __snowshu_subject.{subject_key}))"""
+            for constraint, subject_key, constraint_key in constraints])
         return f"""
 (SELECT
-    *
+    {subject.projection}
 FROM
-{subject.quoted_dot_notation}
+{subject.quoted_dot_notation} AS __snowshu_subject
 WHERE
-    {subject_key}
-NOT IN
-(SELECT
-    {constraint_key}
-FROM
-{constraint.quoted_dot_notation})
+    {conditions}
 LIMIT {max_number_of_outliers})
 """
 
@@ -242,7 +442,8 @@ LIMIT {max_number_of_outliers})
             try:
                 constraint_set = [
                     quoted(val) for val in relation.data[remote_key].unique()]
-                constraint_sql = ','.join(constraint_set)
+                # an empty upstream relation constrains to no records, and IN () is not valid sql
+                constraint_sql = ','.join(constraint_set) or 'NULL'
             except KeyError as err:
                 logger.critical(
                     f'failed to build predicates for {relation.dot_notation}: '
@@ -252,18 +453,48 @@ LIMIT {max_number_of_outliers})
         return f"{local_key} IN ({constraint_sql}) "
 
     @staticmethod
-    def _sample_type_to_query_sql(sample_type: 'BaseSampleMethod') -> str:
+    def _sample_type_to_query_sql(sample_type: 'BaseSampleMethod',
+                                  population_size: Optional[int] = None) -> str:
+        """renders a sample method as a SAMPLE clause.
+
+        Fixed-size samples cannot be seeded, so seeded samples in rows are rendered as the
+        equivalent percent of the population size.
+        """
+        seed = '' if sample_type.seed is None else f" SEED ({int(sample_type.seed)})"
         if sample_type.name == 'BERNOULLI':
-            qualifier = sample_type.probability if sample_type.probability\
-                else str(sample_type.rows) + ' ROWS'
-            return f"SAMPLE BERNOULLI ({qualifier})"
+            if sample_type.probability:
+                qualifier = sample_type.probability
+            elif seed:
+                qualifier = SnowflakeAdapter._rows_to_percent(sample_type.rows, population_size)
+            else:
+                return f"SAMPLE BERNOULLI ({sample_type.rows} ROWS)"
+            return f"SAMPLE BERNOULLI ({SnowflakeAdapter._percent_literal(qualifier)}){seed}"
         if sample_type.name == 'SYSTEM':
-            return f"SAMPLE SYSTEM ({sample_type.probability})"
+            return f"SAMPLE SYSTEM ({SnowflakeAdapter._percent_literal(sample_type.probability)}){seed}"
 
         message = f"{sample_type.name} is not supported for SnowflakeAdapter"
         logger.error(message)
         raise NotImplementedError(message)
 
+    @staticmethod
+    def _key_hash_predicate(sample_type: KeyHashSampleMethod) -> str:
+        """selects the records whose key hashes into the selected buckets."""
+        hashed = sample_type.key if sample_type.seed is None else f"{sample_type.key}, {int(sample_type.seed)}"
+        return f"MOD(ABS(HASH({hashed})), {int(sample_type.buckets)}) < {int(sample_type.selected_buckets)}"
+
+    @staticmethod
+    def _rows_to_percent(rows: int, population_size: Optional[int]) -> float:
+        """the percent of the population a sample of rows is, 100 when the population size is unknown."""
+        if not isinstance(population_size, (int, float,)) or population_size <= 0:
+            return 100
+        return min(100, 100.0 * rows / population_size)
+
+    @staticmethod
+    def _percent_literal(percent: Union[int, float]) -> str:
+        """renders a percent without scientific notation, which SAMPLE does not accept."""
+        return np.format_float_positional(percent, precision=10, trim='-') if isinstance(percent, float) \
+            else str(percent)
+
     # TODO: change arg name in parent to the fix issue here
     @overrides
     def _build_conn_string(self, overrides: Optional[dict] = None) -> str:  # noqa pylint: disable=redefined-outer-name
@@ -292,6 +523,9 @@ LIMIT {max_number_of_outliers})
                                     m.table_schema AS schema,
                                     m.table_name AS relation,
                                     m.table_type AS materialization,
+                                    m.row_count AS row_count,
+                                    m.bytes AS size_in_bytes,
+                                    m.last_altered AS last_altered,
                                     c.column_name AS attribute,
                                     c.ordinal_position AS ordinal,
                                     c.data_type AS data_type
@@ -338,6 +572,11 @@ LIMIT {max_number_of_outliers})
                                 self._correct_case(attribute.relation),   # noqa pylint: disable=undefined-loop-variable
                                 self.MATERIALIZATION_MAPPINGS[attribute.materialization],   # noqa pylint: disable=undefined-loop-variable
                                 attributes)
+            # catalog sizes are NULL for views and anything the metadata does not track
+            sizes = (attribute.row_count, attribute.size_in_bytes,)  # noqa pylint: disable=undefined-loop-variable
+            relation.row_count, relation.size_in_bytes = [None if pd.isna(val) else int(val) for val in sizes]
+            last_altered = attribute.last_altered  # noqa pylint: disable=undefined-loop-variable
+            relation.last_altered = None if pd.isna(last_altered) else str(last_altered)
             logger.debug(f'Added relation {relation.dot_notation} to pool.')
             relations.append(relation)
 
@@ -354,6 +593,7 @@ LIMIT {max_number_of_outliers})
 
     @tenacity.retry(wait=wait_exponential(),
                     stop=stop_after_attempt(4),
+                    retry=retry_if_not_exception_type(QueryCancelled),
                     before_sleep=Logger().log_retries,
                     reraise=True)
     @overrides
@@ -383,6 +623,14 @@ LIMIT {max_number_of_outliers})
         response = self._safe_query(query)
         return response
 
+    @overrides
+    def _session_id(self, connection: sqlalchemy.engine.base.Connection) -> Optional[int]:
+        return getattr(connection.connection, 'session_id', None)
+
+    @staticmethod
+    def cancel_session_statement(session_id: int) -> str:
+        return f"SELECT SYSTEM$CANCEL_ALL_QUERIES({int(session_id)})"
+
     @overrides
     def get_connection(
             self,
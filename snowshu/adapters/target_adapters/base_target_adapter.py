@@ -1,12 +1,18 @@
+import hashlib
+import json
 import os
+import time
 from datetime import datetime
 from time import sleep
-from typing import TYPE_CHECKING, Iterable, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
 
 import pandas as pd
+from sqlalchemy import inspect
 
 from snowshu.adapters import BaseSQLAdapter
 from snowshu.configs import (DEFAULT_INSERT_CHUNK_SIZE,
+                             DEFAULT_TARGET_READY_TIMEOUT,
                              DOCKER_TARGET_CONTAINER, DOCKER_TARGET_PORT,
                              IS_IN_DOCKER)
 from snowshu.core.docker import SnowShuDocker
@@ -16,7 +22,7 @@ from snowshu.core.models import materializations as mz
 from snowshu.core.models.credentials import (DATABASE, HOST, PASSWORD, PORT,
                                              USER)
 from snowshu.core.utils import case_insensitive_dict_value
-from snowshu.logger import Logger
+from snowshu.logger import Logger, duration
 
 if TYPE_CHECKING:
     from docker.models.containers import Container
@@ -29,6 +35,8 @@ class BaseTargetAdapter(BaseSQLAdapter):
     REQUIRED_CREDENTIALS = [USER, PASSWORD, HOST, PORT, DATABASE]
     ALLOWED_CREDENTIALS = list()
     DOCKER_TARGET_PORT = DOCKER_TARGET_PORT
+    # type names the target reports for columns created with another name, such as aliases
+    TYPE_SYNONYMS = dict()
 
     def __init__(self):
         super().__init__()
@@ -42,6 +50,9 @@ class BaseTargetAdapter(BaseSQLAdapter):
 
         self.credentials = self._generate_credentials()
         self.container: "Container" = None
+        # docker resource options of the target container, such as shm_size, nano_cpus and mem_limit
+        self.container_resources = dict()
+        self.ready_timeout = DEFAULT_TARGET_READY_TIMEOUT
 
     def enable_cross_database(self, relations: Iterable['Relation']) -> None:
         """ Create x-database links, if available to the target.
@@ -65,6 +76,16 @@ class BaseTargetAdapter(BaseSQLAdapter):
         """
         raise NotImplementedError()
 
+    def image_initialize_bash_commands(self) -> List[str]:
+        """returns an ordered list of raw bash commands that prepare the target image, such as installing packages.
+
+        The commands are run once to build a local base image, which new target containers are started from.
+
+        Returns:
+            a list of strings to be run against the container in order.
+        """
+        return list()
+
     def create_database_if_not_exists(self, database: str) -> str:
         raise NotImplementedError()
 
@@ -102,7 +123,22 @@ AS
             raise exc
         logger.info('Created relation %s', relation.quoted_dot_notation)
 
-    def load_data_into_relation(self, relation: Relation) -> None:
+    def load_data_into_relation(self,
+                                relation: Relation,
+                                data: Optional[pd.DataFrame] = None,
+                                if_exists: str = 'replace') -> None:
+        """Creates a relation in the target and loads records into it.
+
+        Args:
+            relation: the :class:`Relation <snowshu.core.models.relation.Relation>` to load.
+            data: the records to load instead of the relation data, such as one slice of them.
+            if_exists: ``replace`` to recreate the relation, ``append`` to add to it.
+
+        A relation replaced with the same columns and column types, such as on a refresh, is emptied and
+        appended to instead of dropped. Otherwise the views that depend on it are dropped with it and
+        created again once it is loaded.
+        """
+        data = relation.data if data is None else data
         engine = self.get_connection(database_override=relation.database,
                                      schema_override=relation.schema)
         logger.info('Loading data into relation %s...', relation.quoted_dot_notation)
@@ -110,53 +146,173 @@ AS
             attribute_type_map = {attr.name: attr.data_type.sqlalchemy_type
                                   for attr in relation.attributes}
             data_type_map = {col: case_insensitive_dict_value(attribute_type_map, col)
-                             for col in relation.data.columns.to_list()}
-            relation.data.to_sql(relation.name,
-                                 engine,
-                                 schema=relation.schema,
-                                 if_exists='replace',
-                                 index=False,
-                                 dtype=data_type_map,
-                                 chunksize=DEFAULT_INSERT_CHUNK_SIZE,
-                                 method='multi')
+                             for col in data.columns.to_list()}
+            existing = self._existing_column_types(engine, relation) if if_exists == 'replace' else None
+            views = list()
+            if existing is not None:
+                if self._same_column_types(existing, data_type_map, engine.dialect):
+                    engine.execute(self.truncate_statement(relation))
+                    if_exists = 'append'
+                else:
+                    views = self.dependent_views(engine, relation)
+                    if views:
+                        engine.execute(f'DROP TABLE {relation.quoted_dot_notation} CASCADE')
+            try:
+                data.to_sql(relation.name,
+                            engine,
+                            schema=relation.schema,
+                            if_exists=if_exists,
+                            index=False,
+                            dtype=data_type_map,
+                            chunksize=DEFAULT_INSERT_CHUNK_SIZE,
+                            method='multi')
+            finally:
+                # views are created again even if loading failed after creating the relation, so a retry keeps them
+                for view, definition in views:
+                    engine.execute(f'CREATE VIEW {view} AS\n{definition}')
         except Exception as exc:
             logger.info("Exception encountered loading data into %s:%s", relation.quoted_dot_notation, exc)
             raise exc
         logger.info('Data loaded into relation %s', relation.quoted_dot_notation)
 
-    def initialize_replica(self, source_adapter_name: str) -> None:
+    @staticmethod
+    def truncate_statement(relation: Relation) -> str:
+        """empties a relation without dropping it."""
+        return f'TRUNCATE TABLE {relation.quoted_dot_notation}'
+
+    def dependent_views(self,
+                        engine,  # noqa pylint: disable=unused-argument
+                        relation: Relation) -> List[Tuple[str, str]]:  # noqa pylint: disable=unused-argument
+        """Finds the views in the target that select from a relation, directly or through other views.
+
+        Returns:
+            the quoted name and definition of every dependent view, in the order to create them.
+        """
+        return list()
+
+    @staticmethod
+    def _existing_column_types(engine, relation: Relation) -> Optional[dict]:
+        """the column types of a relation already in the target by column name, None if it is not."""
+        if not engine.has_table(relation.name, schema=relation.schema):
+            return None
+        return {column['name']: column['type']
+                for column in inspect(engine).get_columns(relation.name, schema=relation.schema)}
+
+    def _same_column_types(self, existing: dict, expected: dict, dialect) -> bool:
+        """checks if existing columns have the names and types of the expected ones, as the target names the types."""
+        def type_name(sql_type) -> str:
+            name = sql_type.compile(dialect=dialect)
+            return self.TYPE_SYNONYMS.get(name, name)
+
+        return existing.keys() == expected.keys() and all(
+            expected[name] is not None and type_name(expected[name]) == type_name(existing[name])
+            for name in expected)
+
+    def initialize_replica(self,
+                           source_adapter_name: str,
+                           resume: bool = False,
+                           replica_name: Optional[str] = None) -> None:
         """shimming but will want to move _init_image public with this
         interface.
 
         Args:
             source_adapter_name: the classname of the source adapter
+            resume: reattach to the target container left by an unfinished build instead of creating one
+            replica_name: start the target container from this existing replica instead of an empty image
         """
-        self._init_image(source_adapter_name)
+        if resume:
+            self._resume_image()
+        else:
+            self._init_image(source_adapter_name, replica_name)
 
-    def _init_image(self, source_adapter_name: str) -> None:
+    def _resume_image(self) -> None:
+        shdocker = SnowShuDocker()
+        logger.info('Resuming existing target container...')
+        self.container = shdocker.get_existing_container(DOCKER_TARGET_CONTAINER)
+        self.wait_until_ready()
+        logger.info('Container resumed.')
+
+    def _init_image(self, source_adapter_name: str, replica_name: Optional[str] = None) -> None:
         shdocker = SnowShuDocker()
         logger.info('Initializing target container...')
+        image = shdocker.get_or_build_base_image(self) if replica_name is None else \
+            shdocker.find_replica_image(replica_name).tags[0]
         self.container = shdocker.startup(
-            self.DOCKER_IMAGE,
+            image,
             self.DOCKER_START_COMMAND,
             self.DOCKER_TARGET_PORT,
             self,
             source_adapter_name,
             self._build_snowshu_envars(
-                self.DOCKER_SNOWSHU_ENVARS))
+                self.DOCKER_SNOWSHU_ENVARS),
+            run_setup=False,
+            container_options=self._container_options(replica_name))
         logger.info('Container initialized.')
-        while not self.target_database_is_ready():
-            sleep(.5)
-        self._initialize_snowshu_meta_database()
+        self.wait_until_ready()
+        self._apply_build_settings()
+        if replica_name is None:
+            self._initialize_snowshu_meta_database()
+
+    def _container_options(self, replica_name: Optional[str] = None) -> dict:  # noqa pylint: disable=unused-argument
+        """extra docker options to create the target container with,
+        when building a new replica or from replica_name."""
+        return dict(self.container_resources)
+
+    def _apply_build_settings(self) -> None:
+        """tunes the target database for bulk loading, durability is restored by finalize_replica."""
+
+    def _restore_durable_settings(self) -> None:
+        """undoes _apply_build_settings and flushes everything loaded to disk."""
+
+    def vacuum_relations(self, relations: Iterable[Relation], threads: int = 1) -> None:
+        """collects statistics and settles the storage of loaded relations, so a new replica needs no maintenance."""
 
     def target_database_is_ready(self) -> bool:
         return self.container.exec_run(
             self.DOCKER_READY_COMMAND).exit_code == 0
 
-    def finalize_replica(self) -> str:
+    def wait_until_ready(self) -> None:
+        """Waits for the target database in the container to accept connections.
+
+        The ready command is run in the container with exponential backoff between attempts.
+
+        Raises:
+            SystemError: if the container stops before the database is ready.
+            TimeoutError: if the database is not ready within ``ready_timeout`` seconds.
+        """
+        start = time.time()
+        delay = .1
+        while not self.target_database_is_ready():
+            self.container.reload()
+            if self.container.status in ('exited', 'dead',):
+                message = (f'Target container {self.container.name} stopped before the database was ready:\n'
+                           f'{self.container.logs(tail=20).decode(errors="replace")}')
+                logger.critical(message)
+                raise SystemError(message)
+            if time.time() - start > self.ready_timeout:
+                message = (f'Target database was not ready after {self.ready_timeout} seconds:\n'
+                           f'{self.container.logs(tail=20).decode(errors="replace")}')
+                logger.critical(message)
+                raise TimeoutError(message)
+            sleep(delay)
+            delay = min(delay * 2, 5)
+        logger.info('Target database ready in %s.', duration(start))
+
+    def discard_replica(self) -> None:
+        """removes the target container without creating a replica from it."""
+        logger.info('Discarding target container...')
+        SnowShuDocker().remove_container(self.container.name)
+
+    def finalize_replica(self, relations: Iterable[Relation] = tuple(), threads: int = 1) -> str:
         """returns the image name of the completed replica.
+
+        Args:
+            relations: the relations loaded by the build, vacuumed before the image is created.
+            threads: the number of relations to vacuum at once.
         """
         shdocker = SnowShuDocker()
+        self.vacuum_relations(relations, threads)
+        self._restore_durable_settings()
         logger.info('Finalizing target container into replica...')
         replica_image = shdocker.convert_container_to_replica(self.replica_meta['name'],
                                                               self.container,
@@ -189,28 +345,93 @@ AS
     def _initialize_snowshu_meta_database(self) -> None:
         self.create_database_if_not_exists('snowshu')
         self.create_schema_if_not_exists('snowshu', 'snowshu')
+        self.update_replica_meta(dict())
+
+    @staticmethod
+    def _replica_meta_relation() -> Relation:
         attributes = [
             Attribute('created_at', dt.TIMESTAMP_TZ),
             Attribute('name', dt.VARCHAR),
             Attribute('short_description', dt.VARCHAR),
-            Attribute('long_description', dt.VARCHAR)]
+            Attribute('long_description', dt.VARCHAR),
+            Attribute('relations', dt.JSON)]
 
-        relation = Relation(
+        return Relation(
             "snowshu",
             "snowshu",
             "replica_meta",
             mz.TABLE,
             attributes)
 
+    def update_replica_meta(self, relations_meta: dict) -> None:
+        """(Re)writes the snowshu.replica_meta relation in the target.
+
+        Args:
+            relations_meta: the source metadata of every relation in the replica, keyed by relation dot notation.
+        """
+        relation = self._replica_meta_relation()
         relation.data = pd.DataFrame(
             [
                 dict(
                     created_at=datetime.now(),
                     name=self.replica_meta['name'],
                     short_description=self.replica_meta['short_description'],
-                    long_description=self.replica_meta['long_description'])])
+                    long_description=self.replica_meta['long_description'],
+                    relations=relations_meta)])
         self.create_and_load_relation(relation)
 
+    def get_replica_meta(self) -> dict:
+        """Returns the source metadata of every relation recorded in snowshu.replica_meta.
+
+        Replicas built before relation metadata was recorded return an empty dict.
+        """
+        relation = self._replica_meta_relation()
+        engine = self.get_connection(database_override=relation.database,
+                                     schema_override=relation.schema)
+        try:
+            frame = pd.read_sql_query(f'SELECT * FROM {relation.schema}.{relation.name}', engine)
+        finally:
+            engine.dispose()
+        if frame.empty or 'relations' not in frame.columns:
+            return dict()
+        relations_meta = frame['relations'].iloc[0]
+        return json.loads(relations_meta) if isinstance(relations_meta, str) else relations_meta or dict()
+
+    @staticmethod
+    def create_index_statement(relation: Relation, attributes: Tuple[str, ...]) -> str:
+        """creates the statement that builds a b-tree index on attributes of a relation."""
+        # index names are limited in length, so they are named by a digest of the relation and attributes
+        digest = hashlib.md5(f'{relation.dot_notation}({",".join(attributes)})'.encode()).hexdigest()[:16]
+        # columns keep the case of the loaded data, so mixed case names only match quoted
+        columns = ','.join(f'"{attribute}"' for attribute in attributes)
+        return (f'CREATE INDEX IF NOT EXISTS snowshu_index_{digest} '
+                f'ON {relation.quoted_dot_notation} ({columns})')
+
+    def create_indexes(self,
+                       indexes: Dict[Relation, List[Tuple[str, ...]]],
+                       threads: int = 1) -> None:
+        """Builds indexes on loaded relations, the indexes of each relation in parallel with other relations.
+
+        Args:
+            indexes: the attribute names of every index to build, by relation.
+            threads: the number of relations to build indexes on at once.
+        """
+        def index_relation(relation: Relation, relation_indexes: List[Tuple[str, ...]]) -> None:
+            conn = self.get_connection(database_override=relation.database,
+                                       schema_override=relation.schema)
+            try:
+                for attributes in relation_indexes:
+                    logger.debug('Indexing %s on %s...', relation.quoted_dot_notation, ','.join(attributes))
+                    conn.execute(self.create_index_statement(relation, attributes))
+            finally:
+                conn.dispose()
+            logger.info('Created %s indexes on %s.', len(relation_indexes), relation.quoted_dot_notation)
+
+        with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+            for future in [executor.submit(index_relation, relation, relation_indexes)
+                           for relation, relation_indexes in indexes.items() if relation_indexes]:
+                future.result()
+
     def create_function_if_available(self,
                                      function: str,
                                      relations: Iterable['Relation']) -> None:
@@ -1,4 +1,5 @@
-from typing import TYPE_CHECKING, Iterable, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
 from overrides import overrides
 
 import sqlalchemy
@@ -9,6 +10,7 @@ from snowshu.core.models import materializations as mz
 from snowshu.logger import Logger
 
 if TYPE_CHECKING:
+    import pandas as pd
     from snowshu.core.models.relation import Relation
 
 logger = Logger().logger
@@ -21,6 +23,21 @@ class PostgresAdapter(BaseTargetAdapter):
     PRELOADED_PACKAGES = ['postgresql-plpython3-12']
     MATERIALIZATION_MAPPINGS = dict(TABLE=mz.TABLE, VIEW=mz.VIEW)
     DOCKER_REMOUNT_DIRECTORY = DOCKER_REMOUNT_DIRECTORY
+    DOCKER_DATA_DIRECTORY = '/var/lib/postgresql/data'
+    PG_DATA_OPTIONS = ('tmpfs', 'remount',)
+
+    # replicas are snapshotted once loaded, so nothing needs to survive a crash mid build
+    BUILD_SETTINGS = dict(fsync='off',
+                          synchronous_commit='off',
+                          full_page_writes='off',
+                          wal_level='minimal',
+                          max_wal_senders='0',
+                          max_wal_size='4GB',
+                          checkpoint_timeout='1h',
+                          maintenance_work_mem='512MB',
+                          shared_buffers='512MB')
+    RESTART_SETTINGS = ('wal_level', 'max_wal_senders', 'shared_buffers',)
+    TYPE_SYNONYMS = {'FLOAT': 'DOUBLE PRECISION', 'DECIMAL': 'NUMERIC'}
 
     # NOTE: either start container with db listening on port 9999,
     # or override with DOCKER_TARGET_PORT
@@ -34,6 +51,23 @@ class PostgresAdapter(BaseTargetAdapter):
 
         self.extensions = kwargs.get("pg_extensions", list())
         self.x00_replacement = kwargs.get("pg_0x00_replacement", "")
+        self.pg_data = kwargs.get("pg_data")
+        if self.pg_data is not None and self.pg_data not in self.PG_DATA_OPTIONS:
+            raise ValueError(f'pg_data must be one of {", ".join(self.PG_DATA_OPTIONS)}, not {self.pg_data}.')
+        for arg, option in (('docker_shm_size', 'shm_size',), ('docker_memory', 'mem_limit',),):
+            if kwargs.get(arg) is not None:
+                self.container_resources[option] = kwargs[arg]
+        if kwargs.get("docker_ready_timeout") is not None:
+            self.ready_timeout = kwargs["docker_ready_timeout"]
+        if kwargs.get("docker_cpus") is not None:
+            self.container_resources['nano_cpus'] = int(float(kwargs["docker_cpus"]) * 1e9)
+        self.build_settings = {setting: value for setting, value in
+                               {**self.BUILD_SETTINGS, **kwargs.get("pg_build_settings", dict())}.items()
+                               if value is not None}
+        if self.pg_data == 'tmpfs':
+            # tmpfs is emptied when the container restarts, so settings that need a restart are left out
+            self.build_settings = {setting: value for setting, value in self.build_settings.items()
+                                   if setting not in self.RESTART_SETTINGS}
 
         self.DOCKER_START_COMMAND = f'postgres -p {self._credentials.port}' # noqa pylint: disable=invalid-name
         self.DOCKER_READY_COMMAND = (f'pg_isready -p {self._credentials.port} ' # noqa pylint: disable=invalid-name
@@ -82,35 +116,159 @@ class PostgresAdapter(BaseTargetAdapter):
                 raise sql_errs
 
     @overrides
-    def load_data_into_relation(self, relation: "Relation") -> None:
+    def _container_options(self, replica_name: Optional[str] = None) -> dict:
+        options = super()._container_options(replica_name)
+        # containers started from a replica already keep their data in the remount directory
+        if replica_name is None and self.pg_data == 'tmpfs':
+            # built in memory and copied to the remount directory once by image_finalize_bash_commands
+            options['tmpfs'] = {self.DOCKER_DATA_DIRECTORY: ''}
+        if replica_name is None and self.pg_data == 'remount':
+            # built in place, so there is nothing to copy when finalizing
+            options['environment'] = [f'PGDATA=/{DOCKER_REMOUNT_DIRECTORY}']
+        return options
+
+    @overrides
+    def _apply_build_settings(self) -> None:
+        if not self.build_settings:
+            return
+        logger.info('Applying build settings to target database...')
+        conn = self.get_connection()
+        try:
+            for setting, value in self.build_settings.items():
+                conn.execute(f"ALTER SYSTEM SET {setting} = '{value}'")
+            conn.execute('SELECT pg_reload_conf()')
+        finally:
+            conn.dispose()
+        if set(self.RESTART_SETTINGS) & set(self.build_settings):
+            logger.info('Restarting target database to apply build settings...')
+            self.container.restart()
+            self.wait_until_ready()
+        logger.info('Build settings applied.')
+
+    @overrides
+    def _restore_durable_settings(self) -> None:
+        logger.info('Restoring durable settings and checkpointing target database...')
+        conn = self.get_connection()
+        try:
+            if self.build_settings:
+                for setting in self.build_settings:
+                    conn.execute(f'ALTER SYSTEM RESET {setting}')
+                conn.execute('SELECT pg_reload_conf()')
+            # replicas start from a clean checkpoint instead of replaying the build's WAL
+            conn.execute('CHECKPOINT')
+        finally:
+            conn.dispose()
+        # pages written while fsync was off may still only be in the os cache
+        response = self.container.exec_run('sync')
+        if response[0] > 0:
+            raise OSError(response[1])
+        logger.info('Durable settings restored.')
+
+    @overrides
+    def vacuum_relations(self, relations: Iterable["Relation"], threads: int = 1) -> None:
+        """Freezes and analyzes the loaded tables.
+
+        Frozen rows need no hint bits set or anti-wraparound vacuum on first read, and
+        analyzed tables have planner statistics before the first query.
+        """
+        tables = [relation for relation in relations if not relation.is_view]
+        if not tables:
+            return
+
+        def vacuum(relation: "Relation") -> None:
+            conn = self.get_connection(database_override=relation.database)
+            try:
+                conn.execute(f'VACUUM (FREEZE, ANALYZE) {relation.quoted_dot_notation}')
+            finally:
+                conn.dispose()
+            logger.debug('Vacuumed %s.', relation.quoted_dot_notation)
+
+        logger.info('Vacuuming and analyzing %s relations in target...', len(tables))
+        with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+            for future in [executor.submit(vacuum, relation) for relation in tables]:
+                future.result()
+        logger.info('Relations vacuumed.')
+
+    @overrides
+    def dependent_views(self, engine, relation: "Relation") -> List[Tuple[str, str]]:
+        rows = engine.execute(sqlalchemy.text(self._dependent_views_statement()),
+                              schema=relation.schema,
+                              name=relation.name).fetchall()
+        return [(f'"{row.view_schema}"."{row.view_name}"', row.definition,) for row in rows]
+
+    @staticmethod
+    def _dependent_views_statement() -> str:
+        """selects the views depending on a relation and on those views, the deepest last."""
+        return """
+WITH RECURSIVE dependents AS (
+    SELECT v.oid, 1 AS depth
+    FROM pg_depend d
+    JOIN pg_rewrite r ON d.objid = r.oid
+    JOIN pg_class v ON r.ev_class = v.oid
+    JOIN pg_class t ON d.refobjid = t.oid
+    JOIN pg_namespace tn ON t.relnamespace = tn.oid
+    WHERE t.relname = :name AND tn.nspname = :schema AND v.oid <> t.oid
+    UNION
+    SELECT v.oid, dependents.depth + 1
+    FROM dependents
+    JOIN pg_depend d ON d.refobjid = dependents.oid
+    JOIN pg_rewrite r ON d.objid = r.oid
+    JOIN pg_class v ON r.ev_class = v.oid
+    WHERE v.oid <> dependents.oid
+)
+SELECT vn.nspname AS view_schema,
+       v.relname AS view_name,
+       pg_get_viewdef(v.oid) AS definition
+FROM dependents
+JOIN pg_class v ON dependents.oid = v.oid
+JOIN pg_namespace vn ON v.relnamespace = vn.oid
+WHERE v.relkind = 'v'
+GROUP BY vn.nspname, v.relname, v.oid
+ORDER BY MAX(dependents.depth)
+"""
+
+    @overrides
+    def load_data_into_relation(self,
+                                relation: "Relation",
+                                data: Optional["pd.DataFrame"] = None,
+                                if_exists: str = 'replace') -> None:
         try:
-            return super().load_data_into_relation(relation)
+            return super().load_data_into_relation(relation, data, if_exists)
         except ValueError as exc:
             if 'cannot contain NUL' in str(exc):
                 logger.warning("Invalid 0x00 char found in %s. "
                                "Removing from affected columns and trying again", relation.quoted_dot_notation)
-                fixed_relation = self.replace_x00_values(relation)
+                if data is None:
+                    relation = self.replace_x00_values(relation)
+                else:
+                    data = self._replace_x00_values_in_frame(data)
                 logger.info("Retrying data load for %s", relation.quoted_dot_notation)
-                return super().load_data_into_relation(fixed_relation)
+                return super().load_data_into_relation(relation, data, if_exists)
 
             raise exc
 
     def replace_x00_values(self, relation: "Relation") -> "Relation":
-        for col, col_type in relation.data.dtypes.iteritems():
+        self._replace_x00_values_in_frame(relation.data)
+        return relation
+
+    def _replace_x00_values_in_frame(self, frame: "pd.DataFrame") -> "pd.DataFrame":
+        for col, col_type in frame.dtypes.iteritems():
             # str types are put into object type columns
-            if col_type == 'object' and isinstance(relation.data[col][0], str):
-                matched_nul_char = (relation.data[col].str.find('\x00') > -1)
+            if col_type == 'object' and isinstance(frame[col].iloc[0], str):
+                matched_nul_char = (frame[col].str.find('\x00') > -1)
                 if any(matched_nul_char):
                     logger.warning("Invalid 0x00 char found in column %s. Replacing with '%s' "
                                    "(excluing bounding single quotes)", col, self.x00_replacement)
-                    relation.data[col] = relation.data[col].str.replace('\x00', self.x00_replacement)
-        return relation
+                    frame[col] = frame[col].str.replace('\x00', self.x00_replacement)
+        return frame
 
     @staticmethod
     def image_finalize_bash_commands() -> List[str]:
         commands = list()
-        commands.append(f'mkdir /{DOCKER_REMOUNT_DIRECTORY}')
-        commands.append(f'cp -a /var/lib/postgresql/data/* /{DOCKER_REMOUNT_DIRECTORY}')
+        commands.append(f'mkdir -p /{DOCKER_REMOUNT_DIRECTORY}')
+        # containers started from an existing replica already run on the remounted data
+        commands.append(f'[ "$PGDATA" = "/{DOCKER_REMOUNT_DIRECTORY}" ] || '
+                        f'cp -a /var/lib/postgresql/data/* /{DOCKER_REMOUNT_DIRECTORY}')
         return commands
 
     def image_initialize_bash_commands(self) -> List[str]:
@@ -5,14 +5,26 @@ from shutil import which
 PACKAGE_ROOT = Path().parent.absolute()
 MAX_ALLOWED_DATABASES = 2000
 MAX_ALLOWED_ROWS = 1000000
+MAX_ANALYZE_BATCH_SIZE = 100
 DEFAULT_MAX_NUMBER_OF_OUTLIERS = 100
 DEFAULT_PRESERVE_CASE = False
 DEFAULT_INSERT_CHUNK_SIZE = 50000
+DEFAULT_EXTRACTION_SLICE_ROWS = 1000000
 DEFAULT_THREAD_COUNT = 4
 DOCKER_NETWORK = 'snowshu'
 DOCKER_TARGET_CONTAINER = 'snowshu_target'
 DOCKER_REMOUNT_DIRECTORY = 'snowshu_replica_data'
 DOCKER_TARGET_PORT = 9999
+DEFAULT_TARGET_READY_TIMEOUT = 120
+DEFAULT_SAMPLE_CACHE_DIRECTORY = os.path.join('~', '.snowshu', 'sample_cache')
+DEFAULT_SAMPLE_CACHE_MAX_BYTES = 5 * 1024 ** 3
+DEFAULT_BLOCK_SAMPLING_MIN_ROWS = 100 * 1000 ** 2
+DEFAULT_BLOCK_SAMPLING_MIN_BYTES = 10 * 1024 ** 3
+DEFAULT_BLOCK_SAMPLING_BLOCK_BYTES = 16 * 1024 ** 2
+DEFAULT_BLOCK_SAMPLING_BLOCK_ROWS = 100 * 1000
+DEFAULT_BYTE_BUDGET_SAMPLING_MAX_BYTES = 100 * 1024 ** 2
+DEFAULT_CHECKPOINT_DIRECTORY = os.path.join('~', '.snowshu', 'checkpoints')
+DEFAULT_COMPILE_CACHE_DIRECTORY = os.path.join('~', '.snowshu', 'compile_cache')
 
 
 def _is_in_docker() -> bool:
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import List, Optional, Union
+
+import pandas as pd
+
+from snowshu.configs import DEFAULT_CHECKPOINT_DIRECTORY
+from snowshu.core.models import Relation
+from snowshu.logger import Logger
+
+logger = Logger().logger
+
+
+class BuildCheckpoint:
+    """Persists the per-relation progress of a replica build so it can be resumed.
+
+    For every relation loaded into the target the checkpoint records the extracted and loaded
+    flags, the population, target sample and sample sizes, and the location of a stored copy of the key
+    columns that downstream relations need to build their constraints.
+
+    Args:
+        replica_name: the name of the replica being built, checkpoints are kept per replica.
+        directory: where checkpoints are stored. Default ``~/.snowshu/checkpoints``.
+    """
+    STATE_FILE = 'checkpoint.json'
+
+    def __init__(self,
+                 replica_name: str,
+                 directory: Union[str, Path] = DEFAULT_CHECKPOINT_DIRECTORY):
+        self.directory = Path(directory).expanduser() / hashlib.sha256(
+            replica_name.encode('utf-8')).hexdigest()[:16]
+        self._lock = threading.Lock()
+        self._state = dict()
+        if self.exists():
+            with open(self.directory / self.STATE_FILE, 'r') as state_file:
+                self._state = json.load(state_file)
+
+    def exists(self) -> bool:
+        """True if a checkpoint has been written for the replica."""
+        return (self.directory / self.STATE_FILE).is_file()
+
+    def clear(self) -> None:
+        """Removes the checkpoint and all stored key columns."""
+        with self._lock:
+            self._state = dict()
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def is_loaded(self, relation: Relation) -> bool:
+        """True if the relation was loaded into the target by a previous run."""
+        return self._state.get(relation.dot_notation, dict()).get('target_loaded', False)
+
+    def record(self, relation: Relation, key_columns: List[str]) -> None:
+        """Checkpoints a relation that has been loaded into the target.
+
+        Args:
+            relation: the loaded :class:`Relation <snowshu.core.models.relation.Relation>`.
+            key_columns: the columns of the relation that downstream relations constrain on.
+        """
+        sample_location = None
+        if key_columns:
+            sample_location = str(self.directory / f'{relation.scoped_cte("KEYS")}.pkl')
+            os.makedirs(self.directory, exist_ok=True)
+            relation.data[list(set(key_columns))].drop_duplicates().to_pickle(sample_location)
+
+        with self._lock:
+            self._state[relation.dot_notation] = dict(source_extracted=relation.source_extracted,
+                                                      target_loaded=relation.target_loaded,
+                                                      population_size=relation.population_size,
+                                                      sample_size=relation.sample_size,
+                                                      target_sample_size=getattr(getattr(relation, 'sampling', None),
+                                                                                 'size', None),
+                                                      sample_location=sample_location,
+                                                      key_columns=key_columns)
+            self._write()
+        logger.debug('Checkpointed relation %s.', relation.dot_notation)
+
+    def restore(self, relation: Relation) -> Relation:
+        """Restores a checkpointed relation, including the key columns its downstream relations need."""
+        state = self._state[relation.dot_notation]
+        for attr in ('source_extracted', 'target_loaded', 'population_size', 'sample_size',):
+            setattr(relation, attr, state[attr])
+        # restored relations are not prepared, so their samplings are sized from the checkpoint
+        if state.get('target_sample_size') is not None and getattr(relation, 'sampling', None) is not None:
+            relation.sampling.size = state['target_sample_size']
+        if state['sample_location'] is not None:
+            relation.data = pd.read_pickle(state['sample_location'])
+        return relation
+
+    def _write(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        staging_path = self.directory / f'{self.STATE_FILE}.tmp'
+        with open(staging_path, 'w') as state_file:
+            json.dump(self._state, state_file, default=self._to_json)
+        os.replace(staging_path, self.directory / self.STATE_FILE)
+
+    @staticmethod
+    def _to_json(val: Optional[object]) -> Union[int, str]:
+        """numpy sizes are not json serializable, everything else is stored as text."""
+        try:
+            return int(val)
+        except (TypeError, ValueError):
+            return str(val)
@@ -38,7 +38,7 @@ class RuntimeSourceCompiler:
         else:
             do_not_sample = False
             predicates = list()
-            unions = list()
+            outlier_constraints = list()
             for child in dag.successors(relation):
                 for edge in dag.edges((relation, child), True):
                     edge_data = edge[2]
@@ -46,12 +46,9 @@ class RuntimeSourceCompiler:
                         predicates.append(source_adapter.upstream_constraint_statement(child,
                                                                                        edge_data['remote_attribute'],
                                                                                        edge_data['local_attribute']))
-                    if relation.include_outliers:
-                        unions.append(source_adapter.union_constraint_statement(relation,
-                                                                                child,
-                                                                                edge_data['remote_attribute'],
-                                                                                edge_data['local_attribute'],
-                                                                                relation.max_number_of_outliers))
+                    outlier_constraints.append((child,
+                                                edge_data['remote_attribute'],
+                                                edge_data['local_attribute'],))
 
             for parent in dag.predecessors(relation):
                 for edge in dag.edges((parent, relation,), True):
@@ -61,12 +58,9 @@ class RuntimeSourceCompiler:
                                                                                     analyze,
                                                                                     edge_data['local_attribute'],
                                                                                     edge_data['remote_attribute']))
-                    if relation.include_outliers:
-                        unions.append(source_adapter.union_constraint_statement(relation,
-                                                                                parent,
-                                                                                edge_data['local_attribute'],
-                                                                                edge_data['remote_attribute'],
-                                                                                relation.max_number_of_outliers))
+                    outlier_constraints.append((parent,
+                                                edge_data['local_attribute'],
+                                                edge_data['remote_attribute'],))
 
             query = source_adapter.sample_statement_from_relation(
                 relation, (None if predicates else relation.sampling.sample_method))
@@ -74,8 +68,11 @@ class RuntimeSourceCompiler:
                 query += " WHERE " + ' AND '.join(predicates)
                 query = source_adapter.directionally_wrap_statement(
                     query, relation, (None if do_not_sample else relation.sampling.sample_method))
-            if unions:
-                query += " UNION ".join([''] + unions)
+            if relation.include_outliers and outlier_constraints:
+                # every relationship is checked in one outlier query instead of one per relationship
+                query += " UNION " + source_adapter.union_constraint_statement(relation,
+                                                                              outlier_constraints,
+                                                                              relation.max_number_of_outliers)
 
         relation.core_query = query
 
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import networkx as nx
+
+from snowshu.configs import DEFAULT_COMPILE_CACHE_DIRECTORY
+from snowshu.core.models import Relation
+from snowshu.logger import Logger
+
+logger = Logger().logger
+
+
+class CompileCache:
+    """A local store of the queries compiled for relations, so unchanged relations skip compilation.
+
+    Compiled queries are keyed by a hash of the relation catalog details and settings, its sampling
+    parameters, its relationships, and the keys of the relations upstream of it (whose queries are
+    compiled into its own). Preparing the sampling is skipped on a hit, so no population is counted.
+    Relations with samplings that are not ``cacheable`` are always compiled, and the relations
+    downstream of them are keyed on the query compiled for them instead.
+
+    .. note::
+        Only analyze mode queries are cached, as extraction queries depend on the sampled records upstream.
+
+    Args:
+        directory: where compiled queries are stored. Default ``~/.snowshu/compile_cache``.
+    """
+    SUFFIX = '.json'
+
+    def __init__(self,
+                 directory: Union[str, Path] = DEFAULT_COMPILE_CACHE_DIRECTORY):
+        self.directory = Path(directory).expanduser()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def key(cls,
+            relation: Relation,
+            graph: nx.DiGraph,
+            upstream_keys: Dict[Relation, str],
+            source: str) -> str:
+        """Creates the cache key for the compiled queries of a relation.
+
+        Args:
+            relation: the relation to compile, with its sampling not yet prepared.
+            graph: the graph containing the relation.
+            upstream_keys: the cache keys of the relations upstream of the relation.
+            source: an identifier of the source the relation is in, such as the account.
+        Returns:
+            a hex digest unique to everything the compiled queries depend on.
+        """
+        settings = {attr: getattr(relation, attr) for attr in ('unsampled',
+                                                               'include_outliers',
+                                                               'max_number_of_outliers',
+                                                               'exact_population_count',
+                                                               'seed',)}
+        parts = [source,
+                 relation.dot_notation,
+                 relation.catalog_fingerprint,
+                 str(relation.row_count),
+                 str(relation.last_altered),
+                 json.dumps(settings, sort_keys=True),
+                 json.dumps([sorted(relation.excluded_attributes), sorted(relation.nulled_attributes)]),
+                 cls._sampling_fingerprint(getattr(relation, 'sampling', None))]
+        for parent in sorted(graph.predecessors(relation), key=lambda rel: rel.dot_notation):
+            parts += [upstream_keys[parent], json.dumps(graph.edges[parent, relation], sort_keys=True)]
+        for child in sorted(graph.successors(relation), key=lambda rel: rel.dot_notation):
+            parts += [child.dot_notation, child.catalog_fingerprint,
+                      json.dumps(graph.edges[relation, child], sort_keys=True)]
+
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    @staticmethod
+    def compiled_key(relation: Relation) -> str:
+        """Creates a key from the compiled query of a relation, for the keys of the relations downstream of it."""
+        return hashlib.sha256(relation.compiled_query.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _sampling_fingerprint(sampling: object) -> str:
+        """serializes the parameters of a sampling, including those of its sample size method.
+
+        The sample size and method set by preparing the sampling are left out, they are its output.
+        """
+        def parameters(obj: object) -> dict:
+            return {name: parameters(val) if hasattr(val, '__dict__') else val
+                    for name, val in vars(obj).items()
+                    if name not in ('size', 'sample_method',) and
+                    (hasattr(val, '__dict__') or isinstance(val, (int, float, str, list, tuple, type(None),)))}
+
+        if sampling is None:
+            return 'null'
+        return json.dumps([type(sampling).__name__, parameters(sampling)], sort_keys=True, default=str)
+
+    def get(self, key: str) -> Optional[dict]:
+        """Returns the cached ``core_query`` and ``compiled_query`` for the key, or None if not cached."""
+        try:
+            with open(self._path(key), 'r') as cache_file:
+                queries = json.load(cache_file)
+        except FileNotFoundError:
+            logger.debug('Compile cache miss for %s.', key)
+            return None
+        logger.debug('Compile cache hit for %s.', key)
+        return queries
+
+    def put(self, key: str, relation: Relation) -> None:
+        """Stores the compiled queries of a relation under the key."""
+        path = self._path(key)
+        staging_path = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        with open(staging_path, 'w') as cache_file:
+            json.dump(dict(core_query=relation.core_query,
+                           compiled_query=relation.compiled_query), cache_file)
+        os.replace(staging_path, path)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f'{key}{self.SUFFIX}'
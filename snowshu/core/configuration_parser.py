@@ -69,6 +69,11 @@ class SpecifiedMatchPattern():
     unsampled: bool
     sampling: Union['BaseSampling', None]
     include_outliers: Union[bool, None]
+    exact_population_count: Union[bool, None]
+    seed: Union[int, None]
+    excluded_attributes: List[str]
+    nulled_attributes: List[str]
+    indexes: List[List[str]]
     relationships: Relationships
 
 
@@ -92,6 +97,9 @@ class Configuration:
     include_outliers: bool
     sampling: Type['BaseSampling']
     max_number_of_outliers: int
+    exact_population_count: bool
+    seed: Union[int, None]
+    index_relationships: bool
     general_relations: List[MatchPattern]
     specified_relations: List[SpecifiedMatchPattern]
 
@@ -190,6 +198,8 @@ class ConfigurationParser:
             loaded['source'],
             'max_number_of_outliers',
             DEFAULT_MAX_NUMBER_OF_OUTLIERS)
+        self._set_default(loaded['source'], 'exact_population_count', False)
+        self._set_default(loaded['source'], 'seed', None)
 
         try:
             replica_base = (loaded['name'],
@@ -204,7 +214,10 @@ class ConfigurationParser:
                             loaded['source']['include_outliers'],
                             get_sampling_from_partial(
                                 loaded['source']['sampling']),
-                            loaded['source']['max_number_of_outliers'])
+                            loaded['source']['max_number_of_outliers'],
+                            loaded['source']['exact_population_count'],
+                            loaded['source']['seed'],
+                            loaded['target'].get('index_relationships', False))
 
             general_relations = MatchPattern(
                 [MatchPattern.DatabasePattern(case(database['pattern']),
@@ -253,12 +266,20 @@ class ConfigurationParser:
                 return get_sampling_from_partial(rel['sampling'])
             return None
 
+        def index_columns(index: Union[str, List[str]]) -> List[str]:
+            return [self.case(attr) for attr in ([index] if isinstance(index, str) else index)]
+
         return [SpecifiedMatchPattern(self.case(rel['database']),
                                       self.case(rel['schema']),
                                       self.case(rel['relation']),
                                       rel.get('unsampled', False),
                                       sampling_or_none(rel),
                                       rel.get('include_outliers', None),
+                                      rel.get('exact_population_count', None),
+                                      rel.get('seed', None),
+                                      [self.case(attr) for attr in rel.get('excluded_attributes', list())],
+                                      [self.case(attr) for attr in rel.get('nulled_attributes', list())],
+                                      [index_columns(index) for index in rel.get('indexes', list())],
                                       self._build_relationships(rel)) for rel in specified_relations]
 
     def _build_adapter_profile(self,
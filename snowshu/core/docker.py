@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import hashlib
 import re
 from typing import TYPE_CHECKING, List, Optional, Type
 
@@ -52,19 +53,19 @@ class SnowShuDocker:
             port: int,
             name: Optional[str] = None,
             labels: dict = None,
-            protocol: str = "tcp") -> docker.models.containers.Container:
+            protocol: str = "tcp",
+            container_options: Optional[dict] = None) -> docker.models.containers.Container:
+        """creates the container without starting it.
+
+        container_options: extra options to create the container with, such as resource limits,
+            environment variables in them are added to envars
+        """
         if not labels:
             labels = dict()
+        container_options = dict(container_options or dict())
+        envars = list(envars) + container_options.pop('environment', list())
         name = name if name else self.replica_image_name_to_common_name(image)
-        logger.info(f'Finding base image {image}...')
-        try:
-            self.client.images.get(image)
-        except docker.errors.ImageNotFound:
-            parsed_image = image.split(':')
-            if len(parsed_image) > 1:
-                self.client.images.pull(parsed_image[0], tag=parsed_image[1])
-            else:
-                self.client.images.pull(parsed_image[0])
+        self._pull_if_missing(image)
 
         port_dict = {f"{str(port)}/{protocol}": port}
 
@@ -79,10 +80,65 @@ class SnowShuDocker:
                                                   ports=port_dict,
                                                   environment=envars,
                                                   labels=labels,
-                                                  detach=True)
+                                                  detach=True,
+                                                  **container_options)
         logger.info(f"Created stopped container {container.name}.")
         return container
 
+    def _pull_if_missing(self, image: str) -> None:
+        logger.info(f'Finding base image {image}...')
+        try:
+            self.client.images.get(image)
+        except docker.errors.ImageNotFound:
+            parsed_image = image.split(':')
+            if len(parsed_image) > 1:
+                self.client.images.pull(parsed_image[0], tag=parsed_image[1])
+            else:
+                self.client.images.pull(parsed_image[0])
+
+    @staticmethod
+    def base_image_name(target_adapter: Type['BaseTargetAdapter']) -> str:
+        """the name of the prepared base image of a target, tagged by the image and setup commands it is built from."""
+        digest = hashlib.md5('\n'.join([target_adapter.DOCKER_IMAGE] +
+                                       target_adapter.image_initialize_bash_commands()).encode()).hexdigest()[:12]
+        return f'snowshu_base_{target_adapter.name}:{digest}'
+
+    def get_or_build_base_image(self, target_adapter: Type['BaseTargetAdapter']) -> str:
+        """returns the name of the local base image of a target, with its setup commands already run.
+
+        The image is built the first time and reused afterwards, so target containers
+        start without running setup commands (or needing network access).
+
+        target_adapter: the adapter of the target to prepare the image of
+        """
+        if not target_adapter.image_initialize_bash_commands():
+            return target_adapter.DOCKER_IMAGE
+        base_image = self.base_image_name(target_adapter)
+        try:
+            self.client.images.get(base_image)
+            logger.info(f'Using prepared base image {base_image}.')
+            return base_image
+        except docker.errors.ImageNotFound:
+            pass
+
+        logger.info(f'Building base image {base_image}, this only happens once...')
+        self._pull_if_missing(target_adapter.DOCKER_IMAGE)
+        name = f'snowshu_base_{target_adapter.name}_build'
+        self.remove_container(name)
+        # the container only runs the setup commands, so it idles instead of starting the database
+        container = self.client.containers.run(target_adapter.DOCKER_IMAGE,
+                                               'tail -f /dev/null',
+                                               name=name,
+                                               detach=True)
+        try:
+            self._run_container_setup(container, target_adapter)
+            repository, tag = base_image.split(':')
+            container.commit(repository=repository, tag=tag)
+        finally:
+            self.remove_container(name)
+        logger.info(f'Base image {base_image} built.')
+        return base_image
+
     def startup(self,   # noqa pylint: disable=too-many-arguments
                 image: str,
                 start_command: str,
@@ -90,7 +146,9 @@ class SnowShuDocker:
                 target_adapter: Type['BaseTargetAdapter'],
                 source_adapter: str,
                 envars: list,
-                protocol: str = "tcp") -> docker.models.containers.Container:   # noqa pylint: disable=unused-argument
+                protocol: str = "tcp",   # noqa pylint: disable=unused-argument
+                run_setup: bool = True,
+                container_options: Optional[dict] = None) -> docker.models.containers.Container:
 
         container = self.get_stopped_container(
             image,
@@ -101,7 +159,8 @@ class SnowShuDocker:
             labels=dict(
                 snowshu_replica='true',
                 target_adapter=target_adapter.CLASSNAME,
-                source_adapter=source_adapter))
+                source_adapter=source_adapter),
+            container_options=container_options)
         logger.info(
             f'Connecting {DOCKER_TARGET_CONTAINER} to bridge network..')
         self._connect_to_bridge_network(container)
@@ -109,11 +168,50 @@ class SnowShuDocker:
             f'Connected. Starting created container {DOCKER_TARGET_CONTAINER}...')
         container.start()
         logger.info(f'Container {DOCKER_TARGET_CONTAINER} started.')
-        logger.info(f'Running initial setup on {DOCKER_TARGET_CONTAINER}...')
-        self._run_container_setup(container, target_adapter)
+        if run_setup:
+            logger.info(f'Running initial setup on {DOCKER_TARGET_CONTAINER}...')
+            self._run_container_setup(container, target_adapter)
         logger.info(f'Container {DOCKER_TARGET_CONTAINER} fully initialized.')
         return container
 
+    def find_replica_image(self, replica_name: str) -> docker.models.images.Image:
+        """finds the local image of an existing replica.
+
+        replica_name: the common name of the replica
+        """
+        try:
+            return self.client.images.get(self.sanitize_replica_name(replica_name))
+        except docker.errors.ImageNotFound:
+            message = f'No local image found for replica {replica_name}.'
+            logger.critical(message)
+            raise ValueError(message)
+
+    def get_existing_container(self, name: str) -> docker.models.containers.Container:
+        """finds a container left behind by a previous run, starting it if it is stopped.
+
+        Stopped containers that kept data in tmpfs mounts lost it and are refused.
+
+        name: the name of the container to find
+        """
+        logger.info(f'Finding existing container {name}...')
+        try:
+            container = self.client.containers.get(name)
+        except docker.errors.NotFound:
+            message = f'Container {name} not found, it cannot be resumed.'
+            logger.critical(message)
+            raise
+        if container.status != 'running':
+            if container.attrs.get('HostConfig', dict()).get('Tmpfs'):
+                # starting it again would bring up an empty data directory behind the loaded relations
+                message = (f'Container {name} kept its data in memory, which was lost when it stopped, '
+                           'so it cannot be resumed. Run the build again without resuming.')
+                logger.critical(message)
+                raise ValueError(message)
+            logger.info(f'Starting stopped container {name}...')
+            container.start()
+        logger.info(f'Container {name} found.')
+        return container
+
     def remove_container(self, container: str) -> None:
         logger.info(f'Removing existing target container {container}...')
         try:
@@ -1,3 +1,4 @@
+import copy
 from typing import List, Set
 
 import networkx
@@ -9,6 +10,7 @@ from snowshu.core.models.relation import (Relation,
                                           single_full_pattern_match)
 from snowshu.exceptions import InvalidRelationshipException
 from snowshu.logger import Logger
+from snowshu.samplings.samplings import KeyHashSampling
 
 logger = Logger().logger
 
@@ -49,6 +51,8 @@ class SnowShuGraph:
         graph = networkx.DiGraph()
         graph.add_nodes_from(included_relations)
         self.graph = self._apply_specifications(configs, graph, full_catalog)
+        for relation in self.graph.nodes:
+            relation.sampling.register(relation)
 
         logger.info(
             f'Identified a total of {len(self.graph)} relations to sample based on the specified configurations.')
@@ -75,13 +79,18 @@ class SnowShuGraph:
         for pattern in configs.specified_relations:
             if single_full_pattern_match(relation,
                                          pattern):
-                for attr in ('unsampled', 'include_outliers',):
+                for attr in ('unsampled', 'include_outliers', 'exact_population_count', 'seed',):
                     pattern_val = getattr(pattern, attr, None)
                     relation.__dict__[
-                        attr] = pattern_val if pattern_val is not None else relation.__dict__[attr]
+                        attr] = pattern_val if pattern_val is not None else getattr(relation, attr)
 
                 if getattr(pattern, 'sampling', None) is not None:
-                    relation.sampling = pattern.sampling
+                    relation.sampling = copy.copy(pattern.sampling)
+                if not relation.is_view:
+                    relation.prune_attributes(getattr(pattern, 'excluded_attributes', list()),
+                                              getattr(pattern, 'nulled_attributes', list()))
+                    relation.indexes = relation.indexes + tuple(tuple(index)
+                                                                for index in getattr(pattern, 'indexes', list()))
         return relation
 
     @staticmethod   # noqa mccabe: disable=MC0001
@@ -159,6 +168,16 @@ class SnowShuGraph:
                             f'View dependencies are not allowed by SnowShu.')
                     if upstream_relation == rel:
                         continue
+                    for key_relation, key in ((upstream_relation, edge['remote_attribute'],),
+                                              (rel, edge['local_attribute'],),):
+                        if key in key_relation.excluded_attributes | key_relation.nulled_attributes:
+                            raise InvalidRelationshipException(
+                                f'Attribute {key} of relation {key_relation.quoted_dot_notation} is used in '
+                                f'a relationship, so it cannot be excluded or nulled.')
+                    if SnowShuGraph._shares_key_domain(upstream_relation, rel, edge):
+                        logger.debug(f'{rel.dot_notation} and {upstream_relation.dot_notation} are sampled on '
+                                     f'the same key domain, skipping the relationship between them.')
+                        continue
                     graph.add_edge(upstream_relation,
                                    rel,
                                    direction=edge['direction'],
@@ -166,6 +185,34 @@ class SnowShuGraph:
                                    local_attribute=edge['local_attribute'])
         return graph
 
+    @staticmethod
+    def _shares_key_domain(upstream: Relation,
+                           downstream: Relation,
+                           edge: dict) -> bool:
+        """Determines if a directional relationship is already kept by key hash sampling.
+
+        When both relations are key hash sampled on the attributes of the relationship with the same
+        buckets and seed, the downstream relation selects exactly the keys selected upstream. The relationship
+        then needs no constraint, and the relations can be sampled independently.
+
+        Args:
+            upstream: The remote :class:`Relation <snowshu.core.models.relation.Relation>` of the relationship.
+            downstream: The local :class:`Relation <snowshu.core.models.relation.Relation>` of the relationship.
+            edge: The relationship details.
+        Returns:
+            True if the relationship can be left out of the graph.
+        """
+        if edge['direction'] != 'directional':
+            return False
+        if any((rel.unsampled or rel.include_outliers) for rel in (upstream, downstream,)):
+            return False
+        if not (isinstance(upstream.sampling, KeyHashSampling) and upstream.sampling.shares_key_domain(
+                downstream.sampling)):
+            return False
+        return all((upstream.sampling.key.lower() == edge['remote_attribute'].lower(),
+                    downstream.sampling.key.lower() == edge['local_attribute'].lower(),
+                    upstream.seed == downstream.seed,))
+
     def get_graphs(self) -> tuple:
         """ Generates the set of (weakly) connected components of the object's graph
 
@@ -265,7 +312,10 @@ class SnowShuGraph:
         Returns:
             The updated :class:`Relation <snowshu.core.models.relation>`
         """
-        relation.sampling = configs.sampling
+        # each relation gets its own sampling since prepare() sizes it per relation
+        relation.sampling = copy.copy(configs.sampling)
         relation.include_outliers = configs.include_outliers
         relation.max_number_of_outliers = configs.max_number_of_outliers
+        relation.exact_population_count = configs.exact_population_count
+        relation.seed = configs.seed
         return relation
@@ -1,19 +1,28 @@
 import gc
+import math
 import os
+import re
 import shutil
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
-from dataclasses import dataclass
-from typing import List
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set
 
 import networkx as nx
+import pandas as pd
 
 from snowshu.adapters.source_adapters.base_source_adapter import \
     BaseSourceAdapter
 from snowshu.adapters.target_adapters.base_target_adapter import \
     BaseTargetAdapter
-from snowshu.configs import MAX_ALLOWED_ROWS
+from snowshu.configs import (DEFAULT_EXTRACTION_SLICE_ROWS, MAX_ALLOWED_ROWS,
+                             MAX_ANALYZE_BATCH_SIZE)
+from snowshu.core.build_checkpoint import BuildCheckpoint
 from snowshu.core.compile import RuntimeSourceCompiler
+from snowshu.core.compile_cache import CompileCache
+from snowshu.core.models import Relation
+from snowshu.core.sample_cache import SampleCache
 from snowshu.logger import Logger, duration
 
 logger = Logger().logger
@@ -27,12 +36,45 @@ class GraphExecutable:
     analyze: bool
 
 
+@dataclass
+class FailureReport:
+    """ The relations that did not make it through a graph set execution
+
+        Args:
+            failed (dict): the error of each failed relation, keyed by dot notation
+            skipped (list): relations not attempted because a relation upstream of them failed
+            cancelled (list): relations not attempted because execution halted on a failure
+    """
+    failed: Dict[str, str] = field(default_factory=dict)
+    skipped: List[str] = field(default_factory=list)
+    cancelled: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return len(self.failed) > 0
+
+
 class GraphSetRunner:
 
     barf_output = 'snowshu_barf_output'
 
     def __init__(self):
         self.barf = None
+        self.sample_cache = None
+        self.checkpoint = None
+        self.keep_going = False
+        self.threads = 1
+        self.failure_report = FailureReport()
+        self._halt = threading.Event()
+        self._report_lock = threading.Lock()
+        self._schedule_lock = threading.RLock()
+        self._executor = None
+        # a slot per thread, held by every graph or slice of a relation running on a source session
+        self._sessions = threading.BoundedSemaphore(1)
+        self._futures = dict()
+        self._relations = list()
+        self._pending_views = dict()
+        self._loaded = set()
+        self._unavailable = set()
 
     def execute_graph_set(self,     # noqa pylint: disable=too-many-arguments
                           graph_set: List[nx.Graph],
@@ -40,9 +82,19 @@ class GraphSetRunner:
                           target_adapter: BaseTargetAdapter,
                           threads: int,
                           analyze: bool = False,
-                          barf: bool = False) -> None:
+                          barf: bool = False,
+                          sample_cache: Optional[SampleCache] = None,
+                          checkpoint: Optional[BuildCheckpoint] = None,
+                          keep_going: bool = False) -> FailureReport:
         """ Processes the given graphs in parallel based on the provided adapters
 
+            Views are created as soon as the relations they reference are loaded, so a slow
+            table only delays the views that select from it.
+
+            By default the first failed relation halts execution: queued graphs are cancelled
+            and running source queries are cancelled server side. With keep_going only the
+            relations downstream of a failed relation are skipped.
+
             Args:
                 graph_set (list): list of graphs to process
                 source_adapter (BaseSourceAdapter): source adapter for the relations
@@ -50,8 +102,28 @@ class GraphSetRunner:
                 threads (int): number of threads to use for parallelization
                 analyze (bool): whether to run analyze or actually transfer the sampled data
                 barf (bool): whether to dump diagnostic files to disk
+                sample_cache (SampleCache): local cache to read samples from and write samples to, if any
+                checkpoint (BuildCheckpoint): build progress to skip loaded relations with and record to, if any
+                keep_going (bool): whether to continue past failed relations, skipping their descendants
+
+            Returns:
+                a report of the relations that failed, were skipped or were cancelled, falsy when none failed
         """
         self.barf = barf
+        self.sample_cache = sample_cache
+        self.checkpoint = checkpoint
+        self.keep_going = keep_going
+        self.threads = threads
+        self._sessions = threading.BoundedSemaphore(threads)
+        self.failure_report = FailureReport()
+        self._halt.clear()
+        # queries cancelled by a previous execution halting are allowed again
+        source_adapter.allow_queries()
+        self._futures = dict()
+        self._relations = [relation for graph in graph_set for relation in graph.nodes]
+        self._pending_views = dict()
+        self._loaded = set()
+        self._unavailable = set()
         if self.barf:
             shutil.rmtree(self.barf_output, ignore_errors=True)
             os.makedirs(self.barf_output)
@@ -65,19 +137,367 @@ class GraphSetRunner:
                                     target_adapter,
                                     analyze) for graph in graphs]
 
-        # TODO errors in the parallel execution are never handled
-        # This can result in replicas with missing relations as
-        # the processing does not halt on exceptions
+        # graphs with views go first, their DDL is fetched right away while creating
+        # the views waits in the background for the relations they reference
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            self._executor = executor
+            for executable in make_executables(view_graph_set + table_graph_set):
+                self._submit(list(executable.graph.nodes), self._traverse_and_execute, executable)
+            self._wait_for_futures(source_adapter)
+            self._submit_remaining_views()
+            self._wait_for_futures(source_adapter)
+
+        if self.failure_report:
+            logger.error(f'{len(self.failure_report.failed)} relations failed, '
+                         f'{len(self.failure_report.skipped)} skipped and '
+                         f'{len(self.failure_report.cancelled)} cancelled.')
+        return self.failure_report
+
+    def _submit(self, relations: List[Relation], func: Callable, *args) -> None:
+        """ Queues work on the executor, unless execution has halted """
+        with self._schedule_lock:
+            if self._halt.is_set():
+                self._report(cancelled=relations)
+                return
+            self._futures[self._executor.submit(self._in_session, func, *args)] = relations
+
+    def _in_session(self, func: Callable, *args) -> None:
+        """ Runs queued work holding one of the thread budget slots """
+        with self._sessions:
+            func(*args)
+
+    def _wait_for_futures(self, source_adapter: BaseSourceAdapter) -> None:
+        """ Waits for all queued work, including work queued while waiting, halting on the first failure """
+        while True:
+            with self._schedule_lock:
+                pending = list(self._futures)
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                with self._schedule_lock:
+                    self._futures.pop(future)
+                if future.cancelled() or future.exception() is None:
+                    continue
+                if not self._halt.is_set():
+                    self._halt_execution(source_adapter)
+                with self._schedule_lock:
+                    for queued, relations in self._futures.items():
+                        if not queued.done() and queued.cancel():
+                            self._report(cancelled=relations)
+
+    def _schedule_view(self, executable: GraphExecutable, view: Relation) -> None:
+        """ Queues creating a view once every relation it references is loaded """
+        with self._schedule_lock:
+            self._pending_views[view] = (executable,
+                                         self._view_dependencies(view, self._relations),)
+            self._submit_ready_views()
+
+    def _relation_loaded(self, relation: Relation) -> None:
+        """ Marks a relation as loaded, queueing any views that were waiting on it """
+        with self._schedule_lock:
+            self._loaded.add(relation)
+            self._submit_ready_views()
+
+    def _submit_ready_views(self) -> None:
+        with self._schedule_lock:
+            ready = [view for view, (_, dependencies) in self._pending_views.items()
+                     if dependencies <= self._loaded]
+            for view in ready:
+                executable, _ = self._pending_views.pop(view)
+                self._submit([view], self._create_view, executable, view)
+
+    def _submit_remaining_views(self) -> None:
+        """ Handles views whose dependencies never loaded
 
-        # Tables need to come first to prevent deps deadlocks with views
-        for graphs in [table_graph_set, view_graph_set]:
-            with ThreadPoolExecutor(max_workers=threads) as executor:
-                for executable in make_executables(graphs):
-                    executor.submit(self._traverse_and_execute, executable)
+            Views that depend on failed or skipped relations are skipped, the rest (such as
+            views matched to relations their DDL does not actually select from) are created anyway.
+        """
+        with self._schedule_lock:
+            remaining, self._pending_views = self._pending_views, dict()
+        for view, (executable, dependencies) in remaining.items():
+            if self._halt.is_set():
+                self._report(cancelled=[view])
+            elif dependencies & self._unavailable:
+                logger.warning(f'Skipping view {view.dot_notation}, a relation it references failed.')
+                self._report(skipped=[view])
+            else:
+                self._submit([view], self._create_view, executable, view)
+
+    @staticmethod
+    def _view_dependencies(view: Relation, relations: Iterable[Relation]) -> Set[Relation]:
+        """ Finds the relations a view may select from
+
+            Any relation whose name appears as an identifier in the view DDL is a dependency.
+            This can include relations the view does not reference, which only delays the view.
+        """
+        identifiers = set(re.findall(r'[\w$]+', str(view.view_ddl).lower()))
+        return set(relation for relation in relations
+                   if relation != view and relation.name.lower() in identifiers)
+
+    def _halt_execution(self, source_adapter: BaseSourceAdapter) -> None:
+        """ Stops all graphs from starting new relations and cancels running source queries """
+        logger.warning('Halting execution after a relation failed...')
+        self._halt.set()
+        source_adapter.cancel_running_queries()
+
+    def _report(self,
+                failed: Optional[Dict[Relation, Exception]] = None,
+                skipped: Optional[List[Relation]] = None,
+                cancelled: Optional[List[Relation]] = None) -> None:
+        """ Thread safely adds relations to the failure report """
+        with self._report_lock:
+            for relation, exc in (failed or dict()).items():
+                self.failure_report.failed[relation.dot_notation] = str(exc)
+            self.failure_report.skipped.extend(relation.dot_notation for relation in skipped or list())
+            self.failure_report.cancelled.extend(relation.dot_notation for relation in cancelled or list())
+
+    @staticmethod
+    def estimate_graph_set(graph_set: List[nx.Graph],
+                           source_adapter: BaseSourceAdapter) -> None:
+        """ Estimates population and sample sizes for the given graphs without querying the source
+
+            Population sizes come from the catalog row counts and sample sizes from each
+            relation's sampling estimate, so relations without catalog row counts (such as
+            views) are reported as N/A. Sample sizes of relations with dependencies are the
+            sampling targets, not the sizes their relationship constraints would produce.
+
+            Args:
+                graph_set (list): list of graphs to estimate
+                source_adapter (BaseSourceAdapter): source adapter passed to the samplings
+        """
+        start_time = time.time()
+        relations = [relation for graph in graph_set for relation in graph.nodes]
+        for relation in relations:
+            if relation.is_view or relation.row_count is None:
+                relation.population_size = "N/A"
+                relation.sample_size = "N/A"
+                continue
+            relation.population_size = relation.row_count
+            if relation.unsampled:
+                relation.sample_size = relation.population_size
+            else:
+                relation.sampling.estimate(relation, source_adapter)
+                relation.sample_size = min(relation.sampling.size, relation.population_size)
+        logger.info(f'Estimated {len(relations)} relations in {duration(start_time)}.')
+
+    def compile_graph_set(self,
+                          graph_set: List[nx.Graph],
+                          source_adapter: BaseSourceAdapter,
+                          threads: int,
+                          compile_cache: Optional[CompileCache] = None) -> int:
+        """ Compiles the query of every relation without extracting or loading anything
+
+            Relations are compiled in analyze mode, so queries of relations with dependencies select
+            from the queries of the relations upstream of them instead of their sampled records.
+            Sampling is prepared as it would be for a run, counting populations only for relations
+            without catalog row counts.
+
+            Args:
+                graph_set (list): list of graphs to compile
+                source_adapter (BaseSourceAdapter): source adapter to compile the queries for
+                threads (int): number of graphs to compile in parallel
+                compile_cache (CompileCache): local cache to read compiled queries from and write them to, if any
+
+            Returns:
+                the number of relations read from the compile cache
+        """
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            cached = sum(executor.map(lambda graph: self._compile_graph(graph, source_adapter, compile_cache),
+                                      graph_set))
+        logger.info(f'Compiled {sum(len(graph) for graph in graph_set)} relations '
+                    f'({cached} from cache) in {duration(start_time)}.')
+        return cached
+
+    @staticmethod
+    def _compile_graph(graph: nx.Graph,
+                       source_adapter: BaseSourceAdapter,
+                       compile_cache: Optional[CompileCache]) -> int:
+        """ Compiles the relations of a single graph in dependency order, returning the count read from cache """
+        source = f'{source_adapter.name}://{getattr(source_adapter.credentials, "account", None)}'
+        keys = dict()
+        cached = 0
+        for relation in nx.algorithms.dag.topological_sort(graph):
+            cacheable = relation.is_view or relation.sampling.cacheable
+            if compile_cache is not None and cacheable:
+                keys[relation] = compile_cache.key(relation, graph, keys, source)
+                queries = compile_cache.get(keys[relation])
+                if queries is not None:
+                    relation.core_query = queries['core_query']
+                    relation.compiled_query = queries['compiled_query']
+                    cached += 1
+                    continue
+            if not relation.is_view:
+                relation.population_size = source_adapter.population_size(relation)
+                relation.sampling.prepare(relation, source_adapter)
+            RuntimeSourceCompiler.compile_queries_for_relation(relation, graph, source_adapter, True)
+            if compile_cache is not None and cacheable:
+                compile_cache.put(keys[relation], relation)
+            elif compile_cache is not None:
+                keys[relation] = compile_cache.compiled_key(relation)
+        return cached
+
+    @staticmethod
+    def _analyze_relations(source_adapter: BaseSourceAdapter,
+                           relations: List[Relation]) -> None:
+        """ Analyzes compiled relations in batches of up to MAX_ANALYZE_BATCH_SIZE
+
+            Each batch is a single source query, so a component costs a handful of
+            queries instead of a count and an analyze query per relation.
+
+            Args:
+                source_adapter (BaseSourceAdapter): source adapter to run the analysis with
+                relations (list): relations with analyze queries compiled
+        """
+        for offset in range(0, len(relations), MAX_ANALYZE_BATCH_SIZE):
+            start_time = time.time()
+            batch = relations[offset:offset + MAX_ANALYZE_BATCH_SIZE]
+            results = source_adapter.analyze_relations(batch).set_index('relation')
+            for relation in batch:
+                result = results.loc[relation.dot_notation]
+                relation.population_size = result.population_size
+                relation.sample_size = result.sample_size
+                relation.source_extracted = True
+                logger.info(f'Analysis of relation {relation.dot_notation} completed, '
+                            f'population:{relation.population_size}, sample:{relation.sample_size}')
+            logger.info(f'Analyzed {len(batch)} relations in {duration(start_time)}.')
+
+    def _extract_sample(self,
+                        source_adapter: BaseSourceAdapter,
+                        relation: Relation,
+                        count_first: bool = True,
+                        query: Optional[str] = None) -> pd.DataFrame:
+        """ Retrieves the records of a compiled relation
+
+            When a sample cache is in use, records extracted by an identical query against
+            the same source are read from the cache instead of the source.
+
+            Args:
+                source_adapter (BaseSourceAdapter): source adapter to extract the records with
+                relation (Relation): the relation with its extraction query compiled
+                count_first (bool): whether to check the record count before extracting, skipped for tiny relations
+                query (str): the query to extract with instead of the compiled query, such as the query of one slice
+
+            Returns:
+                the records for the relation
+        """
+        query = relation.compiled_query if query is None else query
+
+        def extract() -> pd.DataFrame:
+            if not count_first:
+                return source_adapter.unchecked_query(query)
+            return source_adapter.check_count_and_query(
+                query, MAX_ALLOWED_ROWS, relation.unsampled)
+
+        if self.sample_cache is None:
+            return extract()
+
+        key = self.sample_cache.key(query,
+                                    f'{source_adapter.name}://{source_adapter.credentials.account}',
+                                    relation.seed)
+        data = self.sample_cache.get(key)
+        if data is not None:
+            logger.info(f'Using cached sample for relation {relation.dot_notation}.')
+            return data
+        data = extract()
+        self.sample_cache.put(key, data)
+        return data
+
+    def _extraction_slices(self, source_adapter: BaseSourceAdapter, relation: Relation) -> int:
+        """ The number of slices to extract a relation in, one for everything but large unsampled relations
+
+            Sampled queries are not repeatable across source sessions, so only unsampled
+            relations are split. There are up to as many slices as threads in the budget.
+        """
+        if not (source_adapter.SUPPORTS_SLICED_EXTRACTION and relation.unsampled) or relation.is_view:
+            return 1
+        population = relation.population_size if isinstance(relation.population_size, int) else relation.row_count
+        if not population:
+            return 1
+        return max(1, min(self.threads, math.ceil(population / DEFAULT_EXTRACTION_SLICE_ROWS)))
+
+    def _extract_and_load_slices(self,
+                                 executable: GraphExecutable,
+                                 relation: Relation,
+                                 slices: int) -> pd.DataFrame:
+        """ Extracts a relation in slices on separate source sessions, loading each into the target as it arrives
+
+            Slices share the thread budget with the graphs being executed, so they only run in parallel
+            on the slots other graphs leave spare and one after another otherwise.
+
+            Args:
+                executable (GraphExecutable): the graph being executed
+                relation (Relation): the relation with its extraction query compiled
+                slices (int): the number of slices to split the records into
 
-    def _traverse_and_execute(self, executable: GraphExecutable) -> None:   # noqa mccabe: disable=MC0001
+            Returns:
+                the records of every slice
+        """
+        logger.info(f'Retrieving records from source {relation.dot_notation} in {slices} slices...')
+        # the relation is created empty so slices can be appended in any order
+        executable.target_adapter.load_data_into_relation(
+            relation, relation.conform_data(pd.DataFrame(columns=[attr.name for attr in relation.attributes])))
+
+        def extract_and_load(slice_index: int) -> pd.DataFrame:
+            query = executable.source_adapter.slice_statement(relation.compiled_query, slices, slice_index)
+            data = relation.conform_data(self._extract_sample(executable.source_adapter, relation,
+                                                              count_first=False, query=query))
+            executable.target_adapter.load_data_into_relation(relation, data, if_exists='append')
+            logger.debug(f'Loaded slice {slice_index + 1} of {slices} of relation {relation.dot_notation}.')
+            return data
+
+        # the slot of the graph extracting the relation is joined by any spare ones
+        spare = 0
+        while spare < slices - 1 and self._sessions.acquire(blocking=False):
+            spare += 1
+        try:
+            with ThreadPoolExecutor(max_workers=spare + 1) as executor:
+                frames = list(executor.map(extract_and_load, range(slices)))
+        finally:
+            for _ in range(spare):
+                self._sessions.release()
+        return pd.concat(frames, ignore_index=True)
+
+    @staticmethod
+    def _take_whole(graph: nx.Graph, relation: Relation) -> bool:
+        """ Checks if a relation is small enough to be taken whole instead of sampled
+
+            Relations the source catalog reports as empty, or with fewer rows than the sampling
+            minimum, gain nothing from counting and sampling. Tiny relations are only taken whole
+            when nothing constrains them and everything depending on them is constrained by them.
+
+            Args:
+                graph (nx.Graph): the graph the relation belongs to
+                relation (Relation): the relation to check
+
+            Returns:
+                True if the relation should be taken whole without a population count
+        """
+        if relation.is_view or relation.unsampled or relation.exact_population_count or relation.row_count is None:
+            return False
+        if relation.row_count == 0:
+            return True
+        min_sample_size = getattr(relation.sampling, 'min_sample_size', None)
+        if min_sample_size is None or relation.row_count > min_sample_size:
+            return False
+        return graph.in_degree(relation) == 0 and all(
+            edge_data['direction'] == 'directional' for _, _, edge_data in graph.out_edges(relation, data=True))
+
+    @staticmethod
+    def _downstream_key_columns(graph: nx.Graph, relation: Relation) -> List[str]:
+        """ Lists the extracted columns of a relation that downstream relations constrain on """
+        if relation.is_view:
+            return list()
+        return [edge_data['remote_attribute'] for _, _, edge_data in graph.out_edges(relation, data=True)
+                if edge_data['remote_attribute'] in relation.data.columns]
+
+    def _traverse_and_execute(self, executable: GraphExecutable) -> None:
         """ Processes a single graph and loads the data into the replica if required
 
+            A failed relation halts the graph, unless running with keep_going in which case
+            only the relations downstream of it are skipped.
+
             To save memory after processing, the loaded dataframes are deleted, and
             garbage collection manually called.
 
@@ -92,83 +512,37 @@ class GraphSetRunner:
         try:
             logger.debug(
                 f"Executing graph with {len(executable.graph)} relations in it...")
-            for i, relation in enumerate(
-                    nx.algorithms.dag.topological_sort(executable.graph)):
-                relation.population_size = executable.source_adapter.scalar_query(
-                    executable.source_adapter.population_count_statement(relation))
+            analyze_batch = list()
+            skipped = set()
+            order = list(nx.algorithms.dag.topological_sort(executable.graph))
+            for i, relation in enumerate(order):
+                if self._halt.is_set():
+                    self._report(cancelled=[relation])
+                    continue
+                if relation in skipped:
+                    logger.warning(f'Skipping relation {relation.dot_notation}, a relation upstream of it failed.')
+                    self._report(skipped=[relation])
+                    with self._schedule_lock:
+                        self._unavailable.add(relation)
+                    continue
+                if self.checkpoint is not None and self.checkpoint.is_loaded(relation):
+                    self.checkpoint.restore(relation)
+                    logger.info(f'Relation {relation.dot_notation} was loaded by a previous run, skipping.')
+                    self._relation_loaded(relation)
+                    continue
                 logger.info(f'Executing graph {i+1} of {len(executable.graph)} source query '
                             f'for relation {relation.dot_notation}...')
-
-                relation.sampling.prepare(relation,
-                                          executable.source_adapter)
-                relation = RuntimeSourceCompiler.compile_queries_for_relation(
-                    relation, executable.graph, executable.source_adapter, executable.analyze)
-
-                if executable.analyze:
-                    if relation.is_view:
-                        relation.population_size = "N/A"
-                        relation.sample_size = "N/A"
-                        logger.info(
-                            f'Relation {relation.dot_notation} is a view, skipping.')
-                    else:
-                        result = executable.source_adapter.check_count_and_query(relation.compiled_query,
-                                                                                 MAX_ALLOWED_ROWS,
-                                                                                 relation.unsampled).iloc[0]
-                        relation.population_size = result.population_size
-                        relation.sample_size = result.sample_size
-                        logger.info(
-                            f'Analysis of relation {relation.dot_notation} completed in {duration(start_time)}.')
-                else:
-                    executable.target_adapter.create_database_if_not_exists(
-                        relation.quoted(relation.database))
-                    executable.target_adapter.create_schema_if_not_exists(
-                        relation.quoted(relation.database),
-                        relation.quoted(relation.schema))
-                    if relation.is_view:
-                        logger.info(
-                            f'Retrieving DDL statement for view {relation.dot_notation} in source...')
-                        relation.population_size = "N/A"
-                        relation.sample_size = "N/A"
-                        try:
-                            relation.view_ddl = executable.source_adapter.scalar_query(
-                                relation.compiled_query)
-                        except Exception:
-                            raise SystemError(
-                                f'Failed to extract DDL statement: {relation.compiled_query}')
-                        logger.info(
-                            f'Successfully extracted DDL statement for view {relation.quoted_dot_notation}')
-                    else:
-                        logger.info(
-                            f'Retrieving records from source {relation.dot_notation}...')
-                        try:
-                            relation.data = executable.source_adapter.check_count_and_query(
-                                relation.compiled_query, MAX_ALLOWED_ROWS, relation.unsampled)
-                        except Exception as exc:
-                            raise SystemError(
-                                f'Failed execution of extraction sql statement: {relation.compiled_query} {exc}')
-
-                        relation.sample_size = len(relation.data)
-                        logger.info(
-                            f'{relation.sample_size} records retrieved for relation {relation.dot_notation}.')
-
-                    logger.info(
-                        f'Inserting relation {relation.quoted_dot_notation} into target...')
-                    try:
-                        executable.target_adapter.create_and_load_relation(
-                            relation)
-                    except Exception as exc:
-                        raise SystemError(
-                            f'Failed to load relation {relation.quoted_dot_notation} into target: {exc}')
-
-                    logger.info(
-                        f'Done replication of relation {relation.dot_notation} in {duration(start_time)}.')
-                    relation.target_loaded = True
-                relation.source_extracted = True
-                logger.info(
-                    f'population:{relation.population_size}, sample:{relation.sample_size}')
-                if self.barf:
-                    with open(os.path.join(self.barf_output, f'{relation.dot_notation}.sql'), 'w') as barf_file:
-                        barf_file.write(relation.compiled_query)
+                try:
+                    self._execute_relation(executable, relation, analyze_batch, start_time)
+                except Exception as exc:
+                    # a halting failure leaves the rest of the graph and the queued analysis undone
+                    self._handle_failure([relation], exc, unfinished=order[i + 1:] + analyze_batch)
+                    skipped.update(nx.descendants(executable.graph, relation))
+            if analyze_batch:
+                try:
+                    self._analyze_relations(executable.source_adapter, analyze_batch)
+                except Exception as exc:
+                    self._handle_failure(analyze_batch, exc)
             try:
                 for relation in executable.graph.nodes:
                     del relation.data
@@ -178,3 +552,158 @@ class GraphSetRunner:
         except Exception as exc:
             logger.error(f'failed with error of type {type(exc)}: {str(exc)}')
             raise exc
+
+    def _handle_failure(self,
+                        relations: List[Relation],
+                        exc: Exception,
+                        unfinished: Iterable[Relation] = tuple()) -> None:
+        """ Reports failed relations, such as all the relations of a batch, raising unless running with keep_going
+
+            Failures after execution halted are the cancelled queries of other graphs,
+            so they are reported as cancelled rather than failed. When the failure raises,
+            the unfinished relations of the graph are reported as cancelled.
+        """
+        if self._halt.is_set():
+            self._report(cancelled=relations + list(unfinished))
+            raise exc
+        self._report(failed={relation: exc for relation in relations})
+        with self._schedule_lock:
+            self._unavailable.update(relations)
+        if not self.keep_going:
+            self._report(cancelled=list(unfinished))
+            raise exc
+        for relation in relations:
+            logger.error(f'Relation {relation.dot_notation} failed, continuing with unrelated relations: {exc}')
+
+    def _execute_relation(self,
+                          executable: GraphExecutable,
+                          relation: Relation,
+                          analyze_batch: List[Relation],
+                          start_time: float) -> None:
+        """ Samples a single relation and loads it into the target, or queues it for analysis
+
+            Args:
+                executable (GraphExecutable): the graph being executed
+                relation (Relation): the relation to execute
+                analyze_batch (list): relations to analyze once the graph has been compiled
+                start_time (float): when execution of the graph started
+        """
+        take_whole = self._take_whole(executable.graph, relation)
+        # view sizes are reported as N/A, so they are neither counted nor sampled
+        if take_whole:
+            # the whole relation is no bigger than its sample would be, so it is neither counted nor sampled
+            relation.unsampled = True
+            relation.population_size = relation.row_count
+        elif not relation.is_view:
+            relation.population_size = executable.source_adapter.population_size(
+                relation)
+            relation.sampling.prepare(relation,
+                                      executable.source_adapter)
+        relation = RuntimeSourceCompiler.compile_queries_for_relation(
+            relation, executable.graph, executable.source_adapter, executable.analyze)
+        empty = take_whole and relation.row_count == 0
+
+        if executable.analyze:
+            if relation.is_view:
+                relation.population_size = "N/A"
+                relation.sample_size = "N/A"
+                relation.source_extracted = True
+                logger.info(
+                    f'Relation {relation.dot_notation} is a view, skipping.')
+            elif empty:
+                relation.sample_size = 0
+                relation.source_extracted = True
+                logger.info(
+                    f'Relation {relation.dot_notation} is empty, skipping.')
+            else:
+                analyze_batch.append(relation)
+        else:
+            executable.target_adapter.create_database_if_not_exists(
+                relation.quoted(relation.database))
+            executable.target_adapter.create_schema_if_not_exists(
+                relation.quoted(relation.database),
+                relation.quoted(relation.schema))
+            if relation.is_view:
+                logger.info(
+                    f'Retrieving DDL statement for view {relation.dot_notation} in source...')
+                relation.population_size = "N/A"
+                relation.sample_size = "N/A"
+                try:
+                    relation.view_ddl = executable.source_adapter.view_ddl(relation)
+                except Exception:
+                    raise SystemError(
+                        f'Failed to extract DDL statement: {relation.compiled_query}')
+                logger.info(
+                    f'Successfully extracted DDL statement for view {relation.quoted_dot_notation}')
+                self._schedule_view(executable, relation)
+            else:
+                slices = self._extraction_slices(executable.source_adapter, relation)
+                if empty:
+                    logger.info(
+                        f'Relation {relation.dot_notation} is empty in the source catalog, '
+                        'creating it without records.')
+                    relation.data = pd.DataFrame(columns=[attr.name for attr in relation.attributes])
+                elif slices > 1:
+                    try:
+                        relation.data = self._extract_and_load_slices(executable, relation, slices)
+                    except Exception as exc:
+                        raise SystemError(
+                            f'Failed sliced extraction of relation {relation.quoted_dot_notation}: {exc}')
+                else:
+                    logger.info(
+                        f'Retrieving records from source {relation.dot_notation}...')
+                    try:
+                        relation.data = self._extract_sample(executable.source_adapter, relation,
+                                                             count_first=not take_whole)
+                    except Exception as exc:
+                        raise SystemError(
+                            f'Failed execution of extraction sql statement: {relation.compiled_query} {exc}')
+
+                relation.sample_size = len(relation.data)
+                logger.info(
+                    f'{relation.sample_size} records retrieved for relation {relation.dot_notation}.')
+                if slices > 1:
+                    self._record_loaded(executable, relation, start_time)
+                else:
+                    self._load_relation(executable, relation, start_time)
+        if self.barf:
+            with open(os.path.join(self.barf_output, f'{relation.dot_notation}.sql'), 'w') as barf_file:
+                barf_file.write(relation.compiled_query)
+
+    def _create_view(self, executable: GraphExecutable, view: Relation) -> None:
+        """ Creates a view in the target once the relations it references are loaded """
+        try:
+            self._load_relation(executable, view, time.time())
+        except Exception as exc:
+            self._handle_failure([view], exc)
+
+    def _load_relation(self,
+                       executable: GraphExecutable,
+                       relation: Relation,
+                       start_time: float) -> None:
+        """ Creates a sampled relation in the target and records it as loaded """
+        logger.info(
+            f'Inserting relation {relation.quoted_dot_notation} into target...')
+        try:
+            executable.target_adapter.create_and_load_relation(
+                relation)
+        except Exception as exc:
+            raise SystemError(
+                f'Failed to load relation {relation.quoted_dot_notation} into target: {exc}')
+        self._record_loaded(executable, relation, start_time)
+
+    def _record_loaded(self,
+                       executable: GraphExecutable,
+                       relation: Relation,
+                       start_time: float) -> None:
+        """ Records a relation created in the target as loaded """
+        logger.info(
+            f'Done replication of relation {relation.dot_notation} in {duration(start_time)}.')
+        relation.target_loaded = True
+        relation.source_extracted = True
+        logger.info(
+            f'population:{relation.population_size}, sample:{relation.sample_size}')
+        if self.checkpoint is not None:
+            self.checkpoint.record(relation,
+                                   self._downstream_key_columns(executable.graph, relation))
+        self._relation_loaded(relation)
@@ -85,14 +85,32 @@ def init(path: click.Path) -> None:
     '--barf',
     is_flag=True,
     help="outputs the source query sql to a local folder snowshu_barf_output")
-def create(replica_file: click.Path,
+@click.option(
+    '--sample-cache',
+    is_flag=True,
+    help="reuses samples cached in ~/.snowshu/sample_cache for unchanged source queries, \
+          and caches newly extracted samples there")
+@click.option(
+    '--resume',
+    is_flag=True,
+    help="continues an unfinished build of the replica in its existing target container, \
+          skipping relations that were already loaded")
+@click.option(
+    '--keep-going',
+    is_flag=True,
+    help="continues past failed relations, skipping only the relations downstream of them, \
+          instead of halting on the first failure")
+def create(replica_file: click.Path,    # noqa pylint: disable=too-many-arguments
            name: str,
-           barf: bool):
+           barf: bool,
+           sample_cache: bool,
+           resume: bool,
+           keep_going: bool):
     """Generate a new replica from a replica.yml file.
     """
     replica = ReplicaFactory()
     replica.load_config(replica_file)
-    click.echo(replica.create(name, barf))
+    click.echo(replica.create(name, barf, sample_cache, resume, keep_going))
 
 
 @cli.command()
@@ -105,12 +123,58 @@ def create(replica_file: click.Path,
 @click.option('--barf', '-b',
               is_flag=True,
               help="outputs the source query sql to a local folder snowshu_barf_output")
-def analyze(replica_file: click.Path, barf: bool):
+@click.option('--estimate', '-e',
+              is_flag=True,
+              help="estimates sizes from source catalog row counts without running any sampling queries")
+def analyze(replica_file: click.Path, barf: bool, estimate: bool):
     """Perform a "dry run" of the replica creation without actually executing, and return the expected results."""
 
     replica = ReplicaFactory()
     replica.load_config(replica_file)
-    click.echo(replica.analyze(barf))
+    click.echo(replica.analyze(barf, estimate))
+
+
+@cli.command()
+@click.option(
+    '--replica-file',
+    type=click.Path(
+        exists=True),
+    default=REPLICA_DEFAULT,
+    help="where snowshu will look for your replica configuration file, default is ./replica.yml")
+@click.option('--barf', '-b',
+              is_flag=True,
+              help="outputs the source query sql to a local folder snowshu_barf_output")
+@click.option(
+    '--keep-going',
+    is_flag=True,
+    help="continues past failed relations, skipping only the relations downstream of them")
+def refresh(replica_file: click.Path, barf: bool, keep_going: bool):
+    """Re-sample only the relations of an existing replica that changed in the source."""
+    replica = ReplicaFactory()
+    replica.load_config(replica_file)
+    click.echo(replica.refresh(barf, keep_going))
+
+
+@cli.command()
+@click.option(
+    '--replica-file',
+    type=click.Path(
+        exists=True),
+    default=REPLICA_DEFAULT,
+    help="where snowshu will look for your replica configuration file, default is ./replica.yml")
+@click.option('--output', '-o',
+              default='snowshu_compile_output',
+              help="the folder to write the compiled sql to, default is ./snowshu_compile_output")
+@click.option(
+    '--compile-cache',
+    is_flag=True,
+    help="reuses queries compiled in ~/.snowshu/compile_cache for unchanged relations, \
+          and caches newly compiled queries there")
+def compile(replica_file: click.Path, output: str, compile_cache: bool):     # noqa pylint: disable=redefined-builtin
+    """Compile the source query of every relation without sampling or creating a replica."""
+    replica = ReplicaFactory()
+    replica.load_config(replica_file)
+    click.echo(replica.compile(output, compile_cache))
 
 
 @cli.command()
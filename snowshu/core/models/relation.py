@@ -1,4 +1,5 @@
 from typing import TYPE_CHECKING, List, Optional, Union
+import hashlib
 import json
 import re
 from sqlalchemy.types import JSON
@@ -21,12 +22,22 @@ class Relation:
     core_query: str
     population_size: int
     sample_size: int
+    row_count: Optional[int] = None
+    size_in_bytes: Optional[int] = None
+    last_altered: Optional[str] = None
+    exact_population_count: bool = False
+    seed: Optional[int] = None
     source_extracted: bool = False
     target_loaded: bool = False
     sampling: Optional['BaseSampling']
     unsampled: bool = False
     include_outliers: bool = False
     max_number_of_outliers: int = DEFAULT_MAX_NUMBER_OF_OUTLIERS
+    # names of the catalog attributes left out of, or selected as NULL in, the replica
+    excluded_attributes: frozenset = frozenset()
+    nulled_attributes: frozenset = frozenset()
+    # attribute names of the extra indexes declared for the relation in the replica
+    indexes: tuple = tuple()
 
     def __init__(self,  # noqa pylint: disable=too-many-arguments
                  database: str,
@@ -55,6 +66,10 @@ class Relation:
             Adjusts data columns to match corrected attribute names and
             fixes mismatched datatypes
         """
+        self._data = self.conform_data(val)
+
+    def conform_data(self, val: pd.DataFrame) -> pd.DataFrame:
+        """ Adjusts records of the relation, such as a slice of them, as the data setter does """
         lowered_columns = [correct_case(col, False)
                            for col in val.columns.to_list()]
         attrs = [attr.name for attr in self.attributes]
@@ -64,11 +79,11 @@ class Relation:
 
         # handle the fact that pandas.read_sql may not preserve json type on load
         for attr in self.attributes:
-            if isinstance(attr.data_type.sqlalchemy_type, JSON):
+            if isinstance(attr.data_type.sqlalchemy_type, JSON) and attr.name in val.columns:
                 transform_func = (lambda v: json.loads(v) if isinstance(v, str) else v)
                 val[attr.name] = val[attr.name].transform(func=transform_func)
 
-        self._data = val
+        return val
 
     @property
     def dot_notation(self) -> str:
@@ -79,6 +94,13 @@ class Relation:
         return '.'.join([self.quoted(getattr(self, x))
                         for x in ('database', 'schema', 'name',)])
 
+    @property
+    def catalog_fingerprint(self) -> str:
+        """a hash of the relation structure in the catalog, changes when the materialization or any attribute does."""
+        structure = [self.dot_notation, self.materialization.name] + \
+            [f'{attr.name}:{attr.data_type.name}' for attr in self.attributes]
+        return hashlib.sha256('\n'.join(structure).encode('utf-8')).hexdigest()
+
     @property
     def star(self) -> str:
         attr_string = str()
@@ -86,6 +108,32 @@ class Relation:
             attr_string += f',{attr.name}\n'
         return attr_string[1:]
 
+    @property
+    def projection(self) -> str:
+        """the select list of the relation, ``*`` unless attributes are excluded or nulled."""
+        if not (self.excluded_attributes or self.nulled_attributes):
+            return '*'
+        return ','.join([f'NULL AS {self.quoted(attr.name)}' if attr.name in self.nulled_attributes
+                         else self.quoted(attr.name) for attr in self.attributes])
+
+    def prune_attributes(self,
+                         excluded: List[str],
+                         nulled: List[str]) -> None:
+        """Leaves attributes out of the relation, or selects them as NULL.
+
+        Args:
+            excluded: names or regex patterns of the attributes to leave out.
+            nulled: names or regex patterns of the attributes to select as NULL.
+        """
+        def matched(patterns: List[str]) -> frozenset:
+            return frozenset(attr.name for attr in self.attributes
+                             if any(re.fullmatch(pattern, attr.name) for pattern in patterns))
+
+        excluded_names, nulled_names = matched(excluded), matched(nulled)
+        self.attributes = [attr for attr in self.attributes if attr.name not in excluded_names]
+        self.excluded_attributes = self.excluded_attributes | excluded_names
+        self.nulled_attributes = (self.nulled_attributes | nulled_names) - self.excluded_attributes
+
     # Relation.relation is confusing compared to Relation.name, but in other objects the
     # <database>.<schema>.<relation> convention makes this convenient.
     @property
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Any, List, Union
+from typing import Any, Dict, List, Union
 
 import networkx as nx
 from tabulate import tabulate
@@ -36,9 +36,12 @@ def graph_to_result_list(graphs: nx.Graph) -> list:
             for relation in graph.nodes:
                 deps = len(nx.ancestors(graph, relation))
                 deps = " " if deps == 0 else str(deps)
+                # samplings of relations that were never prepared have no size, so their sample is the target
+                sampling_size = getattr(relation.sampling, 'size', relation.sample_size)
                 target_sample_size = relation.population_size if\
-                    (relation.unsampled or relation.population_size < relation.sampling.size)\
-                    else relation.sampling.size
+                    (relation.unsampled or isinstance(relation.population_size, str)
+                     or relation.population_size < sampling_size)\
+                    else sampling_size
 
                 if isinstance(relation.population_size, str):
                     percent = "N/A"
@@ -85,6 +88,35 @@ def printable_result(report: List[ReportRow], analyze: str) -> str:
         tabulate(printable, headers, colalign=column_alignment) + "\n"
 
 
+def printable_failure_report(report: 'FailureReport') -> str:
+    """Formats the relations of a failed graph set execution.
+
+    Args:
+        report: the :class:`FailureReport <snowshu.core.graph_set_runner.FailureReport>` to format.
+    Returns:
+        a table of every failed, skipped and cancelled relation.
+    """
+    rows = [(relation, 'failed', error,) for relation, error in report.failed.items()]
+    rows += [(relation, 'skipped', 'an upstream relation failed',) for relation in report.skipped]
+    rows += [(relation, 'cancelled', 'execution halted',) for relation in report.cancelled]
+    return "\n\nFAILED RELATIONS:\n\n" + \
+        tabulate(rows, ('relation', 'status', 'reason',)) + "\n"
+
+
+def printable_timings(timings: Dict[str, float]) -> str:
+    """Formats how long each stage of a build took.
+
+    Args:
+        timings: the seconds taken by each stage, in the order they ran.
+    Returns:
+        a table of every stage and its duration.
+    """
+    rows = [(stage, f'{seconds:.2f}',) for stage, seconds in timings.items()]
+    rows.append(('total', f'{sum(timings.values()):.2f}',))
+    return "\n\nBUILD TIMINGS:\n\n" + \
+        tabulate(rows, ('stage', 'seconds',), colalign=('left', 'right',), disable_numparse=True) + "\n"
+
+
 def format_set_of_available_images(imageset: iter) -> str:
     """Transforms an iterable of tuples into a response pretty printed.
 
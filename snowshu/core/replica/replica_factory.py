@@ -1,13 +1,23 @@
+import os
+import shutil
 import time
 from pathlib import Path
-from typing import TextIO, Union
+from typing import Dict, List, TextIO, Tuple, Union
 
+import networkx as nx
+
+from snowshu.core.build_checkpoint import BuildCheckpoint
+from snowshu.core.compile_cache import CompileCache
 from snowshu.core.configuration_parser import (Configuration,
                                                ConfigurationParser)
 from snowshu.core.graph import SnowShuGraph
 from snowshu.core.graph_set_runner import GraphSetRunner
+from snowshu.core.models import Relation
 from snowshu.core.printable_result import (graph_to_result_list,
-                                           printable_result)
+                                           printable_failure_report,
+                                           printable_result,
+                                           printable_timings)
+from snowshu.core.sample_cache import SampleCache
 from snowshu.logger import Logger, duration
 
 logger = Logger().logger
@@ -22,40 +32,130 @@ class ReplicaFactory:
 
     def create(self,
                name: Union[str, None],
-               barf: bool) -> None:
+               barf: bool,
+               sample_cache: bool = False,
+               resume: bool = False,
+               keep_going: bool = False) -> None:
+        self.run_analyze = False
+        return self._execute(name=name, barf=barf, sample_cache=sample_cache, resume=resume,
+                             keep_going=keep_going)
+
+    def refresh(self, barf: bool, keep_going: bool = False) -> None:
+        """Re-samples the relations of an existing replica that changed in the source.
+
+        A relation has changed when its source LAST_ALTERED time or catalog fingerprint
+        differs from the one recorded in the replica. Every graph containing a changed
+        relation is re-sampled so relationships within it stay consistent.
+        """
         self.run_analyze = False
-        return self._execute(name=name, barf=barf)
+        return self._execute(barf=barf, refresh=True, keep_going=keep_going)
 
-    def analyze(self, barf: bool) -> None:
+    def analyze(self, barf: bool, estimate: bool = False) -> None:
         self.run_analyze = True
-        return self._execute(barf=barf)
+        return self._execute(barf=barf, estimate=estimate)
+
+    def compile(self, output: str, compile_cache: bool = False) -> str:
+        """Compiles the query of every relation and writes each to a file, without sampling or a target.
+
+        Queries are compiled in analyze mode, so relations with dependencies select from the queries
+        of the relations upstream of them.
+
+        Args:
+            output: the directory to write a ``<relation>.sql`` file per relation to, replaced if it exists.
+            compile_cache: whether to reuse queries compiled by previous runs for unchanged relations.
+        """
+        graph = SnowShuGraph()
+        graph.build_graph(self.config)
+        graphs = graph.get_graphs()
+        if len(graphs) < 1:
+            return "No relations found per provided replica configuration, exiting."
+
+        cached = GraphSetRunner().compile_graph_set(graphs,
+                                                    self.config.source_profile.adapter,
+                                                    self.config.threads,
+                                                    CompileCache() if compile_cache else None)
+        shutil.rmtree(output, ignore_errors=True)
+        os.makedirs(output)
+        relations = [relation for graph in graphs for relation in graph.nodes]
+        for relation in relations:
+            with open(os.path.join(output, f'{relation.dot_notation}.sql'), 'w') as sql_file:
+                sql_file.write(relation.core_query)
+        return f"Compiled {len(relations)} relations ({cached} from cache) to {output}."
 
     def _execute(self,
                  barf: bool = False,
-                 name: Union[str, None] = None) -> None:
+                 name: Union[str, None] = None,
+                 estimate: bool = False,
+                 sample_cache: bool = False,
+                 resume: bool = False,
+                 refresh: bool = False,
+                 keep_going: bool = False) -> None:     # noqa mccabe: disable=MC0001 pylint: disable=too-many-arguments
         graph = SnowShuGraph()
         if name is not None:
             self.config.name = name
 
+        checkpoint = None
+        if not self.run_analyze:
+            checkpoint = BuildCheckpoint(self.config.name)
+            if resume and not checkpoint.exists():
+                message = f'No unfinished build of replica {self.config.name} found to resume.'
+                logger.critical(message)
+                raise ValueError(message)
+            if not resume:
+                checkpoint.clear()
+
         graph.build_graph(self.config)
         graphs = graph.get_graphs()
         if len(graphs) < 1:
             return "No relations found per provided replica configuration, exiting."
 
-        # TODO replica container should not be started for analyze commands
-        self.config.target_profile.adapter.initialize_replica(
-            self.config.source_profile.name)
         runner = GraphSetRunner()
-        runner.execute_graph_set(graphs,
-                                 self.config.source_profile.adapter,
-                                 self.config.target_profile.adapter,
-                                 threads=self.config.threads,
-                                 analyze=self.run_analyze,
-                                 barf=barf)
+        if estimate:
+            runner.estimate_graph_set(graphs,
+                                      self.config.source_profile.adapter)
+            return printable_result(
+                graph_to_result_list(graphs),
+                self.run_analyze)
+
+        all_relations = [relation for graph in graphs for relation in graph.nodes]
+        timings = dict()
         if not self.run_analyze:
+            stage_start = time.time()
+            self.config.target_profile.adapter.initialize_replica(
+                self.config.source_profile.name,
+                resume,
+                replica_name=self.config.name if refresh else None)
+            timings['target startup'] = time.time() - stage_start
+        if refresh:
+            graphs = self._changed_graphs(
+                graphs, self.config.target_profile.adapter.get_replica_meta())
+            if len(graphs) < 1:
+                self.config.target_profile.adapter.discard_replica()
+                checkpoint.clear()
+                return f"Replica {self.config.name} is up to date, nothing to refresh."
+            logger.info('Refreshing %s changed graphs...', len(graphs))
+        stage_start = time.time()
+        failure_report = runner.execute_graph_set(graphs,
+                                                  self.config.source_profile.adapter,
+                                                  self.config.target_profile.adapter,
+                                                  threads=self.config.threads,
+                                                  analyze=self.run_analyze,
+                                                  barf=barf,
+                                                  sample_cache=SampleCache() if sample_cache else None,
+                                                  checkpoint=checkpoint,
+                                                  keep_going=keep_going)
+        timings['sampling and loading'] = time.time() - stage_start
+        if failure_report:
+            # the target container and checkpoint are kept so the build can be resumed
+            message = f'Failed to execute the replica graphs.{printable_failure_report(failure_report)}'
+            logger.critical(message)
+            raise SystemError(message)
+        if not self.run_analyze:
+            stage_start = time.time()
             relations = [
                 relation for graph in graphs for relation in graph.nodes]
-            if self.config.source_profile.adapter.SUPPORTS_CROSS_DATABASE:
+            # links in a refreshed replica already exist from the replica it started from
+            if self.config.source_profile.adapter.SUPPORTS_CROSS_DATABASE and not refresh:
                 logger.info('Creating x-database links in target...')
                 self.config.target_profile.adapter.enable_cross_database(
                     relations)
@@ -68,12 +168,76 @@ class ReplicaFactory:
                 self.config.target_profile.adapter.create_function_if_available(
                     function, relations)
             logger.info('Emulation functions applied.')
-            self.config.target_profile.adapter.finalize_replica()
+            indexes = self._indexes(graphs, self.config.index_relationships)
+            if indexes:
+                logger.info('Creating indexes on %s relations in target...', len(indexes))
+                self.config.target_profile.adapter.create_indexes(indexes, self.config.threads)
+                logger.info('Indexes created.')
+            self.config.target_profile.adapter.update_replica_meta(
+                self._relations_meta(all_relations))
+            self.config.target_profile.adapter.finalize_replica(relations, self.config.threads)
+            checkpoint.clear()
+            timings['finalizing'] = time.time() - stage_start
+
+            return printable_result(
+                graph_to_result_list(graphs),
+                self.run_analyze) + printable_timings(timings)
 
         return printable_result(
             graph_to_result_list(graphs),
             self.run_analyze)
 
+    @staticmethod
+    def _indexes(graphs: List[nx.Graph], index_relationships: bool) -> Dict[Relation, List[Tuple[str, ...]]]:
+        """The indexes to build in the target, declared ones and optionally one per relationship key.
+
+        Declared indexes on attributes left out of the replica are skipped.
+        """
+        indexes = dict()
+
+        def add(relation: Relation, attributes: Tuple[str, ...]) -> None:
+            if relation.is_view:
+                return
+            if not set(attributes) <= {attr.name for attr in relation.attributes}:
+                logger.warning('Skipping index on %s of relation %s, not all of its attributes are in the replica.',
+                               ','.join(attributes), relation.dot_notation)
+                return
+            relation_indexes = indexes.setdefault(relation, list())
+            if attributes not in relation_indexes:
+                relation_indexes.append(attributes)
+
+        for graph in graphs:
+            if index_relationships:
+                for upstream, downstream, edge_data in graph.edges(data=True):
+                    add(upstream, (edge_data['remote_attribute'],))
+                    add(downstream, (edge_data['local_attribute'],))
+            for relation in graph.nodes:
+                for attributes in relation.indexes:
+                    add(relation, tuple(attributes))
+        return indexes
+
+    @staticmethod
+    def _relation_meta(relation: Relation) -> dict:
+        return dict(last_altered=relation.last_altered,
+                    fingerprint=relation.catalog_fingerprint)
+
+    @classmethod
+    def _relations_meta(cls, relations: List[Relation]) -> dict:
+        """The source metadata recorded in a replica to detect changed relations on refresh."""
+        return {relation.dot_notation: cls._relation_meta(relation) for relation in relations}
+
+    @classmethod
+    def _changed_graphs(cls, graphs: List[nx.Graph], replica_meta: dict) -> List[nx.Graph]:
+        """Selects the graphs with at least one relation that changed since the replica meta was recorded.
+
+        Relations without a source LAST_ALTERED time are always considered changed.
+        """
+        def changed(relation: Relation) -> bool:
+            return relation.last_altered is None or \
+                replica_meta.get(relation.dot_notation) != cls._relation_meta(relation)
+
+        return [graph for graph in graphs if any(changed(relation) for relation in graph.nodes)]
+
     def load_config(self, config: Union[Path, str, TextIO]):
         """does all the initial work to make the resulting ReplicaFactory
         object usable."""
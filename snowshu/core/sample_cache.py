@@ -0,0 +1,100 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+import pandas as pd
+
+from snowshu.configs import (DEFAULT_SAMPLE_CACHE_DIRECTORY,
+                             DEFAULT_SAMPLE_CACHE_MAX_BYTES)
+from snowshu.logger import Logger
+
+logger = Logger().logger
+
+
+class SampleCache:
+    """A local, content-addressed store of extracted relation samples.
+
+    Samples are keyed by a hash of the compiled extraction query, the source they were
+    extracted from and the sampling seed, so any change to the query produces a new key.
+    When the cache grows beyond ``max_bytes`` the least recently used samples are evicted.
+
+    .. note::
+        The cache does not check whether the source data changed, only whether the query did.
+
+    Args:
+        directory: where cached samples are stored. Default ``~/.snowshu/sample_cache``.
+        max_bytes: the total size the cache is allowed to grow to before evicting. Default 5GB.
+    """
+    SUFFIX = '.pkl'
+
+    def __init__(self,
+                 directory: Union[str, Path] = DEFAULT_SAMPLE_CACHE_DIRECTORY,
+                 max_bytes: int = DEFAULT_SAMPLE_CACHE_MAX_BYTES):
+        self.directory = Path(directory).expanduser()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(query: str, source: str, seed: Optional[int] = None) -> str:
+        """Creates the cache key for an extraction query.
+
+        Args:
+            query: the compiled extraction query.
+            source: an identifier of the source the query runs against, such as the account.
+            seed: the sampling seed, if any.
+        Returns:
+            a hex digest unique to the combination of arguments.
+        """
+        digest = hashlib.sha256()
+        for part in (query, source, str(seed),):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Returns the cached sample for the key, or None if it is not cached."""
+        path = self._path(key)
+        try:
+            frame = pd.read_pickle(path)
+            os.utime(path)  # marks the sample as recently used
+        except FileNotFoundError:
+            logger.debug('Sample cache miss for %s.', key)
+            return None
+        logger.debug('Sample cache hit for %s.', key)
+        return frame
+
+    def put(self, key: str, frame: pd.DataFrame) -> None:
+        """Stores a sample under the key, then evicts samples if the cache is over size."""
+        path = self._path(key)
+        staging_path = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        frame.to_pickle(staging_path)
+        os.replace(staging_path, path)
+        logger.debug('Cached sample %s (%s bytes).', key, path.stat().st_size)
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes least recently used samples until the cache fits in max_bytes."""
+        with self._lock:
+            entries = list()
+            for path in self.directory.glob(f'*{self.SUFFIX}'):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path,))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                logger.debug('Evicting sample %s from cache.', path.name)
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f'{key}{self.SUFFIX}'
@@ -3,6 +3,8 @@
 class BaseSampleMethod:
     """The base class all sample methods inherit from.
     """
+    # sample methods with a seed select the same records on every run over unchanged data
+    seed = None
 
     def name(self):
         raise NotImplementedError("SampleMethod instances must have a name.")
@@ -7,7 +7,12 @@ if TYPE_CHECKING:
 
 class BaseSampling:
     """Base class for all executable sampling classes.
+
+    Samplings whose prepare depends on more than the catalog details of the relation and their own
+    parameters, such as the records in the source, set ``cacheable`` to False so compiled queries
+    are never reused for them.
     """
+    cacheable = True
 
     def sample_method(self):
         raise NotImplementedError()
@@ -15,6 +20,15 @@ class BaseSampling:
     def sample_size_method(self):
         raise NotImplementedError()
 
+    def register(self, relation: "Relation") -> None:
+        """Called for every relation in the replica graph sampled with a copy of this sampling, before any is prepared.
+
+        Samplings that split something across relations, such as a budget, use it to know all of them up front.
+
+        Args:
+            relation: The :class:`Relation <snowshu.core.models.relation.Relation>` object sampled with the sampling.
+        """
+
     def prepare(self,
                 relation: "Relation",
                 source_adapter: "BaseSourceAdapter"):
@@ -30,3 +44,19 @@ class BaseSampling:
                                 instance to use for executing prepare queries.
         """
         raise NotImplementedError()
+
+    def estimate(self,
+                 relation: "Relation",
+                 source_adapter: "BaseSourceAdapter"):
+        """Sizes the sample without querying the source, for estimates.
+
+        Defaults to :meth:`prepare`, samplings that query the source while preparing override it
+        to size the sample from the catalog instead.
+
+        Args:
+            relation: The :class:`Relation <snowshu.core.models.relation.Relation>` object to estimate.
+            source_adapter: A :class:`source adapter
+                                <snowshu.adapters.source_adapters.base_source_adapter.BaseSourceAdapter>`
+                                instance, not to be queried.
+        """
+        self.prepare(relation, source_adapter)
@@ -1 +1,4 @@
 from .bernoulli_sample_method import BernoulliSampleMethod
+from .key_hash_sample_method import KeyHashSampleMethod
+from .recency_window_sample_method import RecencyWindowSampleMethod
+from .system_sample_method import SystemSampleMethod
@@ -9,19 +9,23 @@ class BernoulliSampleMethod(BaseSampleMethod):
     Args:
         value: the numeric sample size determinor, applied as units
         units: the unit of measure for the value param. Default is ``rows``
+        seed: makes the sample deterministic, the same seed selects the same records from unchanged data.
 
     Example:
         ``BernoulliSampleMethod(30)`` would give you a sample derived of aprox. 30 rows.
         ``BernoulliSampleMethod(0.3,units='probability')`` would give you a sample aprox. 30% of the population size.
+        ``BernoulliSampleMethod(30,seed=42)`` would give you the same sample of aprox. 30 rows on every run.
     """
     name = 'BERNOULLI'
 
     def __init__(self,
                  value: Union[int, float],
-                 units: Optional[str] = 'rows'):
+                 units: Optional[str] = 'rows',
+                 seed: Optional[int] = None):
         ok_units = ('rows', 'probability',)
         assert units in ok_units
         self._rows, self._probability = [value if u == units else None for u in ok_units]
+        self.seed = seed
 
     @property
     def rows(self) -> int:
@@ -0,0 +1,32 @@
+from typing import Optional
+
+from snowshu.core.samplings.bases.base_sample_method import BaseSampleMethod
+
+
+class KeyHashSampleMethod(BaseSampleMethod):
+    """Sample selection by the hash of a key attribute.
+
+    Records are selected when ``MOD(HASH(key), buckets) < selected_buckets``. The same key value always hashes
+    to the same bucket, so relations sampled on the same key domain select the same keys without any
+    constraint on each other.
+
+    Args:
+        key: the attribute to hash.
+        buckets: the number of buckets the key domain is split into.
+        selected_buckets: the number of buckets to select.
+        seed: salts the hash, relations must use the same seed to select the same keys.
+
+    Example:
+        ``KeyHashSampleMethod('customer_id', 1000, 100)`` would give you the records of aprox. 10% of customers.
+    """
+    name = 'KEY_HASH'
+
+    def __init__(self,
+                 key: str,
+                 buckets: int,
+                 selected_buckets: int,
+                 seed: Optional[int] = None):
+        self.key = key
+        self.buckets = buckets
+        self.selected_buckets = selected_buckets
+        self.seed = seed
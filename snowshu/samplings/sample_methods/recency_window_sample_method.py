@@ -0,0 +1,37 @@
+from typing import Any, Optional
+
+from snowshu.core.samplings.bases.base_sample_method import BaseSampleMethod
+
+
+class RecencyWindowSampleMethod(BaseSampleMethod):
+    """Sample selection from the most recent records of a relation.
+
+    Only the records with a timestamp attribute at or after the start of the window are read, which lets
+    sources prune the rest of a relation clustered or partitioned by that attribute. The window is then
+    row sampled down to an approximate number of rows.
+
+    Args:
+        attribute: the timestamp or date attribute the window is on.
+        window_start: the earliest value of the attribute in the window.
+        rows: the approximate number of rows to sample from the window.
+        seed: makes the sample deterministic, the same seed selects the same records from unchanged data.
+
+    Example:
+        ``RecencyWindowSampleMethod('created_at', '2020-01-01', 1000)`` would give you aprox. 1000 rows
+        created since 2020.
+    """
+    name = 'RECENCY_WINDOW'
+
+    def __init__(self,
+                 attribute: str,
+                 window_start: Any,
+                 rows: int,
+                 seed: Optional[int] = None):
+        self.attribute = attribute
+        self.window_start = window_start
+        self._rows = rows
+        self.seed = seed
+
+    @property
+    def rows(self) -> int:
+        return self._rows
@@ -0,0 +1,37 @@
+from typing import Optional, Union
+
+from snowshu.core.samplings.bases.base_sample_method import BaseSampleMethod
+
+
+class SystemSampleMethod(BaseSampleMethod):
+    """Sample selection using the system (block) sampling method.
+
+    Whole blocks of the relation are selected with the given probability, so most of the relation is never read.
+    Because block sizes vary, the selected blocks can be further sampled down to an approximate number of rows.
+
+    Args:
+        probability: the percent of blocks to select.
+        rows: the approximate number of rows to sample from the selected blocks, if any.
+        seed: makes the sample deterministic, the same seed selects the same records from unchanged data.
+
+    Example:
+        ``SystemSampleMethod(5)`` would give you the records in aprox. 5% of the blocks.
+        ``SystemSampleMethod(5,rows=1000)`` would give you aprox. 1000 rows from aprox. 5% of the blocks.
+    """
+    name = 'SYSTEM'
+
+    def __init__(self,
+                 probability: Union[int, float],
+                 rows: Optional[int] = None,
+                 seed: Optional[int] = None):
+        self._probability = probability
+        self._rows = rows
+        self.seed = seed
+
+    @property
+    def rows(self) -> Optional[int]:
+        return self._rows
+
+    @property
+    def probability(self) -> Union[int, float]:
+        return self._probability
@@ -1,2 +1,6 @@
+from .block_sampling import BlockSampling
 from .brute_force_sampling import BruteForceSampling
+from .byte_budget_sampling import ByteBudgetSampling
 from .default_sampling import DefaultSampling
+from .key_hash_sampling import KeyHashSampling
+from .recency_window_sampling import RecencyWindowSampling
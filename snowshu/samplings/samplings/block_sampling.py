@@ -0,0 +1,96 @@
+from typing import TYPE_CHECKING
+
+from snowshu.configs import (DEFAULT_BLOCK_SAMPLING_BLOCK_BYTES,
+                             DEFAULT_BLOCK_SAMPLING_BLOCK_ROWS,
+                             DEFAULT_BLOCK_SAMPLING_MIN_BYTES,
+                             DEFAULT_BLOCK_SAMPLING_MIN_ROWS)
+from snowshu.core.samplings.bases.base_sampling import BaseSampling
+from snowshu.samplings.sample_methods import (BernoulliSampleMethod,
+                                              SystemSampleMethod)
+from snowshu.samplings.sample_sizes import CochransSampleSize
+
+if TYPE_CHECKING:
+    from snowshu.core.models.relation import Relation
+    from snowshu.adapters.source_adapters.base_source_adapter import BaseSourceAdapter
+
+
+class BlockSampling(BaseSampling):
+    """
+    Sampling for very large relations using
+    :class:`Cochrans <snowshu.samplings.sample_sizes.cochrans_sample_size.CochransSampleSize>`
+    theorem for sample size and
+    :class:`System <snowshu.samplings.sample_methods.system_sample_method.SystemSampleMethod>`
+    sampling for relations over a row count or size threshold.
+
+    Block sampling only reads the selected blocks of a relation instead of scanning all of it. Blocks are
+    oversampled and then row sampled down to the sample size, which makes up for the uneven size of blocks.
+    The block probability is raised so at least ``min_blocks`` blocks are expected, since a probability
+    sized by rows alone selects no blocks at all in very large relations.
+    Relations under both thresholds, or without catalog sizes, are sampled with :class:`Bernoulli
+    <snowshu.samplings.sample_methods.bernoulli_sample_method.BernoulliSampleMethod>` sampling.
+
+    Args:
+        margin_of_error: The acceptable error % expressed in a decimal from 0.01 to 0.10 (1% to 10%). Default 0.02 (2%).
+        confidence: The confidence interval to be observed for the sample expressed in a decimal
+            from 0.01 to 0.99 (1% to 99%). Default 0.99 (99%).
+        min_sample_size: The minimum number of records to retrieve from the population. Default 1000.
+        min_rows: The catalog row count from which relations are block sampled. Default 100 million.
+        min_bytes: The catalog size in bytes from which relations are block sampled. Default 10GB.
+        oversampling: How many times the sample size to select in blocks before row sampling. Default 3.
+        min_blocks: The least number of blocks expected to be selected. Default 10.
+    """
+
+    size: int
+
+    def __init__(self,  # noqa pylint: disable=too-many-arguments
+                 margin_of_error: float = 0.02,
+                 confidence: float = 0.99,
+                 min_sample_size: int = 1000,
+                 min_rows: int = DEFAULT_BLOCK_SAMPLING_MIN_ROWS,
+                 min_bytes: int = DEFAULT_BLOCK_SAMPLING_MIN_BYTES,
+                 oversampling: float = 3,
+                 min_blocks: int = 10):
+        self.min_sample_size = min_sample_size
+        self.min_rows = min_rows
+        self.min_bytes = min_bytes
+        self.oversampling = oversampling
+        self.min_blocks = min_blocks
+        self.sample_size_method = CochransSampleSize(margin_of_error,
+                                                     confidence)
+
+    def prepare(self,
+                relation: "Relation",
+                source_adapter: "BaseSourceAdapter") -> None:
+        """Runs all necessary pre-activities and instantiates the sample method.
+
+        Args:
+            relation: The :class:`Relation <snowshu.core.models.relation.Relation>` object to prepare.
+            source_adapter: The :class:`source adapter
+                <snowshu.adapters.source_adapters.base_source_adapter.BaseSourceAdapter>` instance to use
+                for executing prepare queries.
+        """
+        self.size = max(self.sample_size_method.size(
+                        relation.population_size),
+                        self.min_sample_size)
+
+        block_probability = max(100.0 * self.oversampling * self.size / max(relation.population_size, 1),
+                                100.0 * self.min_blocks / self._estimated_blocks(relation))
+        if self._is_large(relation) and block_probability < 100:
+            self.sample_method = SystemSampleMethod(block_probability,
+                                                    rows=self.size,
+                                                    seed=relation.seed)
+        else:
+            self.sample_method = BernoulliSampleMethod(self.size,
+                                                       units='rows',
+                                                       seed=relation.seed)
+
+    @staticmethod
+    def _estimated_blocks(relation: "Relation") -> float:
+        """estimates the number of storage blocks of a relation from its catalog size or row count."""
+        if relation.size_in_bytes:
+            return max(relation.size_in_bytes / DEFAULT_BLOCK_SAMPLING_BLOCK_BYTES, 1)
+        return max((relation.row_count or relation.population_size) / DEFAULT_BLOCK_SAMPLING_BLOCK_ROWS, 1)
+
+    def _is_large(self, relation: "Relation") -> bool:
+        return any((relation.row_count is not None and relation.row_count >= self.min_rows,
+                    relation.size_in_bytes is not None and relation.size_in_bytes >= self.min_bytes,))
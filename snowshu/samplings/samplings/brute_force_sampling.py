@@ -43,4 +43,5 @@ class BruteForceSampling(BaseSampling):
         self.size = max(self.sample_size_method.size(relation.population_size),
                         self.min_sample_size)
         self.sample_method = BernoulliSampleMethod(self.size,
-                                                   units='rows')
+                                                   units='rows',
+                                                   seed=relation.seed)
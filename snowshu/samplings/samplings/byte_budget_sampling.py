@@ -0,0 +1,122 @@
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from snowshu.configs import DEFAULT_BYTE_BUDGET_SAMPLING_MAX_BYTES
+from snowshu.core.samplings.bases.base_sampling import BaseSampling
+from snowshu.samplings.sample_methods import BernoulliSampleMethod
+from snowshu.samplings.sample_sizes import CochransSampleSize
+
+if TYPE_CHECKING:
+    from snowshu.core.models.relation import Relation
+    from snowshu.adapters.source_adapters.base_source_adapter import BaseSourceAdapter
+
+
+class _ReplicaByteBudget:
+    """The bytes for all the relations of a replica, shared by every copy of a sampling.
+
+    The budget is split in proportion to the bytes each registered relation wants, so a relation is
+    granted the same share however many times and in whatever order the relations are prepared.
+    """
+
+    def __init__(self, max_bytes: Optional[float]):
+        self.max_bytes = max_bytes
+        self._wanted = dict()
+        self._lock = threading.Lock()
+
+    def register(self, dot_notation: str, wanted: float) -> None:
+        """Adds the bytes a relation wants to the ones the budget is split over."""
+        with self._lock:
+            self._wanted[dot_notation] = wanted
+
+    def share(self, dot_notation: str, wanted: float) -> float:
+        """Returns the bytes of the budget granted to a relation, registering it if it is not yet."""
+        if self.max_bytes is None:
+            return wanted
+        with self._lock:
+            wanted = self._wanted.setdefault(dot_notation, wanted)
+            # summed in a fixed order so the shares do not depend on the order of registration
+            total = sum(self._wanted[name] for name in sorted(self._wanted))
+        return wanted if total <= self.max_bytes else self.max_bytes * wanted / total
+
+
+class ByteBudgetSampling(BaseSampling):
+    """
+    Sampling sized by bytes instead of rows, using the catalog size and row count of a relation and :class:`Bernoulli
+    <snowshu.samplings.sample_methods.bernoulli_sample_method.BernoulliSampleMethod>` sampling.
+
+    Each relation samples as many rows as fit in the per relation budget, so wide relations sample fewer rows and
+    narrow relations more. Relations sampled with the same configured sampling also share the per replica budget,
+    which is split over them in proportion to the bytes each wants. Relations without catalog sizes (such as views)
+    are sized with :class:`Cochrans <snowshu.samplings.sample_sizes.cochrans_sample_size.CochransSampleSize>` theorem
+    and do not count against the replica budget.
+
+    Args:
+        max_bytes: The source bytes to sample from each relation. Default 100MB.
+        replica_max_bytes: The source bytes to sample from all relations. Default unlimited.
+        min_sample_size: The minimum number of records to retrieve from the population, even over budget. Default 100.
+        margin_of_error: The acceptable error % for relations without catalog sizes, expressed in a decimal
+            from 0.01 to 0.10 (1% to 10%). Default 0.02 (2%).
+        confidence: The confidence interval for relations without catalog sizes, expressed in a decimal
+            from 0.01 to 0.99 (1% to 99%). Default 0.99 (99%).
+    """
+
+    size: int
+
+    def __init__(self,  # noqa pylint: disable=too-many-arguments
+                 max_bytes: float = DEFAULT_BYTE_BUDGET_SAMPLING_MAX_BYTES,
+                 replica_max_bytes: Optional[float] = None,
+                 min_sample_size: int = 100,
+                 margin_of_error: float = 0.02,
+                 confidence: float = 0.99):
+        self.max_bytes = max_bytes
+        self.min_sample_size = min_sample_size
+        # copies of this sampling made for each relation keep the same budget object
+        self.replica_budget = _ReplicaByteBudget(replica_max_bytes)
+        self.sample_size_method = CochransSampleSize(margin_of_error,
+                                                     confidence)
+
+    @property
+    def cacheable(self) -> bool:
+        """the share of a replica budget depends on the other relations sharing it."""
+        return self.replica_budget.max_bytes is None
+
+    def register(self, relation: "Relation") -> None:
+        """Adds the relation to those sharing the replica budget.
+
+        Args:
+            relation: The :class:`Relation <snowshu.core.models.relation.Relation>` object sampled with this sampling.
+        """
+        if self._bytes_per_row(relation) is not None:
+            self.replica_budget.register(relation.dot_notation, self._wanted_bytes(relation))
+
+    def prepare(self,
+                relation: "Relation",
+                source_adapter: "BaseSourceAdapter") -> None:
+        """Sizes the sample to the byte budgets and instantiates the sample method.
+
+        Args:
+            relation: The :class:`Relation <snowshu.core.models.relation.Relation>` object to prepare.
+            source_adapter: The :class:`source adapter
+                <snowshu.adapters.source_adapters.base_source_adapter.BaseSourceAdapter>` instance to use
+                for executing prepare queries.
+        """
+        bytes_per_row = self._bytes_per_row(relation)
+        if bytes_per_row is None:
+            self.size = max(self.sample_size_method.size(relation.population_size),
+                            self.min_sample_size)
+        else:
+            granted = self.replica_budget.share(relation.dot_notation, self._wanted_bytes(relation))
+            self.size = max(int(granted // bytes_per_row), self.min_sample_size)
+
+        self.sample_method = BernoulliSampleMethod(self.size,
+                                                   units='rows',
+                                                   seed=relation.seed)
+
+    def _wanted_bytes(self, relation: "Relation") -> float:
+        return min(relation.size_in_bytes, self.max_bytes)
+
+    @staticmethod
+    def _bytes_per_row(relation: "Relation") -> Optional[float]:
+        if not (relation.row_count and relation.size_in_bytes):
+            return None
+        return relation.size_in_bytes / relation.row_count
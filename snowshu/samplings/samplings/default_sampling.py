@@ -55,4 +55,5 @@ class DefaultSampling(BaseSampling):
                         self.min_sample_size)
 
         self.sample_method = BernoulliSampleMethod(self.size,
-                                                   units='rows')
+                                                   units='rows',
+                                                   seed=relation.seed)
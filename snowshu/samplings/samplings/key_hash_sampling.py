@@ -0,0 +1,61 @@
+from typing import TYPE_CHECKING
+
+from snowshu.core.samplings.bases.base_sampling import BaseSampling
+from snowshu.samplings.sample_methods import KeyHashSampleMethod
+
+if TYPE_CHECKING:
+    from snowshu.core.models.relation import Relation
+    from snowshu.adapters.source_adapters.base_source_adapter import BaseSourceAdapter
+
+
+class KeyHashSampling(BaseSampling):
+    """
+    Sampling on a shared key domain using :class:`KeyHash
+    <snowshu.samplings.sample_methods.key_hash_sample_method.KeyHashSampleMethod>` sampling.
+
+    Every relation sampled with the same probability and buckets on the same key domain selects the same keys,
+    so directional relationships between them are kept without filtering the downstream relation on the
+    keys sampled upstream. Those relations are sampled independently and in parallel.
+
+    Args:
+        key: The attribute holding the key to sample on.
+        probability: The % of keys to sample in decimal format from 0.0001 to 1. Default 10%.
+        buckets: The number of buckets the key domain is split into. Default 10000.
+    """
+
+    size: int
+
+    def __init__(self,
+                 key: str,
+                 probability: float = 0.10,
+                 buckets: int = 10000):
+        if not 0 < probability <= 1:
+            raise ValueError(f"Probability must be between 0 and 1, is {probability}")
+        self.key = key
+        self.buckets = int(buckets)
+        self.selected_buckets = max(1, round(probability * self.buckets))
+
+    def shares_key_domain(self, other: BaseSampling) -> bool:
+        """True when the other sampling selects the same buckets of the same key domain."""
+        return isinstance(other, KeyHashSampling) and \
+            (self.buckets, self.selected_buckets,) == (other.buckets, other.selected_buckets,)
+
+    def prepare(self,
+                relation: "Relation",
+                source_adapter: "BaseSourceAdapter") -> None:
+        """Runs all necessary pre-activities and instantiates the sample method.
+
+        The sample size is estimated from the selected share of buckets, there is no minimum sample size since
+        every relation on the key domain must select the same keys.
+
+        Args:
+            relation: The :class:`Relation <snowshu.core.models.relation.Relation>` object to prepare.
+            source_adapter: The :class:`source adapter
+                <snowshu.adapters.source_adapters.base_source_adapter.BaseSourceAdapter>` instance to use
+                for executing prepare queries.
+        """
+        self.size = round(relation.population_size * self.selected_buckets / self.buckets)
+        self.sample_method = KeyHashSampleMethod(self.key,
+                                                 self.buckets,
+                                                 self.selected_buckets,
+                                                 seed=relation.seed)
@@ -0,0 +1,104 @@
+from typing import TYPE_CHECKING, Any, Optional
+
+import pandas as pd
+
+from snowshu.core.samplings.bases.base_sampling import BaseSampling
+from snowshu.samplings.sample_methods import (BernoulliSampleMethod,
+                                              RecencyWindowSampleMethod)
+from snowshu.samplings.sample_sizes import CochransSampleSize
+
+if TYPE_CHECKING:
+    from snowshu.core.models.relation import Relation
+    from snowshu.adapters.source_adapters.base_source_adapter import BaseSourceAdapter
+
+
+class RecencyWindowSampling(BaseSampling):
+    """
+    Sampling of the most recent records of a relation using :class:`Cochrans
+    <snowshu.samplings.sample_sizes.cochrans_sample_size.CochransSampleSize>` theorem for sample size and
+    :class:`RecencyWindow <snowshu.samplings.sample_methods.recency_window_sample_method.RecencyWindowSampleMethod>`
+    sampling.
+
+    Only the records in the window are read, so relations clustered or partitioned by the window attribute
+    are sampled without scanning the whole relation. The sample size is based on the number of records in
+    the window. Estimates size the sample from the catalog row count and last altered time instead of
+    finding the window in the source.
+
+    Args:
+        attribute: The timestamp or date attribute to select the most recent records by.
+        days: The number of days up to the latest value of the attribute to sample from.
+        partitions: The number of most recent dates with records to sample from, used instead of days.
+        margin_of_error: The acceptable error % expressed in a decimal from 0.01 to 0.10 (1% to 10%). Default 0.02 (2%).
+        confidence: The confidence interval to be observed for the sample expressed in a decimal
+            from 0.01 to 0.99 (1% to 99%). Default 0.99 (99%).
+        min_sample_size: The minimum number of records to retrieve from the window. Default 1000.
+    """
+
+    size: int
+    # the window is found from the records in the source
+    cacheable = False
+
+    def __init__(self,  # noqa pylint: disable=too-many-arguments
+                 attribute: str,
+                 days: Optional[int] = None,
+                 partitions: Optional[int] = None,
+                 margin_of_error: float = 0.02,
+                 confidence: float = 0.99,
+                 min_sample_size: int = 1000):
+        if (days is None) == (partitions is None):
+            raise ValueError("Recency window sampling needs exactly one of days or partitions.")
+        self.attribute = attribute
+        self.days = days
+        self.partitions = partitions
+        self.min_sample_size = min_sample_size
+        self.sample_size_method = CochransSampleSize(margin_of_error,
+                                                     confidence)
+
+    def prepare(self,
+                relation: "Relation",
+                source_adapter: "BaseSourceAdapter") -> None:
+        """Finds the recency window and instantiates the sample method.
+
+        Args:
+            relation: The :class:`Relation <snowshu.core.models.relation.Relation>` object to prepare.
+            source_adapter: The :class:`source adapter
+                <snowshu.adapters.source_adapters.base_source_adapter.BaseSourceAdapter>` instance to use
+                for finding the window.
+        """
+        window_start, window_size = source_adapter.recency_window(relation,
+                                                                  self.attribute,
+                                                                  days=self.days,
+                                                                  partitions=self.partitions)
+        self._set_sample_method(relation, window_start, window_size)
+
+    def estimate(self,
+                 relation: "Relation",
+                 source_adapter: "BaseSourceAdapter") -> None:
+        """Sizes the sample from the catalog without querying the source.
+
+        The window is assumed to hold every record of the relation, so the size is an upper bound, and
+        a window of days is assumed to end at the time the relation was last altered.
+
+        Args:
+            relation: The :class:`Relation <snowshu.core.models.relation.Relation>` object to estimate.
+            source_adapter: The :class:`source adapter
+                <snowshu.adapters.source_adapters.base_source_adapter.BaseSourceAdapter>` instance, not queried.
+        """
+        window_start = None
+        if self.days is not None and relation.last_altered is not None:
+            window_start = str(pd.Timestamp(relation.last_altered) - pd.Timedelta(days=self.days))
+        self._set_sample_method(relation, window_start, relation.row_count or 0)
+
+    def _set_sample_method(self, relation: "Relation", window_start: Any, window_size: int) -> None:
+        self.size = max(self.sample_size_method.size(window_size),
+                        self.min_sample_size)
+        if window_start is None:
+            # there is no latest record to window from, so the relation is empty
+            self.sample_method = BernoulliSampleMethod(self.size,
+                                                       units='rows',
+                                                       seed=relation.seed)
+            return
+        self.sample_method = RecencyWindowSampleMethod(self.attribute,
+                                                       window_start,
+                                                       self.size,
+                                                       seed=relation.seed)
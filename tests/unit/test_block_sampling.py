@@ -0,0 +1,63 @@
+import mock
+import pytest
+
+from snowshu.samplings.sample_methods import (BernoulliSampleMethod,
+                                              SystemSampleMethod)
+from snowshu.samplings.samplings import BlockSampling
+
+
+@pytest.fixture()
+def mock_args():
+    mock_rel=mock.MagicMock()
+    mock_rel.seed=None
+    mock_rel.row_count=None
+    mock_rel.size_in_bytes=None
+    mock_source_adapter=mock.MagicMock()
+    yield mock_rel,mock_source_adapter
+
+
+ONE_BILLION_ROWS=1e9
+ONE_HUNDRED_THOUSAND_ROWS=1e5
+def test_block_sampling_large_by_rows(mock_args):
+    mock_args[0].population_size=mock_args[0].row_count=ONE_BILLION_ROWS
+    block=BlockSampling()
+    block.prepare(*mock_args)
+
+    assert isinstance(block.sample_method, SystemSampleMethod)
+    assert block.sample_method.rows == 4147
+    # sized by rows the probability would be 0.00124%, which selects no blocks at all
+    assert block.sample_method.probability == pytest.approx(0.1)
+    assert block.sample_method.probability / 100 * ONE_BILLION_ROWS / 100000 >= 10
+
+def test_block_sampling_large_by_bytes(mock_args):
+    mock_args[0].population_size=mock_args[0].row_count=ONE_HUNDRED_THOUSAND_ROWS
+    mock_args[0].size_in_bytes=1024 ** 4
+    block=BlockSampling(min_rows=1e12)
+    block.prepare(*mock_args)
+
+    assert isinstance(block.sample_method, SystemSampleMethod)
+
+def test_block_sampling_small(mock_args):
+    mock_args[0].population_size=mock_args[0].row_count=ONE_HUNDRED_THOUSAND_ROWS
+    block=BlockSampling()
+    block.prepare(*mock_args)
+
+    assert isinstance(block.sample_method, BernoulliSampleMethod)
+    assert block.sample_method.rows == 4147
+
+def test_block_sampling_not_worth_it(mock_args):
+    """ relations where the oversampled blocks would be the whole relation are row sampled """
+    mock_args[0].population_size=mock_args[0].row_count=ONE_HUNDRED_THOUSAND_ROWS
+    block=BlockSampling(min_rows=1000, min_sample_size=50000)
+    block.prepare(*mock_args)
+
+    assert isinstance(block.sample_method, BernoulliSampleMethod)
+
+def test_block_sampling_min_blocks_by_bytes(mock_args):
+    mock_args[0].population_size=mock_args[0].row_count=ONE_BILLION_ROWS
+    mock_args[0].size_in_bytes=16 * 1024 ** 3
+    block=BlockSampling(min_blocks=20)
+    block.prepare(*mock_args)
+
+    # 16GB is about 1024 blocks, 20 of them are expected to be selected
+    assert block.sample_method.probability == pytest.approx(100.0 * 20 / 1024)
@@ -0,0 +1,101 @@
+import mock
+import networkx as nx
+import pandas as pd
+
+from snowshu.core.build_checkpoint import BuildCheckpoint
+from snowshu.core.graph_set_runner import GraphExecutable, GraphSetRunner
+from snowshu.core.printable_result import graph_to_result_list, printable_result
+from snowshu.samplings.samplings import DefaultSampling
+from tests.common import rand_string
+
+
+def test_checkpoint_round_trip(tmpdir, stub_relation_set):
+    upstream = stub_relation_set.upstream_relation
+    key = stub_relation_set.directional_key
+    upstream.data = pd.DataFrame({key: [1, 2, 2, 3]})
+    upstream.source_extracted = upstream.target_loaded = True
+    upstream.population_size, upstream.sample_size = 1000, 4
+
+    name = rand_string(10)
+    checkpoint = BuildCheckpoint(name, tmpdir)
+    assert not checkpoint.exists()
+    assert not checkpoint.is_loaded(upstream)
+    checkpoint.record(upstream, [key])
+
+    # a new run picks up the checkpoint from disk
+    resumed = BuildCheckpoint(name, tmpdir)
+    assert resumed.exists()
+    assert resumed.is_loaded(upstream)
+    assert not resumed.is_loaded(stub_relation_set.downstream_relation)
+    upstream.target_loaded = False
+    del upstream._data
+    resumed.restore(upstream)
+    assert upstream.target_loaded
+    assert upstream.sample_size == 4
+    assert sorted(upstream.data[key].tolist()) == [1, 2, 3]
+
+    resumed.clear()
+    assert not BuildCheckpoint(name, tmpdir).exists()
+
+
+def test_runner_skips_checkpointed_relations(tmpdir, stub_graph_set):
+    graph_set, vals = stub_graph_set
+    dag = graph_set[-1]
+    upstream = vals.upstream_relation
+    key = vals.directional_key
+    upstream.data = pd.DataFrame({key: [7, 8]})
+    upstream.source_extracted = upstream.target_loaded = True
+    upstream.population_size, upstream.sample_size = 100, 2
+    checkpoint = BuildCheckpoint(rand_string(10), tmpdir)
+    checkpoint.record(upstream, [key])
+    del upstream._data
+    upstream.target_loaded = False
+
+    runner = GraphSetRunner()
+    runner.barf = False
+    runner.checkpoint = checkpoint
+    source_adapter, target_adapter = [mock.MagicMock() for _ in range(2)]
+    source_adapter.population_size.return_value = 100
+    source_adapter.check_count_and_query.return_value = pd.DataFrame({key: [7]})
+    graph = nx.DiGraph()
+    graph.add_edge(upstream, vals.downstream_relation, **dag.get_edge_data(upstream, vals.downstream_relation))
+    for rel in graph.nodes:
+        rel.unsampled = False
+        rel.include_outliers = False
+        rel.sampling = mock.MagicMock()
+
+    with mock.patch('snowshu.core.graph_set_runner.RuntimeSourceCompiler') as compiler:
+        compiler.compile_queries_for_relation.side_effect = lambda rel, *args: rel
+        runner._traverse_and_execute(GraphExecutable(graph, source_adapter, target_adapter, False))
+
+    # only the downstream relation is extracted and loaded
+    assert source_adapter.check_count_and_query.call_count == 1
+    target_adapter.create_and_load_relation.assert_called_once_with(vals.downstream_relation)
+    assert upstream.target_loaded
+    assert upstream.data[key].tolist() == [7, 8]
+    assert checkpoint.is_loaded(vals.downstream_relation)
+
+
+def test_resumed_relations_are_reported(tmpdir, stub_relation_set):
+    upstream = stub_relation_set.upstream_relation
+    upstream.sampling = DefaultSampling()
+    upstream.sampling.size = 500
+    upstream.source_extracted = upstream.target_loaded = True
+    upstream.unsampled = False
+    upstream.population_size, upstream.sample_size = 1000, 498
+    name = rand_string(10)
+    BuildCheckpoint(name, tmpdir).record(upstream, [])
+
+    # a resumed build restores the relation with a fresh, unprepared sampling
+    upstream.sampling = DefaultSampling()
+    BuildCheckpoint(name, tmpdir).restore(upstream)
+    graph = nx.DiGraph()
+    graph.add_node(upstream)
+    report = graph_to_result_list([graph])
+    assert report[0].target_sample_size == 500
+    assert report[0].percent_to_target == 100
+    assert 'RUN RESULTS' in printable_result(report, False)
+
+    # checkpoints written before target sample sizes were recorded fall back to the sample size
+    upstream.sampling = DefaultSampling()
+    assert graph_to_result_list([graph])[0].target_sample_size == 498
@@ -0,0 +1,56 @@
+import copy
+
+import mock
+
+from snowshu.core.compile_cache import CompileCache
+from snowshu.samplings.samplings import ByteBudgetSampling
+
+
+def relation_of(row_count, size_in_bytes, name='relation'):
+    mock_rel=mock.MagicMock()
+    mock_rel.dot_notation=name
+    mock_rel.seed=None
+    mock_rel.population_size=mock_rel.row_count=row_count
+    mock_rel.size_in_bytes=size_in_bytes
+    return mock_rel
+
+
+def test_byte_budget_sampling_sizes_by_row_width():
+    wide=ByteBudgetSampling(max_bytes=1e6)
+    wide.prepare(relation_of(1e6, 1e10), mock.MagicMock())
+    narrow=ByteBudgetSampling(max_bytes=1e6)
+    narrow.prepare(relation_of(1e6, 1e8), mock.MagicMock())
+
+    assert wide.size == 100
+    assert narrow.size == 10000
+    assert narrow.sample_method.rows == 10000
+
+def test_byte_budget_sampling_shares_replica_budget():
+    sampling=ByteBudgetSampling(max_bytes=1e6, replica_max_bytes=1.5e6, min_sample_size=0)
+    relations=[relation_of(1e6, size_in_bytes, f'relation_{i}') for i, size_in_bytes in enumerate((1e8, 1e8, 5e5,))]
+    samplings=[copy.copy(sampling) for _ in relations]
+    for relation, relation_sampling in zip(relations, samplings):
+        relation_sampling.register(relation)
+    fingerprint=CompileCache._sampling_fingerprint(samplings[0])
+
+    # the budget is split in proportion to the bytes wanted, whatever order relations are prepared in
+    for relation, relation_sampling in reversed(list(zip(relations, samplings))):
+        relation_sampling.prepare(relation, mock.MagicMock())
+    assert [relation_sampling.size for relation_sampling in samplings] == [6000, 6000, 600000]
+    samplings[0].prepare(relations[0], mock.MagicMock())
+    assert samplings[0].size == 6000
+    assert CompileCache._sampling_fingerprint(samplings[0]) == fingerprint
+    # shares depend on the other relations, so compiled queries are not cached for them
+    assert not samplings[0].cacheable
+    assert ByteBudgetSampling().cacheable
+    assert CompileCache._sampling_fingerprint(ByteBudgetSampling(max_bytes=1e6, replica_max_bytes=1e6, min_sample_size=0)) != \
+        fingerprint
+
+def test_byte_budget_sampling_without_catalog_size():
+    sampling=ByteBudgetSampling(replica_max_bytes=0)
+    view=relation_of(None, None)
+    view.population_size=1e6
+    sampling.prepare(view, mock.MagicMock())
+
+    # views are sized with cochrans theorem and are not limited by the replica budget
+    assert sampling.size == 4147
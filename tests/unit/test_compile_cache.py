@@ -0,0 +1,73 @@
+import mock
+import networkx as nx
+
+from snowshu.adapters.source_adapters.snowflake_adapter import SnowflakeAdapter
+from snowshu.core.compile_cache import CompileCache
+from snowshu.core.graph_set_runner import GraphSetRunner
+from snowshu.core.models import Attribute, Credentials
+from snowshu.core.models import data_types as dt
+from snowshu.samplings.samplings import (BruteForceSampling, DefaultSampling,
+                                       RecencyWindowSampling)
+
+
+def directional_graph(stub_relation_set):
+    upstream=stub_relation_set.upstream_relation
+    downstream=stub_relation_set.downstream_relation
+    for relation in (upstream, downstream,):
+        relation.attributes=[Attribute('id', dt.INTEGER)]
+        relation.sampling=DefaultSampling()
+    graph=nx.DiGraph()
+    graph.add_edge(upstream, downstream, direction='directional', remote_attribute='id', local_attribute='id')
+    return graph, upstream, downstream
+
+
+def test_compile_cache_keys(stub_relation_set):
+    graph, upstream, downstream=directional_graph(stub_relation_set)
+    upstream_key=CompileCache.key(upstream, graph, dict(), 'source')
+    downstream_key=CompileCache.key(downstream, graph, {upstream: upstream_key}, 'source')
+
+    assert upstream_key == CompileCache.key(upstream, graph, dict(), 'source')
+    assert downstream_key != CompileCache.key(downstream, graph, {upstream: 'changed'}, 'source')
+    upstream.sampling=DefaultSampling(margin_of_error=0.05)
+    assert upstream_key != CompileCache.key(upstream, graph, dict(), 'source')
+    assert CompileCache.key(upstream, graph, dict(), 'source') != \
+        CompileCache.key(upstream, graph, dict(), 'other source')
+    assert CompileCache._sampling_fingerprint(BruteForceSampling(0.1)) != \
+        CompileCache._sampling_fingerprint(BruteForceSampling(0.2))
+
+
+def test_compile_graph_set_reads_cache(tmpdir, stub_relation_set):
+    graph, upstream, downstream=directional_graph(stub_relation_set)
+    source_adapter=SnowflakeAdapter()
+    source_adapter.credentials=Credentials(user='user', password='password', account='account', database='database')
+    cache=CompileCache(tmpdir)
+
+    with mock.patch.object(source_adapter, 'population_size', return_value=1000) as population_size:
+        assert GraphSetRunner().compile_graph_set([graph], source_adapter, 1, cache) == 0
+        compiled=downstream.core_query
+        # the downstream query selects from the upstream query, not from sampled records
+        assert upstream.core_query in compiled
+
+        assert GraphSetRunner().compile_graph_set([graph], source_adapter, 1, cache) == 2
+        assert population_size.call_count == 2
+    assert downstream.core_query == compiled
+
+
+def test_compile_graph_set_prepares_uncacheable_samplings(tmpdir, stub_relation_set):
+    graph, upstream, downstream=directional_graph(stub_relation_set)
+    upstream.sampling=RecencyWindowSampling('id', days=7)
+    source_adapter=SnowflakeAdapter()
+    source_adapter.credentials=Credentials(user='user', password='password', account='account', database='database')
+    cache=CompileCache(tmpdir)
+
+    with mock.patch.object(source_adapter, 'population_size', return_value=1000), \
+            mock.patch.object(source_adapter, 'recency_window', return_value=(1, 500)) as recency_window:
+        assert GraphSetRunner().compile_graph_set([graph], source_adapter, 1, cache) == 0
+        # the window is found again, and the unchanged upstream query keeps the downstream one cached
+        assert GraphSetRunner().compile_graph_set([graph], source_adapter, 1, cache) == 1
+        assert recency_window.call_count == 2
+
+        recency_window.return_value=(5, 500)
+        assert GraphSetRunner().compile_graph_set([graph], source_adapter, 1, cache) == 0
+    assert "id >= '5'" in upstream.core_query
+    assert upstream.core_query in downstream.core_query
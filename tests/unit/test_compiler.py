@@ -13,7 +13,7 @@ from snowshu.adapters.source_adapters.snowflake_adapter import SnowflakeAdapter
 from snowshu.core.compile import RuntimeSourceCompiler
 from snowshu.core.models.attribute import Attribute
 from snowshu.core.models.relation import Relation
-from snowshu.samplings.sample_methods import BernoulliSampleMethod
+from snowshu.samplings.sample_methods import BernoulliSampleMethod, SystemSampleMethod
 from snowshu.samplings.samplings import DefaultSampling
 from tests.common import query_equalize, rand_string
 
@@ -158,14 +158,11 @@ UNION
 (SELECT
     *
 FROM
-{downstream.quoted_dot_notation}
+{downstream.quoted_dot_notation} AS __snowshu_subject
 WHERE
-id 
-NOT IN 
-(SELECT
-    id
-FROM
-{upstream.quoted_dot_notation})
+    (id IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM {upstream.quoted_dot_notation} AS __snowshu_constraint
+        WHERE __snowshu_constraint.id = __snowshu_subject.id))
 LIMIT 100) 
 """)
 
@@ -191,14 +188,12 @@ UNION
 (SELECT 
     * 
 FROM 
-{upstream.quoted_dot_notation} 
+{upstream.quoted_dot_notation} AS __snowshu_subject
 WHERE 
-    id 
-NOT IN 
-    (SELECT 
-        id 
-    FROM 
-{downstream.quoted_dot_notation}) LIMIT 100)
+    (id IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM {downstream.quoted_dot_notation} AS __snowshu_constraint
+        WHERE __snowshu_constraint.id = __snowshu_subject.id))
+LIMIT 100)
 """
 )
 
@@ -247,3 +242,22 @@ SELECT
 FROM 
 {relation.scoped_cte('SNOWSHU_DIRECTIONAL_SAMPLE')}
 """)
+
+
+def test_seeded_sample_include_outliers(stub_relation_set):
+    upstream=stub_relation_set.upstream_relation
+    downstream=stub_relation_set.downstream_relation
+    upstream.attributes=[Attribute('id',dt.INTEGER)]
+    upstream.include_outliers=True
+    upstream.max_number_of_outliers=100
+    upstream.population_size=100000
+    upstream.sampling=DefaultSampling()
+    upstream.sampling.sample_method=SystemSampleMethod(1.5,rows=1500,seed=42)
+
+    dag=nx.DiGraph()
+    dag.add_edge(upstream,downstream,direction="directional",remote_attribute='id',local_attribute='id')
+    RuntimeSourceCompiler().compile_queries_for_relation(upstream,dag,SnowflakeAdapter(),False)
+    query=query_equalize(upstream.compiled_query)
+    # the ordered and limited sample is closed in a subquery before the outliers are unioned on
+    assert query_equalize("ORDER BY HASH(__snowshu_record_hash, 42) LIMIT 1500) UNION (SELECT") in query
+    assert query.startswith('SELECT * FROM (SELECT * EXCLUDE __snowshu_record_hash')
@@ -36,6 +36,8 @@ def test_fills_empty_top_level_values(stub_configs):
     assert parsed.long_description == ''
     assert parsed.include_outliers==False
     assert parsed.max_number_of_outliers==DEFAULT_MAX_NUMBER_OF_OUTLIERS
+    assert parsed.exact_population_count==False
+    assert parsed.seed is None
 
 
 def test_errors_on_missing_section(stub_configs):
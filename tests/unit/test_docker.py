@@ -1,3 +1,4 @@
+import docker
 import mock
 import pytest
 
@@ -35,4 +36,62 @@ def test_remounts_data_in_replica():
     container.exec_run.return_value = (0, '',)
     shdocker = SnowShuDocker()
     shdocker._remount_replica_data(container, PostgresAdapter())
-    assert [arg for arg in container.exec_run.call_args_list][0][0][0] == "/bin/bash -c 'mkdir /snowshu_replica_data'"
+    assert [arg for arg in container.exec_run.call_args_list][0][0][0] == "/bin/bash -c 'mkdir -p /snowshu_replica_data'"
+
+
+def test_creates_container_with_options():
+    with mock.patch('snowshu.core.docker.docker') as docker_module:
+        shdocker = SnowShuDocker()
+        shdocker.get_stopped_container('postgres:12', 'postgres', ['POSTGRES_USER=snowshu'], 9999, name='target',
+                                       container_options=dict(shm_size='1g', environment=['PGDATA=/data']))
+    create_kwargs = docker_module.from_env.return_value.containers.create.call_args[1]
+    assert create_kwargs['environment'] == ['POSTGRES_USER=snowshu', 'PGDATA=/data']
+    assert create_kwargs['shm_size'] == '1g'
+
+
+def test_builds_base_image_once():
+    adapter = PostgresAdapter()
+    base_image = SnowShuDocker.base_image_name(adapter)
+    assert base_image.startswith('snowshu_base_postgres:')
+    # images change with their setup commands
+    adapter.PRELOADED_PACKAGES = ['postgresql-plpython3-12', 'postgresql-12-postgis-3']
+    assert SnowShuDocker.base_image_name(adapter) != base_image
+    adapter = PostgresAdapter()
+
+    with mock.patch('snowshu.core.docker.docker') as docker_module:
+        docker_module.errors = docker.errors
+        client = docker_module.from_env.return_value
+        client.images.get.side_effect = docker.errors.ImageNotFound('missing')
+        client.containers.get.side_effect = docker.errors.NotFound('missing')
+        build_container = client.containers.run.return_value
+        build_container.exec_run.return_value = (0, '',)
+        assert SnowShuDocker().get_or_build_base_image(adapter) == base_image
+        build_container.exec_run.assert_called_once()
+        build_container.commit.assert_called_once_with(repository=base_image.split(':')[0],
+                                                       tag=base_image.split(':')[1])
+
+        # once built, the image is reused without running setup
+        client.reset_mock()
+        client.images.get.side_effect = None
+        assert SnowShuDocker().get_or_build_base_image(adapter) == base_image
+        client.containers.run.assert_not_called()
+
+
+def test_refuses_to_resume_stopped_tmpfs_container():
+    with mock.patch('snowshu.core.docker.docker') as docker_module:
+        docker_module.errors = docker.errors
+        container = docker_module.from_env.return_value.containers.get.return_value
+        container.status = 'exited'
+        container.attrs = {'HostConfig': {'Tmpfs': {'/var/lib/postgresql/data': ''}}}
+        # the loaded relations were lost with the stopped container's memory
+        with pytest.raises(ValueError, match='cannot be resumed'):
+            SnowShuDocker().get_existing_container('target')
+        container.start.assert_not_called()
+
+        # running containers still have their data
+        container.status = 'running'
+        assert SnowShuDocker().get_existing_container('target') == container
+        container.attrs = {'HostConfig': {'Tmpfs': None}}
+        container.status = 'exited'
+        assert SnowShuDocker().get_existing_container('target') == container
+        container.start.assert_called_once()
@@ -8,9 +8,12 @@ import yaml
 
 from snowshu.core.configuration_parser import ConfigurationParser
 from snowshu.core.graph import SnowShuGraph
-from snowshu.core.models import Relation
+from snowshu.core.models import Attribute, Relation
+from snowshu.core.models import data_types as dt
 from snowshu.core.models import materializations as mz
-from snowshu.samplings.samplings import BruteForceSampling, DefaultSampling
+from snowshu.samplings.samplings import (BruteForceSampling, DefaultSampling,
+                                         KeyHashSampling)
+from tests.common import rand_string
 from tests.conftest import CONFIGURATION
 
 
@@ -68,6 +71,54 @@ def test_graph_allows_upstream_wildcards(stub_graph_set):
             ) in modified_graph.edges
 
 
+def test_key_hash_sampled_relationships_are_independent(stub_graph_set):
+    shgraph = SnowShuGraph()
+    _, vals = stub_graph_set
+
+    full_catalog = [vals.downstream_relation,
+                    vals.upstream_relation]
+    config_dict = copy.deepcopy(CONFIGURATION)
+    config_dict['source']['specified_relations'] = [dict(relation=vals.downstream_relation.name,
+                                                         database=vals.downstream_relation.database,
+                                                         schema=vals.downstream_relation.schema,
+                                                         relationships=dict(directional=[dict(relation=vals.upstream_relation.name,
+                                                                                              database=vals.upstream_relation.database,
+                                                                                              schema=vals.upstream_relation.schema,
+                                                                                              local_attribute=vals.directional_key,
+                                                                                              remote_attribute=vals.directional_key)]))]
+    config = ConfigurationParser().from_file_or_path(StringIO(yaml.dump(config_dict)))
+
+    for relation in full_catalog:
+        relation.sampling = KeyHashSampling(vals.directional_key, probability=0.05)
+    modified_graph = shgraph._apply_specifications(config, nx.DiGraph(), full_catalog)
+    assert not modified_graph.edges
+
+    # a different share of keys must still be constrained
+    vals.downstream_relation.sampling = KeyHashSampling(vals.directional_key, probability=0.5)
+    modified_graph = shgraph._apply_specifications(config, nx.DiGraph(), full_catalog)
+    assert (vals.upstream_relation, vals.downstream_relation,) in modified_graph.edges
+
+
+def test_prunes_attributes(stub_relation_set):
+    stub_relation = stub_relation_set.iso_relation
+    stub_relation.attributes = [Attribute(rand_string(10), dt.VARCHAR) for _ in range(3)]
+    string_attr, integer_attr, double_attr = [attr.name for attr in stub_relation.attributes]
+    config_dict = copy.deepcopy(CONFIGURATION)
+    config_dict['source']['specified_relations'] = [dict(relation=stub_relation.name,
+                                                         database=stub_relation.database,
+                                                         schema=stub_relation.schema,
+                                                         excluded_attributes=[string_attr],
+                                                         nulled_attributes=[f'{double_attr[:3]}.*'],
+                                                         indexes=[integer_attr, [integer_attr, double_attr]])]
+    config = ConfigurationParser().from_file_or_path(StringIO(yaml.dump(config_dict)))
+
+    relation = SnowShuGraph._set_overriding_params_for_node(stub_relation, config)
+
+    assert [attr.name for attr in relation.attributes] == [integer_attr, double_attr]
+    assert relation.projection == f'{integer_attr},NULL AS {double_attr}'
+    assert relation.indexes == ((integer_attr,), (integer_attr, double_attr,),)
+
+
 def test_unsampled(stub_graph_set):
     shgraph = SnowShuGraph()
 
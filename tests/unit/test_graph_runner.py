@@ -1,12 +1,14 @@
 import copy
-from time import time
+import threading
+from time import sleep, time
 
 import mock
 import pandas as pd
 import pytest
 
-from snowshu.core.graph_set_runner import GraphExecutable, GraphSetRunner
-from snowshu.samplings.samplings import DefaultSampling
+from snowshu.core.graph_set_runner import (FailureReport, GraphExecutable,
+                                           GraphSetRunner)
+from snowshu.samplings.samplings import DefaultSampling, RecencyWindowSampling
 
 
 def test_traverse_and_execute_analyze(stub_graph_set):
@@ -18,8 +20,9 @@ def test_traverse_and_execute_analyze(stub_graph_set):
     runner=GraphSetRunner()
     runner.barf=False
     graph_set,vals=stub_graph_set
-    source_adapter.scalar_query.return_value=1000
-    source_adapter.check_count_and_query.return_value=pd.DataFrame([dict(population_size=1000,sample_size=100)])
+    source_adapter.population_size.return_value=1000
+    source_adapter.analyze_relations.side_effect=lambda rels: pd.DataFrame(
+        [dict(relation=rel.dot_notation,population_size=1000,sample_size=100) for rel in rels])
     dag=copy.deepcopy(graph_set[-1]) # last graph in the set is the dag
     
     ## stub in the sampling pop defaults
@@ -38,6 +41,9 @@ def test_traverse_and_execute_analyze(stub_graph_set):
         assert rel.target_loaded is False
         assert rel.sample_size == 100
         assert rel.population_size == 1000
+    # the whole component is analyzed in a single query
+    source_adapter.analyze_relations.assert_called_once()
+    source_adapter.check_count_and_query.assert_not_called()
 
     # iso dag
     iso = copy.deepcopy(graph_set[0])  # first graph in the set is an iso
@@ -55,3 +61,313 @@ def test_traverse_and_execute_analyze(stub_graph_set):
     assert iso_relation.target_loaded is False
     assert iso_relation.sample_size == 100
     assert iso_relation.population_size == 1000
+
+
+def test_estimate_graph_set(stub_graph_set):
+    source_adapter = mock.MagicMock()
+    graph_set, vals = stub_graph_set
+    graph_set = copy.deepcopy(graph_set)
+    row_counts = dict(iso_relation=10, birelation_left=1e9, birelation_right=0,
+                      upstream_relation=5000, downstream_relation=None)
+    for graph in graph_set:
+        for rel in graph.nodes:
+            rel.unsampled = rel.name == 'upstream_relation'
+            rel.sampling = DefaultSampling()
+            rel.row_count = row_counts.get(rel.name)
+    # recency windows are estimated from the catalog instead of found in the source
+    relations = {rel.name: rel for graph in graph_set for rel in graph.nodes}
+    relations['birelation_left'].sampling = RecencyWindowSampling('created_at', days=7)
+    relations['birelation_left'].last_altered = '2020-01-08 00:00:00'
+
+    GraphSetRunner.estimate_graph_set(graph_set, source_adapter)
+    relations = {rel.name: rel for graph in graph_set for rel in graph.nodes}
+
+    assert relations['iso_relation'].population_size == 10
+    assert relations['iso_relation'].sample_size == 10
+    assert relations['birelation_left'].sample_size == 4147
+    assert str(relations['birelation_left'].sampling.sample_method.window_start) == '2020-01-01 00:00:00'
+    assert relations['birelation_right'].sample_size == 0
+    assert relations['upstream_relation'].sample_size == 5000
+    for name in ('downstream_relation', 'view_relation',):
+        assert relations[name].population_size == "N/A"
+        assert relations[name].sample_size == "N/A"
+    source_adapter.assert_not_called()
+    assert not source_adapter.method_calls
+
+
+def test_analyze_relations_batches(stub_graph_set):
+    source_adapter = mock.MagicMock()
+    source_adapter.analyze_relations.side_effect = lambda rels: pd.DataFrame(
+        [dict(relation=rel.dot_notation, population_size=10, sample_size=i) for i, rel in enumerate(rels)])
+    graph_set, _ = stub_graph_set
+    relations = [rel for graph in graph_set for rel in graph.nodes]
+
+    with mock.patch('snowshu.core.graph_set_runner.MAX_ANALYZE_BATCH_SIZE', 4):
+        GraphSetRunner._analyze_relations(source_adapter, relations)
+
+    assert source_adapter.analyze_relations.call_count == 2
+    assert [rel.sample_size for rel in relations] == [0, 1, 2, 3, 0, 1]
+    assert all(rel.population_size == 10 for rel in relations)
+
+
+def _failing_graph_set(stub_graph_set):
+    source_adapter, target_adapter = [mock.MagicMock() for _ in range(2)]
+    graph_set, vals = stub_graph_set
+    graph_set = copy.deepcopy(graph_set)
+    for graph in graph_set:
+        graph.contains_views = any(rel.is_view for rel in graph.nodes)
+        for rel in graph.nodes:
+            rel.unsampled = False
+            rel.include_outliers = False
+            rel.sampling = DefaultSampling()
+            rel.attributes = []
+    source_adapter.population_size.return_value = 1000
+    relations = {rel.name: rel for graph in graph_set for rel in graph.nodes}
+    source_adapter.view_ddl.return_value = f'SELECT * FROM {relations["upstream_relation"].name}'
+    compile_mock = mock.patch('snowshu.core.graph_set_runner.RuntimeSourceCompiler.compile_queries_for_relation',
+                              side_effect=lambda rel, *_: rel)
+
+    def extract(_, relation, count_first=True):
+        if relation.name == 'upstream_relation':
+            raise RuntimeError('extraction failed')
+        return pd.DataFrame()
+    return graph_set, relations, source_adapter, target_adapter, compile_mock, extract
+
+
+def test_execute_graph_set_halts_on_failure(stub_graph_set):
+    graph_set, relations, source_adapter, target_adapter, compile_mock, extract = _failing_graph_set(stub_graph_set)
+    runner = GraphSetRunner()
+    with compile_mock, mock.patch.object(runner, '_extract_sample', side_effect=extract):
+        report = runner.execute_graph_set(graph_set, source_adapter, target_adapter, threads=1)
+
+    assert isinstance(report, FailureReport)
+    assert report
+    assert list(report.failed) == [relations['upstream_relation'].dot_notation]
+    source_adapter.allow_queries.assert_called_once()
+    source_adapter.cancel_running_queries.assert_called_once()
+    # the rest of the failed graph and the view graph never start once the tables halt
+    assert sorted(report.cancelled) == sorted(relations[name].dot_notation
+                                              for name in ('birelation_right', 'downstream_relation', 'view_relation',))
+    assert not report.skipped
+    # every relation that did not load is in the report
+    for relation in relations.values():
+        assert relation.target_loaded or relation.dot_notation in list(report.failed) + report.cancelled
+    assert relations['view_relation'].target_loaded is False
+
+
+def test_execute_graph_set_keep_going_skips_descendants(stub_graph_set):
+    graph_set, relations, source_adapter, target_adapter, compile_mock, extract = _failing_graph_set(stub_graph_set)
+    runner = GraphSetRunner()
+    with compile_mock, mock.patch.object(runner, '_extract_sample', side_effect=extract):
+        report = runner.execute_graph_set(graph_set, source_adapter, target_adapter, threads=1, keep_going=True)
+
+    assert list(report.failed) == [relations['upstream_relation'].dot_notation]
+    # the view selects from the failed relation
+    assert sorted(report.skipped) == sorted([relations['downstream_relation'].dot_notation,
+                                             relations['view_relation'].dot_notation])
+    assert not report.cancelled
+    source_adapter.cancel_running_queries.assert_not_called()
+    for name in ('iso_relation', 'birelation_left', 'birelation_right',):
+        assert relations[name].target_loaded is True
+    for name in ('downstream_relation', 'view_relation',):
+        assert relations[name].target_loaded is False
+
+
+def test_failed_analyze_batch_fails_every_relation(stub_graph_set):
+    graph_set, relations, source_adapter, target_adapter, compile_mock, _ = _failing_graph_set(stub_graph_set)
+    graph = [graph for graph in graph_set if relations['upstream_relation'] in graph.nodes][0]
+    source_adapter.analyze_relations.side_effect = RuntimeError('analyze failed')
+    runner = GraphSetRunner()
+    with compile_mock:
+        report = runner.execute_graph_set([graph], source_adapter, target_adapter, threads=1, analyze=True)
+
+    assert sorted(report.failed) == sorted(relation.dot_notation for relation in graph.nodes)
+    assert not report.cancelled
+
+
+def test_views_wait_for_referenced_relations(stub_graph_set):
+    graph_set, relations, source_adapter, target_adapter, compile_mock, _ = _failing_graph_set(stub_graph_set)
+    source_adapter.view_ddl.return_value = f'SELECT * FROM {relations["iso_relation"].name} JOIN ' \
+        f'"{relations["birelation_left"].name.upper()}" USING (id)'
+    loaded = list()
+    target_adapter.create_and_load_relation.side_effect = lambda rel: loaded.append(rel.name)
+    runner = GraphSetRunner()
+    with compile_mock, mock.patch.object(runner, '_extract_sample', return_value=pd.DataFrame()):
+        report = runner.execute_graph_set(graph_set, source_adapter, target_adapter, threads=1)
+
+    assert not report
+    # views are queued first, but created only after the relations they select from
+    assert loaded.index('view_relation') > max(loaded.index('iso_relation'), loaded.index('birelation_left'))
+    assert len(loaded) == len(relations)
+
+
+def test_view_dependencies(stub_graph_set):
+    _, vals = stub_graph_set
+    vals.view_relation.view_ddl = f'SELECT * FROM db.schema."{vals.iso_relation.name.upper()}" ' \
+        f'WHERE {vals.upstream_relation.name}_id IS NOT NULL'
+    relations = [vals.iso_relation, vals.view_relation, vals.upstream_relation, vals.downstream_relation]
+
+    assert GraphSetRunner._view_dependencies(vals.view_relation, relations) == {vals.iso_relation}
+
+
+def test_take_whole(stub_graph_set):
+    graph_set, vals = stub_graph_set
+    dag = graph_set[-1]
+    for rel in dag.nodes:
+        rel.sampling = DefaultSampling(min_sample_size=100)
+
+    vals.upstream_relation.row_count = None
+    assert not GraphSetRunner._take_whole(dag, vals.upstream_relation)
+    vals.upstream_relation.row_count = 50
+    assert GraphSetRunner._take_whole(dag, vals.upstream_relation)
+    vals.upstream_relation.row_count = 5000
+    assert not GraphSetRunner._take_whole(dag, vals.upstream_relation)
+
+    # constrained relations are only taken whole when empty
+    vals.downstream_relation.row_count = 50
+    assert not GraphSetRunner._take_whole(dag, vals.downstream_relation)
+    vals.downstream_relation.row_count = 0
+    assert GraphSetRunner._take_whole(dag, vals.downstream_relation)
+    vals.downstream_relation.exact_population_count = True
+    assert not GraphSetRunner._take_whole(dag, vals.downstream_relation)
+
+    # bidirectional relationships constrain both relations
+    vals.birelation_left.row_count = 50
+    assert not GraphSetRunner._take_whole(dag, vals.birelation_left)
+
+
+def test_empty_and_tiny_relations_skip_counting(stub_graph_set):
+    source_adapter, target_adapter = [mock.MagicMock() for _ in range(2)]
+    graph_set, vals = stub_graph_set
+    dag = copy.deepcopy(graph_set[-1])
+    dag.remove_nodes_from([rel for rel in list(dag.nodes) if rel.name.startswith('birelation')])
+    upstream, downstream = sorted(dag.nodes, key=lambda rel: rel.name != 'upstream_relation')
+    for rel in dag.nodes:
+        rel.unsampled = False
+        rel.include_outliers = False
+        rel.sampling = DefaultSampling(min_sample_size=100)
+    upstream.row_count, downstream.row_count = 0, 10
+    source_adapter.population_size.return_value = 10
+    loaded = dict()
+    target_adapter.create_and_load_relation.side_effect = lambda rel: loaded.update({rel.name: rel.data.copy()})
+    runner = GraphSetRunner()
+    runner.barf = False
+    with mock.patch('snowshu.core.graph_set_runner.RuntimeSourceCompiler.compile_queries_for_relation',
+                    side_effect=lambda rel, *_: rel), \
+            mock.patch.object(runner, '_extract_sample', return_value=pd.DataFrame([{vals.directional_key: 1}])) as extract:
+        runner._traverse_and_execute(GraphExecutable(dag, source_adapter, target_adapter, False))
+
+    # the empty relation is created from its attributes without a source query
+    assert list(loaded['upstream_relation'].columns) == [vals.directional_key]
+    assert loaded['upstream_relation'].empty
+    assert upstream.sample_size == upstream.population_size == 0
+    # the downstream relation is constrained by the empty relation, so it is sampled as usual
+    extract.assert_called_once_with(source_adapter, downstream, count_first=True)
+    source_adapter.population_size.assert_called_once_with(downstream)
+
+    # a tiny relation nothing constrains is fetched whole in one query
+    iso = copy.deepcopy(graph_set[0])
+    iso_relation = list(iso.nodes)[0]
+    iso_relation.unsampled = False
+    iso_relation.include_outliers = False
+    iso_relation.sampling = DefaultSampling(min_sample_size=100)
+    iso_relation.row_count = 10
+    source_adapter.reset_mock()
+    with mock.patch('snowshu.core.graph_set_runner.RuntimeSourceCompiler.compile_queries_for_relation',
+                    side_effect=lambda rel, *_: rel), \
+            mock.patch.object(runner, '_extract_sample', return_value=pd.DataFrame()) as extract:
+        runner._traverse_and_execute(GraphExecutable(iso, source_adapter, target_adapter, False))
+    extract.assert_called_once_with(source_adapter, iso_relation, count_first=False)
+    source_adapter.population_size.assert_not_called()
+    assert iso_relation.unsampled is True
+    assert iso_relation.population_size == 10
+
+
+def test_extraction_slices(stub_graph_set):
+    _, vals = stub_graph_set
+    source_adapter = mock.MagicMock()
+    source_adapter.SUPPORTS_SLICED_EXTRACTION = True
+    runner = GraphSetRunner()
+    runner.threads = 4
+    relation = vals.iso_relation
+    relation.unsampled = True
+
+    relation.population_size = 10
+    assert runner._extraction_slices(source_adapter, relation) == 1
+    relation.population_size = int(2.5e6)
+    assert runner._extraction_slices(source_adapter, relation) == 3
+    relation.population_size = int(1e9)
+    assert runner._extraction_slices(source_adapter, relation) == 4
+
+    # samples are not repeatable across sessions
+    relation.unsampled = False
+    assert runner._extraction_slices(source_adapter, relation) == 1
+    relation.unsampled = True
+    source_adapter.SUPPORTS_SLICED_EXTRACTION = False
+    assert runner._extraction_slices(source_adapter, relation) == 1
+
+
+def test_sliced_extraction_loads_each_slice(stub_graph_set):
+    source_adapter, target_adapter = [mock.MagicMock() for _ in range(2)]
+    source_adapter.SUPPORTS_SLICED_EXTRACTION = True
+    source_adapter.population_size.return_value = int(3e6)
+    source_adapter.slice_statement.side_effect = lambda query, slices, index: f'slice {index} of {slices}'
+    source_adapter.unchecked_query.side_effect = lambda query: pd.DataFrame(
+        [{vals.directional_key.upper(): int(query.split()[1])}])
+    graph_set, vals = stub_graph_set
+    iso = copy.deepcopy(graph_set[0])
+    relation = list(iso.nodes)[0]
+    relation.attributes = copy.deepcopy(vals.upstream_relation.attributes)
+    relation.unsampled = True
+    relation.include_outliers = False
+    relation.sampling = DefaultSampling()
+    runner = GraphSetRunner()
+    runner.barf = False
+    runner.threads = 8
+    with mock.patch('snowshu.core.graph_set_runner.RuntimeSourceCompiler.compile_queries_for_relation',
+                    side_effect=lambda rel, *_: rel):
+        runner._traverse_and_execute(GraphExecutable(iso, source_adapter, target_adapter, False))
+
+    assert relation.target_loaded is True
+    assert relation.sample_size == 3
+    assert sorted(relation.data[vals.directional_key]) == [0, 1, 2]
+    # the relation is created empty, then every slice is appended to it
+    loads = target_adapter.load_data_into_relation.call_args_list
+    assert len(loads) == 4
+    assert loads[0][0][1].empty
+    assert all(load[1] == dict(if_exists='append') for load in loads[1:])
+    source_adapter.check_count_and_query.assert_not_called()
+    target_adapter.create_and_load_relation.assert_not_called()
+
+
+def test_sliced_extraction_shares_thread_budget(stub_graph_set):
+    source_adapter, target_adapter = [mock.MagicMock() for _ in range(2)]
+    source_adapter.slice_statement.side_effect = lambda query, slices, index: f'slice {index} of {slices}'
+    running, most_running, lock = [0], [0], threading.Lock()
+
+    def extract(*_, **__):
+        with lock:
+            running[0] += 1
+            most_running[0] = max(most_running[0], running[0])
+        sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return pd.DataFrame()
+
+    _, vals = stub_graph_set
+    relation = vals.iso_relation
+    runner = GraphSetRunner()
+    runner.threads = 3
+    runner._sessions = threading.BoundedSemaphore(3)
+    # the graph extracting the relation and one other graph each hold a slot
+    for _ in range(2):
+        runner._sessions.acquire()
+    with mock.patch.object(runner, '_extract_sample', side_effect=extract), \
+            mock.patch.object(relation, 'conform_data', side_effect=lambda data: data):
+        runner._extract_and_load_slices(GraphExecutable(None, source_adapter, target_adapter, False), relation, 3)
+
+    assert source_adapter.slice_statement.call_count == 3
+    assert most_running[0] == 2
+    # the spare slot is handed back
+    assert runner._sessions.acquire(blocking=False)
+    assert not runner._sessions.acquire(blocking=False)
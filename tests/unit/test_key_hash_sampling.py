@@ -0,0 +1,30 @@
+import mock
+import pytest
+
+from snowshu.samplings.sample_methods import KeyHashSampleMethod
+from snowshu.samplings.samplings import BruteForceSampling, KeyHashSampling
+
+
+def test_key_hash_sampling():
+    mock_rel=mock.MagicMock()
+    mock_rel.seed=42
+    mock_rel.population_size=1e6
+    sampling=KeyHashSampling('user_id', probability=0.05, buckets=1000)
+    sampling.prepare(mock_rel, mock.MagicMock())
+
+    assert isinstance(sampling.sample_method, KeyHashSampleMethod)
+    assert sampling.sample_method.key == 'user_id'
+    assert sampling.sample_method.selected_buckets == 50
+    assert sampling.sample_method.seed == 42
+    assert sampling.size == 50000
+
+def test_key_hash_sampling_shares_key_domain():
+    sampling=KeyHashSampling('id', probability=0.05)
+
+    assert sampling.shares_key_domain(KeyHashSampling('user_id', probability=0.05))
+    assert not sampling.shares_key_domain(KeyHashSampling('user_id', probability=0.05, buckets=100))
+    assert not sampling.shares_key_domain(BruteForceSampling(0.05))
+
+def test_key_hash_sampling_bad_probability():
+    with pytest.raises(ValueError):
+        KeyHashSampling('id', probability=5)
@@ -1,7 +1,12 @@
+import itertools
+import mock
+import pytest
 from snowshu.core.models import data_types
 from pandas.core.frame import DataFrame
+from sqlalchemy.dialects.postgresql.base import PGDialect
+from sqlalchemy.types import BIGINT, INTEGER, VARCHAR
 from snowshu.core.models.attribute import Attribute
-from snowshu.core.models.materializations import TABLE
+from snowshu.core.models.materializations import TABLE, VIEW
 from snowshu.adapters.target_adapters.postgres_adapter import PostgresAdapter
 from snowshu.core.models.relation import Relation
 
@@ -35,3 +40,152 @@ def test_x00_replacement():
     assert all(fixed_relation.data.loc[fixed_relation.data[id_col] == 1, [content_col]] == normal_val)
     assert all(fixed_relation.data.loc[fixed_relation.data[id_col] == 2, [content_col]] == f"weird{custom_replacement}value")
 
+
+
+def test_build_settings_applied_and_restored():
+    adapter = PostgresAdapter(pg_build_settings=dict(shared_buffers=None, work_mem='64MB'))
+    adapter.container = mock.MagicMock()
+    adapter.container.exec_run.return_value = (0, '',)
+    conn = mock.MagicMock()
+    with mock.patch.object(adapter, 'get_connection', return_value=conn), \
+            mock.patch.object(adapter, 'wait_until_ready'):
+        adapter._apply_build_settings()
+        statements = [call[0][0] for call in conn.execute.call_args_list]
+        assert "ALTER SYSTEM SET fsync = 'off'" in statements
+        assert "ALTER SYSTEM SET work_mem = '64MB'" in statements
+        assert not any('shared_buffers' in statement for statement in statements)
+        # wal_level only changes on restart
+        adapter.container.restart.assert_called_once()
+        conn.dispose.assert_called_once()
+
+        conn.reset_mock()
+        adapter._restore_durable_settings()
+        statements = [call[0][0] for call in conn.execute.call_args_list]
+        assert 'ALTER SYSTEM RESET fsync' in statements
+        assert statements[-2:] == ['SELECT pg_reload_conf()', 'CHECKPOINT']
+        adapter.container.exec_run.assert_called_once_with('sync')
+        conn.dispose.assert_called_once()
+
+
+def test_refreshed_relation_keeps_dependent_views():
+    adapter = PostgresAdapter()
+    cols = [Attribute("id", data_types.BIGINT), Attribute("content", data_types.VARCHAR)]
+    relation = Relation("db", "schema", "relation", TABLE, cols)
+    relation.data = DataFrame({"id": [1, 2], "content": ["a", "b"]})
+    # the relation is already in the replica, with views over it that block dropping it
+    conn = mock.MagicMock()
+    conn.dialect = PGDialect()
+    conn.has_table.return_value = True
+    inspector = mock.MagicMock()
+    inspector.get_columns.return_value = [dict(name="id", type=BIGINT()), dict(name="content", type=VARCHAR())]
+    views = [mock.MagicMock(view_schema="schema", view_name="a_view", definition=" SELECT id FROM relation;"),
+             mock.MagicMock(view_schema="schema", view_name="view_of_view", definition=" SELECT id FROM a_view;")]
+    conn.execute.return_value.fetchall.return_value = views
+    with mock.patch.object(adapter, 'get_connection', return_value=conn), \
+            mock.patch('snowshu.adapters.target_adapters.base_target_adapter.inspect', return_value=inspector), \
+            mock.patch.object(DataFrame, 'to_sql') as to_sql:
+        adapter.load_data_into_relation(relation)
+        conn.execute.assert_called_once_with('TRUNCATE TABLE db.schema.relation')
+        assert to_sql.call_args[1]['if_exists'] == 'append'
+
+        # a column with another type is recreated, dropping the views with it and creating them again
+        conn.execute.reset_mock()
+        inspector.get_columns.return_value = [dict(name="id", type=INTEGER()), dict(name="content", type=VARCHAR())]
+        adapter.load_data_into_relation(relation)
+        statements = [str(call[0][0]).strip() for call in conn.execute.call_args_list]
+        assert statements[1:] == ['DROP TABLE db.schema.relation CASCADE',
+                                  'CREATE VIEW "schema"."a_view" AS\n SELECT id FROM relation;',
+                                  'CREATE VIEW "schema"."view_of_view" AS\n SELECT id FROM a_view;']
+        assert conn.execute.call_args_list[0][1] == dict(schema="schema", name="relation")
+        assert to_sql.call_args[1]['if_exists'] == 'replace'
+
+        # so is a relation with other columns
+        conn.execute.reset_mock()
+        inspector.get_columns.return_value = [dict(name="id", type=BIGINT())]
+        adapter.load_data_into_relation(relation)
+        assert 'DROP TABLE db.schema.relation CASCADE' in [call[0][0] for call in conn.execute.call_args_list]
+
+
+def test_create_indexes():
+    adapter = PostgresAdapter()
+    relations = [Relation("db", "schema", f"relation_{i}", TABLE, []) for i in range(2)]
+    conn = mock.MagicMock()
+    with mock.patch.object(adapter, 'get_connection', return_value=conn):
+        adapter.create_indexes({relations[0]: [('id',), ('a', 'b',)], relations[1]: []}, threads=2)
+
+    statements = [call[0][0] for call in conn.execute.call_args_list]
+    assert len(statements) == 2
+    assert statements[1].startswith('CREATE INDEX IF NOT EXISTS snowshu_index_')
+    assert statements[1].endswith('ON db.schema.relation_0 ("a","b")')
+    # index names are unique per relation and attributes
+    assert statements[0].split()[5] != statements[1].split()[5]
+    assert conn.dispose.call_count == 1
+
+
+def test_create_index_statement_quotes_mixed_case_attributes():
+    relation = Relation("db", "schema", "relation", TABLE, [])
+    statement = PostgresAdapter.create_index_statement(relation, ('CustomerId', 'region',))
+    assert statement.endswith('ON db.schema.relation ("CustomerId","region")')
+
+
+def test_vacuum_relations_and_checkpoint():
+    adapter = PostgresAdapter(pg_build_settings={setting: None for setting in PostgresAdapter.BUILD_SETTINGS})
+    adapter.container = mock.MagicMock()
+    adapter.container.exec_run.return_value = (0, '',)
+    tables = [Relation("db", "schema", f"relation_{i}", TABLE, []) for i in range(3)]
+    view = Relation("db", "schema", "view", VIEW, [])
+    conn = mock.MagicMock()
+    with mock.patch.object(adapter, 'get_connection', return_value=conn):
+        adapter.vacuum_relations(tables + [view], threads=2)
+        statements = sorted(call[0][0] for call in conn.execute.call_args_list)
+        assert statements == [f'VACUUM (FREEZE, ANALYZE) db.schema.relation_{i}' for i in range(3)]
+        assert conn.dispose.call_count == 3
+
+        # replicas start from a checkpoint even without build settings to reset
+        conn.reset_mock()
+        adapter._restore_durable_settings()
+        assert [call[0][0] for call in conn.execute.call_args_list] == ['CHECKPOINT']
+
+
+def test_container_options():
+    assert PostgresAdapter()._container_options() == dict()
+    with pytest.raises(ValueError):
+        PostgresAdapter(pg_data='ramdisk')
+
+    adapter = PostgresAdapter(pg_data='tmpfs', docker_shm_size='1g', docker_cpus=1.5, docker_memory='8g')
+    assert adapter._container_options() == dict(shm_size='1g', nano_cpus=1500000000, mem_limit='8g',
+                                                tmpfs={'/var/lib/postgresql/data': ''})
+    # tmpfs does not survive the restart needed to apply these
+    assert 'wal_level' not in adapter.build_settings
+    assert adapter.build_settings['fsync'] == 'off'
+
+    adapter = PostgresAdapter(pg_data='remount')
+    assert adapter._container_options() == dict(environment=['PGDATA=/snowshu_replica_data'])
+    # replicas already keep their data in the remount directory
+    assert adapter._container_options('existing-replica') == dict()
+
+
+def test_wait_until_ready():
+    adapter = PostgresAdapter(docker_ready_timeout=0)
+    adapter.container = mock.MagicMock()
+    adapter.container.logs.return_value = b'FATAL: data directory has invalid permissions'
+
+    # the ready command is retried with exponential backoff
+    with mock.patch.object(adapter, 'target_database_is_ready', side_effect=[False, False, True]) as ready, \
+            mock.patch('snowshu.adapters.target_adapters.base_target_adapter.sleep') as sleep:
+        adapter.ready_timeout = 10
+        adapter.wait_until_ready()
+    assert ready.call_count == 3
+    assert [call[0][0] for call in sleep.call_args_list] == [.1, .2]
+
+    with mock.patch.object(adapter, 'target_database_is_ready', return_value=False), \
+            mock.patch('snowshu.adapters.target_adapters.base_target_adapter.sleep'):
+        adapter.container.status = 'exited'
+        with pytest.raises(SystemError, match='invalid permissions'):
+            adapter.wait_until_ready()
+
+        adapter.container.status = 'running'
+        adapter.ready_timeout = 0
+        with mock.patch('snowshu.adapters.target_adapters.base_target_adapter.time.time', side_effect=itertools.count()):
+            with pytest.raises(TimeoutError):
+                adapter.wait_until_ready()
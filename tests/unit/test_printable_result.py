@@ -17,3 +17,11 @@ def test_graph_to_list(stub_graph_set):
         assert isinstance(row, pr.ReportRow)
         assert row.percent == 10
         assert row.percent_is_acceptable
+
+
+def test_printable_timings():
+    printable = pr.printable_timings({'target startup': 3.5, 'sampling and loading': 10})
+    assert 'BUILD TIMINGS' in printable
+    lines = printable.strip().splitlines()
+    assert lines[-3].split() == ['target', 'startup', '3.50']
+    assert lines[-1].split() == ['total', '13.50']
@@ -0,0 +1,37 @@
+import mock
+import pytest
+
+from snowshu.samplings.sample_methods import (BernoulliSampleMethod,
+                                              RecencyWindowSampleMethod)
+from snowshu.samplings.samplings import RecencyWindowSampling
+
+
+@pytest.fixture()
+def mock_args():
+    mock_rel=mock.MagicMock()
+    mock_rel.seed=None
+    mock_source_adapter=mock.MagicMock()
+    yield mock_rel,mock_source_adapter
+
+
+def test_recency_window_sampling(mock_args):
+    mock_args[1].recency_window.return_value=('2020-01-01', 1e6)
+    sampling=RecencyWindowSampling('viewed_at', days=7)
+    sampling.prepare(*mock_args)
+
+    mock_args[1].recency_window.assert_called_once_with(mock_args[0], 'viewed_at', days=7, partitions=None)
+    assert isinstance(sampling.sample_method, RecencyWindowSampleMethod)
+    assert sampling.sample_method.window_start == '2020-01-01'
+    assert sampling.sample_method.rows == 4147
+
+def test_recency_window_sampling_empty_relation(mock_args):
+    mock_args[1].recency_window.return_value=(None, 0)
+    sampling=RecencyWindowSampling('viewed_at', partitions=3)
+    sampling.prepare(*mock_args)
+
+    assert isinstance(sampling.sample_method, BernoulliSampleMethod)
+
+def test_recency_window_sampling_needs_one_window():
+    for window in (dict(), dict(days=7, partitions=3),):
+        with pytest.raises(ValueError):
+            RecencyWindowSampling('viewed_at', **window)
@@ -1,9 +1,10 @@
 import mock
+import pytest
 import json
 from pathlib import Path
 from tests.common import rand_string
+from snowshu.core.graph_set_runner import FailureReport
 from snowshu.core.replica.replica_factory import ReplicaFactory
-from tests.common import rand_string
 
 
 @mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph.build_graph')
@@ -30,4 +31,93 @@ def test_loading_specified_replica_file(tmpdir, stub_creds, stub_configs):
     replica = ReplicaFactory()
     assert not replica.config  # no config in new obj
     replica.load_config(replica_file)
-    assert replica.config  # config should now be loaded
\ No newline at end of file
+    assert replica.config  # config should now be loaded
+
+@mock.patch('snowshu.core.replica.replica_factory.GraphSetRunner')
+@mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph')
+def test_analyze_does_not_start_target(graph, runner, stub_configs):
+    replica = ReplicaFactory()
+    replica.load_config(stub_configs())
+    replica.config.target_profile.adapter = mock.MagicMock()
+    graph.return_value.get_graphs.return_value = [mock.MagicMock()]
+    runner.return_value.execute_graph_set.return_value = FailureReport()
+    with mock.patch('snowshu.core.replica.replica_factory.graph_to_result_list', return_value=[]):
+        replica.analyze(False)
+        replica.analyze(False, estimate=True)
+
+    replica.config.target_profile.adapter.initialize_replica.assert_not_called()
+    runner.return_value.execute_graph_set.assert_called_once()
+    runner.return_value.estimate_graph_set.assert_called_once()
+
+
+def test_changed_graphs(stub_graph_set):
+    _, vals = stub_graph_set
+    unchanged, changed = mock.MagicMock(), mock.MagicMock()
+    unchanged.nodes = [vals.birelation_left, vals.birelation_right]
+    changed.nodes = [vals.upstream_relation, vals.downstream_relation]
+    for relation in unchanged.nodes + changed.nodes:
+        relation.last_altered = '2020-01-01 00:00:00'
+    replica_meta = ReplicaFactory._relations_meta(unchanged.nodes + changed.nodes)
+
+    assert ReplicaFactory._changed_graphs([unchanged, changed], replica_meta) == []
+
+    vals.downstream_relation.last_altered = '2020-01-02 00:00:00'
+    assert ReplicaFactory._changed_graphs([unchanged, changed], replica_meta) == [changed]
+
+    vals.downstream_relation.last_altered = '2020-01-01 00:00:00'
+    vals.upstream_relation.attributes = vals.upstream_relation.attributes[1:]
+    assert ReplicaFactory._changed_graphs([unchanged, changed], replica_meta) == [changed]
+
+    assert ReplicaFactory._changed_graphs([unchanged, changed], dict()) == [unchanged, changed]
+
+
+@mock.patch('snowshu.core.replica.replica_factory.GraphSetRunner')
+@mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph')
+def test_refresh_without_changes_discards_target(graph, runner, stub_configs):
+    replica = ReplicaFactory()
+    replica.load_config(stub_configs())
+    replica.config.target_profile.adapter = mock.MagicMock()
+    graph.return_value.get_graphs.return_value = [mock.MagicMock()]
+    with mock.patch.object(ReplicaFactory, '_changed_graphs', return_value=[]):
+        result = replica.refresh(False)
+
+    assert 'up to date' in result
+    replica.config.target_profile.adapter.initialize_replica.assert_called_once_with(
+        replica.config.source_profile.name, False, replica_name=replica.config.name)
+    replica.config.target_profile.adapter.discard_replica.assert_called_once()
+    runner.return_value.execute_graph_set.assert_not_called()
+
+
+@mock.patch('snowshu.core.replica.replica_factory.BuildCheckpoint')
+@mock.patch('snowshu.core.replica.replica_factory.GraphSetRunner')
+@mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph')
+def test_create_with_failures_keeps_target(graph, runner, checkpoint, stub_configs):
+    replica = ReplicaFactory()
+    replica.load_config(stub_configs())
+    replica.config.target_profile.adapter = mock.MagicMock()
+    graph.return_value.get_graphs.return_value = [mock.MagicMock()]
+    runner.return_value.execute_graph_set.return_value = FailureReport(failed={'db.schema.failed': 'boom'},
+                                                                       skipped=['db.schema.downstream'])
+    with pytest.raises(SystemError) as exc:
+        replica.create(None, False, keep_going=True)
+
+    assert 'db.schema.failed' in str(exc.value)
+    assert 'db.schema.downstream' in str(exc.value)
+    assert runner.return_value.execute_graph_set.call_args[1]['keep_going'] is True
+    replica.config.target_profile.adapter.finalize_replica.assert_not_called()
+    checkpoint.return_value.clear.assert_called_once()  # only the fresh start clears the checkpoint
+
+
+def test_indexes(stub_graph_set):
+    graph_set, vals = stub_graph_set
+    vals.downstream_relation.indexes = ((vals.directional_key,), ('not_in_replica',),)
+
+    # declared indexes are always built, keys only when indexing relationships
+    assert ReplicaFactory._indexes(graph_set, False) == {
+        vals.downstream_relation: [(vals.directional_key,)]}
+    indexes = ReplicaFactory._indexes(graph_set, True)
+    assert indexes[vals.upstream_relation] == [(vals.directional_key,)]
+    assert indexes[vals.downstream_relation] == [(vals.directional_key,)]
+    assert indexes[vals.birelation_left] == [(vals.bidirectional_key_left,)]
+    assert indexes[vals.birelation_right] == [(vals.bidirectional_key_right,)]
+    assert vals.view_relation not in indexes
@@ -0,0 +1,62 @@
+import os
+import time
+
+import mock
+import pandas as pd
+
+from snowshu.core.graph_set_runner import GraphSetRunner
+from snowshu.core.sample_cache import SampleCache
+from tests.common import rand_string
+
+
+def test_cache_round_trip(tmpdir):
+    cache = SampleCache(tmpdir)
+    key = cache.key('SELECT * FROM users', 'snowflake://account')
+    assert cache.get(key) is None
+
+    frame = pd.DataFrame([dict(id=1, payload={'a': 1}), dict(id=2, payload=None)])
+    cache.put(key, frame)
+    assert cache.get(key).equals(frame)
+
+
+def test_cache_keys_are_content_addressed():
+    query, source = rand_string(20), rand_string(10)
+    assert SampleCache.key(query, source) == SampleCache.key(query, source)
+    assert SampleCache.key(query, source) != SampleCache.key(query + ' ', source)
+    assert SampleCache.key(query, source) != SampleCache.key(query, rand_string(10))
+    assert SampleCache.key(query, source, 1) != SampleCache.key(query, source, 2)
+
+
+def test_cache_evicts_least_recently_used(tmpdir):
+    frame = pd.DataFrame([dict(id=i, value=rand_string(100)) for i in range(100)])
+    cache = SampleCache(tmpdir)
+    keys = [cache.key(rand_string(10), 'source') for _ in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, frame)
+        os.utime(cache._path(key), (time.time() - 100 + i, time.time() - 100 + i))
+    single_size = cache._path(keys[0]).stat().st_size
+
+    # reading the oldest sample makes it the most recently used
+    cache.get(keys[0])
+    cache.max_bytes = single_size * 2
+    cache.evict()
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is not None
+
+
+def test_runner_extracts_from_cache(tmpdir, stub_relation_set):
+    stub_relation = stub_relation_set.iso_relation
+    source_adapter = mock.MagicMock()
+    source_adapter.name = 'snowflake'
+    source_adapter.credentials.account = 'account'
+    source_adapter.check_count_and_query.return_value = pd.DataFrame([dict(id=1)])
+    stub_relation.compiled_query = 'SELECT * FROM users'
+    stub_relation.unsampled = False
+
+    runner = GraphSetRunner()
+    runner.sample_cache = SampleCache(tmpdir)
+    for _ in range(2):
+        assert runner._extract_sample(source_adapter, stub_relation).equals(pd.DataFrame([dict(id=1)]))
+    source_adapter.check_count_and_query.assert_called_once()
@@ -1,12 +1,20 @@
 import mock
+import pandas as pd
 import pytest
 from psycopg2 import OperationalError
 
+from snowshu.adapters.source_adapters import BaseSourceAdapter
 from snowshu.adapters.source_adapters.snowflake_adapter import SnowflakeAdapter
+from snowshu.core.models import Attribute
+from snowshu.core.models import data_types as dt
 from snowshu.core.models.credentials import Credentials
-from snowshu.core.models.materializations import TABLE
+from snowshu.core.models.materializations import TABLE, VIEW
 from snowshu.core.models.relation import Relation
-from snowshu.samplings.sample_methods import BernoulliSampleMethod
+from snowshu.exceptions import QueryCancelled
+from snowshu.samplings.sample_methods import (BernoulliSampleMethod,
+                                              KeyHashSampleMethod,
+                                              RecencyWindowSampleMethod,
+                                              SystemSampleMethod)
 from tests.common import query_equalize, rand_string
 
 
@@ -149,3 +157,263 @@ def test_retry_count_query():
         # assert that the 4th error was raised
         assert exc.errisinstance(SystemError)
         assert sf.check_count_and_query.retry.statistics["attempt_number"] == 4
+
+
+def test_get_relations_from_database_captures_catalog_sizes():
+    sf = SnowflakeAdapter()
+    DATABASE, SCHEMA = [rand_string(10).upper() for _ in range(2)]
+    catalog = pd.DataFrame([
+        dict(schema=SCHEMA, relation='FACTS', materialization='BASE TABLE',
+             row_count=1234, size_in_bytes=56789, last_altered=pd.Timestamp('2020-01-01 00:00:00'),
+             attribute='ID', ordinal=1, data_type='NUMBER'),
+        dict(schema=SCHEMA, relation='FACTS_VIEW', materialization='VIEW',
+             row_count=None, size_in_bytes=None, last_altered=None,
+             attribute='ID', ordinal=1, data_type='NUMBER'),
+    ])
+    schema_obj = BaseSourceAdapter._DatabaseObject(SCHEMA,
+                                                   Relation(DATABASE.lower(), SCHEMA.lower(), '', None, None))
+    with mock.patch.object(sf, '_safe_query', return_value=catalog):
+        relations = {rel.name: rel for rel in sf._get_relations_from_database(schema_obj)}
+
+    assert relations['facts'].row_count == 1234
+    assert relations['facts'].size_in_bytes == 56789
+    assert relations['facts_view'].row_count is None
+    assert relations['facts_view'].size_in_bytes is None
+    assert relations['facts'].last_altered == '2020-01-01 00:00:00'
+    assert relations['facts_view'].last_altered is None
+
+
+def test_population_size_prefers_catalog_row_count():
+    sf = SnowflakeAdapter()
+    relation = Relation(database=rand_string(10), schema=rand_string(10),
+                        name=rand_string(10), materialization=TABLE, attributes=[])
+    relation.row_count = 500
+    with mock.patch.object(sf, 'scalar_query', return_value=42) as scalar_query:
+        assert sf.population_size(relation) == 500
+        scalar_query.assert_not_called()
+
+        relation.exact_population_count = True
+        assert sf.population_size(relation) == 42
+
+        relation.exact_population_count = False
+        relation.row_count = None
+        assert sf.population_size(relation) == 42
+        scalar_query.assert_called_with(f"SELECT COUNT(*) FROM {relation.quoted_dot_notation}")
+
+
+def test_analyze_union_statement():
+    sf = SnowflakeAdapter()
+    relations = [Relation(database=rand_string(10), schema=rand_string(10),
+                          name=rand_string(10), materialization=TABLE, attributes=[]) for _ in range(2)]
+    for relation in relations:
+        relation.compiled_query = f"SELECT * FROM {relation.name}"
+
+    statement = sf.analyze_union_statement(relations)
+    assert query_equalize(statement) == query_equalize(f"""
+SELECT
+    '{relations[0].dot_notation}' AS relation
+    ,population_size
+    ,sample_size
+FROM (
+{relations[0].compiled_query}
+)
+UNION ALL
+SELECT
+    '{relations[1].dot_notation}' AS relation
+    ,population_size
+    ,sample_size
+FROM (
+{relations[1].compiled_query}
+)
+""")
+
+
+def test_cancel_running_queries():
+    sf = SnowflakeAdapter()
+    sf._running_sessions.update({1234, None})
+    engine = mock.MagicMock()
+    with mock.patch.object(sf, 'get_connection', return_value=engine):
+        sf.cancel_running_queries()
+
+    engine.execute.assert_called_once_with("SELECT SYSTEM$CANCEL_ALL_QUERIES(1234)")
+    with pytest.raises(QueryCancelled):
+        sf._safe_query("SELECT 1")
+    # a new execution runs queries again
+    sf.allow_queries()
+    assert not sf._cancelled
+
+
+def test_view_ddl_is_retrieved_once_per_schema():
+    sf = SnowflakeAdapter()
+    DATABASE, SCHEMA = [rand_string(10) for _ in range(2)]
+    views = {name: Relation(DATABASE, SCHEMA, name, VIEW, []) for name in ('first_view', 'second_view', 'secure_view',)}
+    definitions = pd.DataFrame([
+        dict(relation='FIRST_VIEW', definition='create or replace view FIRST_VIEW as select * from facts'),
+        dict(relation='SECOND_VIEW', definition='CREATE VIEW SECOND_VIEW\nAS\nSELECT id FROM facts'),
+        dict(relation='SECURE_VIEW', definition=None),
+    ])
+    with mock.patch.object(sf, '_safe_query', return_value=definitions) as safe_query, \
+            mock.patch.object(sf, 'scalar_query', return_value='SELECT 1') as scalar_query:
+        assert sf.view_ddl(views['first_view']) == ' select * from facts'
+        assert sf.view_ddl(views['second_view']) == '\nSELECT id FROM facts'
+        assert sf.view_ddl(views['secure_view']) == 'SELECT 1'
+
+    safe_query.assert_called_once()
+    assert "UPPER(table_schema) = UPPER('" + SCHEMA + "')" in safe_query.call_args[0][0]
+    scalar_query.assert_called_once_with(sf.view_creation_statement(views['secure_view']))
+
+
+def test_seeded_sample_statements():
+    sf = SnowflakeAdapter()
+    DATABASE, SCHEMA, NAME = [rand_string(10) for _ in range(3)]
+    relation = Relation(database=DATABASE, schema=SCHEMA,
+                        name=NAME, materialization=TABLE, attributes=[])
+    relation.population_size = 4000
+
+    assert sf.sample_statement_from_relation(relation, BernoulliSampleMethod(1000)).strip().endswith(
+        'SAMPLE BERNOULLI (1000 ROWS)')
+    # fixed size samples cannot be seeded, so the rows become a percent of the population
+    assert sf.sample_statement_from_relation(relation, BernoulliSampleMethod(1000, seed=42)).strip().endswith(
+        'SAMPLE BERNOULLI (25) SEED (42)')
+    assert sf.sample_statement_from_relation(
+        relation, BernoulliSampleMethod(10, units='probability', seed=42)).strip().endswith(
+        'SAMPLE BERNOULLI (10) SEED (42)')
+
+    directional = sf.directionally_wrap_statement('SELECT 1', relation, BernoulliSampleMethod(1000, seed=42))
+    assert 'SAMPLE BERNOULLI' not in directional
+    assert query_equalize(f"ORDER BY HASH(__snowshu_record_hash, 42) LIMIT 1000") in query_equalize(directional)
+
+
+def test_system_sample_statement():
+    sf = SnowflakeAdapter()
+    DATABASE, SCHEMA, NAME = [rand_string(10) for _ in range(3)]
+    relation = Relation(database=DATABASE, schema=SCHEMA,
+                        name=NAME, materialization=TABLE, attributes=[])
+
+    statement = sf.sample_statement_from_relation(relation, SystemSampleMethod(1.5, rows=1000))
+    assert query_equalize(statement) == query_equalize(f"""
+SELECT
+    *
+FROM
+(
+SELECT
+    *
+FROM
+    {relation.quoted_dot_notation}
+SAMPLE SYSTEM (1.5)
+)
+SAMPLE BERNOULLI (1000 ROWS)
+""")
+    assert query_equalize(sf.sample_statement_from_relation(relation, SystemSampleMethod(1.5, seed=7))).endswith(
+        'SAMPLE SYSTEM (1.5) SEED (7)')
+
+
+def test_key_hash_sample_statement():
+    sf = SnowflakeAdapter()
+    DATABASE, SCHEMA, NAME = [rand_string(10) for _ in range(3)]
+    relation = Relation(database=DATABASE, schema=SCHEMA,
+                        name=NAME, materialization=TABLE, attributes=[])
+
+    statement = sf.sample_statement_from_relation(relation, KeyHashSampleMethod('user_id', 1000, 50))
+    assert query_equalize(statement) == query_equalize(f"""
+SELECT
+    *
+FROM
+    {relation.quoted_dot_notation}
+WHERE MOD(ABS(HASH(user_id)), 1000) < 50
+""")
+    directional = sf.directionally_wrap_statement('SELECT 1', relation, KeyHashSampleMethod('user_id', 1000, 50, seed=3))
+    assert query_equalize("WHERE MOD(ABS(HASH(user_id, 3)), 1000) < 50") in query_equalize(directional)
+
+
+def test_recency_window_statements():
+    sf = SnowflakeAdapter()
+    DATABASE, SCHEMA, NAME = [rand_string(10) for _ in range(3)]
+    relation = Relation(database=DATABASE, schema=SCHEMA,
+                        name=NAME, materialization=TABLE, attributes=[])
+
+    assert query_equalize(sf.recency_window_start_statement(relation, 'viewed_at', days=7)) == query_equalize(
+        f"SELECT DATEADD(day, -7, MAX(viewed_at)) FROM {relation.quoted_dot_notation}")
+    assert 'LIMIT 3' in sf.recency_window_start_statement(relation, 'viewed_at', partitions=3)
+
+    statement = sf.sample_statement_from_relation(relation,
+                                                  RecencyWindowSampleMethod('viewed_at', '2020-01-01', 1000))
+    assert query_equalize(statement) == query_equalize(f"""
+SELECT
+    *
+FROM
+(
+SELECT
+    *
+FROM
+    {relation.quoted_dot_notation}
+WHERE viewed_at >= '2020-01-01'
+)
+SAMPLE BERNOULLI (1000 ROWS)
+""")
+    directional = sf.directionally_wrap_statement('SELECT 1', relation,
+                                                  RecencyWindowSampleMethod('viewed_at', '2020-01-01', 1000))
+    assert "WHERE viewed_at >= '2020-01-01')" in directional
+
+
+def test_pruned_relation_statements():
+    sf = SnowflakeAdapter()
+    stub_relation = Relation(database=rand_string(10), schema=rand_string(10), name=rand_string(10),
+                             materialization=TABLE,
+                             attributes=[Attribute(rand_string(10), dt.VARCHAR) for _ in range(3)])
+    excluded = stub_relation.attributes[0].name
+    stub_relation.prune_attributes([excluded], [])
+    projection = ','.join([attr.name for attr in stub_relation.attributes])
+
+    assert query_equalize(sf.unsampled_statement(stub_relation)) == query_equalize(
+        f"SELECT {projection} FROM {stub_relation.quoted_dot_notation}")
+    assert query_equalize(f"SELECT {projection} FROM {stub_relation.quoted_dot_notation} SAMPLE BERNOULLI (10 ROWS)") \
+        == query_equalize(sf.sample_statement_from_relation(stub_relation, BernoulliSampleMethod(10)))
+
+
+def test_union_constraint_statement_combines_relationships():
+    sf = SnowflakeAdapter()
+    subject, *constraints = [Relation(database=rand_string(10), schema=rand_string(10), name=rand_string(10),
+                                      materialization=TABLE, attributes=[]) for _ in range(3)]
+
+    statement = sf.union_constraint_statement(subject,
+                                              [(constraints[0], 'user_id', 'id',),
+                                               (constraints[1], 'product_id', 'id',)],
+                                              100)
+    assert statement.count(subject.quoted_dot_notation) == 1
+    assert 'NOT IN' not in statement
+    assert query_equalize(f"""
+    (user_id IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM {constraints[0].quoted_dot_notation} AS __snowshu_constraint
+        WHERE __snowshu_constraint.id = __snowshu_subject.user_id))
+    OR (product_id IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM {constraints[1].quoted_dot_notation} AS __snowshu_constraint
+        WHERE __snowshu_constraint.id = __snowshu_subject.product_id))
+LIMIT 100)""") in query_equalize(statement)
+
+
+def test_predicate_constraint_statement_empty_upstream():
+    sf = SnowflakeAdapter()
+    LOCAL_KEY, REMOTE_KEY = [rand_string(10) for _ in range(2)]
+    relation = Relation(database=rand_string(10),
+                        schema=rand_string(10),
+                        name=rand_string(10),
+                        materialization=TABLE,
+                        attributes=[Attribute(REMOTE_KEY, dt.INTEGER)])
+    relation.data = pd.DataFrame(columns=[REMOTE_KEY])
+    statement = sf.predicate_constraint_statement(
+        relation, False, LOCAL_KEY, REMOTE_KEY)
+    assert query_equalize(statement) == query_equalize(f"{LOCAL_KEY} IN (NULL)")
+
+
+def test_slice_statement():
+    sf = SnowflakeAdapter()
+    query = f'SELECT * FROM {rand_string(10)}'
+    assert query_equalize(sf.slice_statement(query, 4, 1)) == query_equalize(f"""
+SELECT
+    *
+FROM (
+{query}
+) AS __snowshu_slice
+WHERE MOD(ABS(HASH(*)), 4) = 1
+""")